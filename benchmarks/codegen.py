@@ -0,0 +1,70 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: Generic PID.update against generated fixed-gain step functions
+
+Every configuration is verified by lib.codegen before it is timed. Results
+are printed, and appended as one JSON line per run to --output if given.
+'''
+
+import argparse
+import json
+import os
+import sys
+import time
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,ROOT)
+
+from lib.codegen import compile_step
+from lib.pid import PID
+
+DT = 0.01
+
+# kp, ki, kd, kd_error, feed_forward, noise_sigma
+CONFIGURATIONS = {
+    "pid" : (0.8,2.0,0.01,True,0.0,0.0),
+    "pi" : (0.8,2.0,0.0,True,0.0,0.0),
+    "p" : (0.8,0.0,0.0,True,0.0,0.0),
+    "pid_state_derivative" : (0.8,2.0,0.01,False,0.0,0.0),
+    "pid_feed_forward_noise" : (0.8,2.0,0.01,True,0.3,0.05),
+    }
+
+
+def controller(kp,ki,kd,kd_error,feed_forward,noise_sigma):
+    c = PID(kp,ki,kd,kd_error)
+    c.feed_forward = feed_forward
+    c.noise_sigma = noise_sigma
+    return c
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number",type=int,default=200000)
+    parser.add_argument("--repeats",type=int,default=5)
+    parser.add_argument("--output",help="JSON lines file to append the run to")
+    args = parser.parse_args()
+
+    record = {"benchmark" : "codegen", "time" : time.time(),
+        "python" : sys.version.split()[0], "results" : {}}
+    for name, gains in CONFIGURATIONS.items():
+        generic = controller(*gains)
+        step = compile_step(controller(*gains),DT)
+        generic_time = min(timeit.repeat(lambda: generic.update(0.3,1.0,DT),
+            number=args.number,repeat=args.repeats))
+        generated_time = min(timeit.repeat(lambda: step(0.3,1.0),
+            number=args.number,repeat=args.repeats))
+        record["results"][name] = {
+            "generic_ns" : 1e9*generic_time/args.number,
+            "generated_ns" : 1e9*generated_time/args.number,
+            "speedup" : generic_time/generated_time}
+        print("%-24s generic %6.0f ns  generated %6.0f ns  speedup %.2fx" % (name,
+            1e9*generic_time/args.number,1e9*generated_time/args.number,
+            generic_time/generated_time))
+
+    if args.output is not None:
+        with open(args.output,"a") as results:
+            results.write(json.dumps(record) + "\n")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,286 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: Interaction latency of the GUI replaying recorded input traces
+
+Launches gui.Gui under a virtual X server (Xvfb, unless --display is
+given) and replays slider drags, entry edits and tab switches through the
+same callbacks the widgets call (*_scrollbar_update, *_entry_update,
+tab_change) at their recorded times. The latency of an event runs from its
+recorded time to the end of the canvas draw it caused, so time spent
+behind schedule counts too. Every frame at --fps an event kept the canvas
+from showing is a dropped frame. Results are printed, and appended as one
+JSON line per run to --output if given.
+
+Traces are JSON lines, one event each:
+    {"t": 0.016, "tab": 0, "callback": "gain_scrollbar_update",
+        "args": ["kp", 0, 1.2]}
+    {"t": 0.5, "tab": 0, "callback": "gain_entry_update",
+        "args": ["kp", 0], "text": "1.5"}
+    {"t": 1.0, "tab": 2, "callback": "tab_change"}
+--record writes such a trace while the GUI is used by hand; without
+--trace the built-in scenarios below are replayed.
+'''
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,ROOT)
+
+# tab callbacks that are recorded and replayed, entries read their text
+SCROLLBARS = ("steady_state_scrollbar_update","noise_sigma_scrollbar_update",
+    "gain_scrollbar_update")
+ENTRIES = ("steady_state_entry_update","noise_sigma_entry_update",
+    "gain_entry_update")
+
+
+def drag(callback,args,low,high,duration,tab=0,rate=60.0):
+    # slider dragged from low to high at the pointer event rate
+    count = int(duration*rate)
+    return [{"t" : ii/rate,"tab" : tab,"callback" : callback,
+        "args" : args + [low + (high - low)*ii/(count - 1)]}
+        for ii in range(count)]
+
+def typing(callback,args,values,tab=0,interval=0.5):
+    return [{"t" : ii*interval,"tab" : tab,"callback" : callback,"args" : args,
+        "text" : str(value)} for ii, value in enumerate(values)]
+
+def switching(tabs,interval=0.5):
+    return [{"t" : ii*interval,"tab" : tab,"callback" : "tab_change"}
+        for ii, tab in enumerate(tabs)]
+
+SCENARIOS = {
+    "kp_drag" : drag("gain_scrollbar_update",["kp",0],0.2,1.8,2.0),
+    "ki_drag" : drag("gain_scrollbar_update",["ki",1],1.0,15.0,2.0,tab=1),
+    "steady_state_drag" : drag("steady_state_scrollbar_update",[],-1.0,1.0,2.0),
+    "noise_sigma_drag" : drag("noise_sigma_scrollbar_update",[],0.0,0.5,2.0),
+    "gain_entries" : typing("gain_entry_update",["kd",2],
+        [0.01,0.05,0.1,0.2,0.0,0.15]),
+    "steady_state_entries" : typing("steady_state_entry_update",[],
+        [0.5,-0.5,1.2,0.0]),
+    "tab_switch" : switching([1,2,0,2,1,0,1,2]),
+    }
+
+
+def start_display(display):
+    '''
+    starts Xvfb on the first free display number, returns the process
+    '''
+    for number in range(display,display + 50):
+        if os.path.exists("/tmp/.X11-unix/X%d" % number):
+            continue
+        process = subprocess.Popen(["Xvfb",":%d" % number,"-screen","0",
+            "1920x1080x24","-nolisten","tcp"],stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL)
+        for ii in range(100):
+            if os.path.exists("/tmp/.X11-unix/X%d" % number):
+                os.environ["DISPLAY"] = ":%d" % number
+                return process
+            if process.poll() is not None:
+                break
+            time.sleep(0.05)
+        process.terminate()
+    sys.exit("could not start Xvfb")
+
+def launch(seed):
+    import tkinter as tk
+    import gui
+    # same random initial gains every run
+    random.seed(seed)
+    np.random.seed(seed)
+    root = tk.Tk()
+    root.geometry("1600x1000+0+0")
+    app = gui.Gui(root)
+    return root, app
+
+def controller_tabs(app):
+    return [app.tab0,app.tab1,app.tab2]
+
+
+class Recorder():
+    '''
+    Recorder Class
+
+    Wraps the callbacks of the controller tabs before they are initialized
+    so the widgets bind the wrappers, and logs every call as a trace event.
+    '''
+    def __init__(self,app):
+        self.app = app
+        self.start = time.perf_counter()
+        self.events = []
+        self.depth = 0
+        for index, tab in enumerate(controller_tabs(app)):
+            for name in SCROLLBARS + ENTRIES:
+                setattr(tab,name,self.wrap(tab,index,name,getattr(tab,name)))
+        tab_change = app.tab_change
+        def record_tab_change(event):
+            self.log({"tab" : app.notebook.index(app.notebook.select()),
+                "callback" : "tab_change"})
+            tab_change(event)
+        app.tab_change = record_tab_change
+        app.master.bind("<<NotebookTabChanged>>",app.tab_change)
+
+    def wrap(self,tab,index,name,callback):
+        def recorded(*args):
+            # an entry moves its slider, only the outer call is an input
+            if self.depth:
+                return callback(*args)
+            event = {"tab" : index,"callback" : name,"args" : list(args[:-1])}
+            if name in ENTRIES:
+                event["text"] = entry_widget(tab,name,args[:-1]).get()
+            else:
+                event["args"].append(float(args[-1]))
+            self.log(event)
+            self.depth += 1
+            try:
+                return callback(*args)
+            finally:
+                self.depth -= 1
+        return recorded
+
+    def log(self,event):
+        event["t"] = time.perf_counter() - self.start
+        self.events.append(event)
+
+    def save(self,path):
+        with open(path,"w") as trace:
+            for event in self.events:
+                trace.write(json.dumps(event) + "\n")
+
+
+def entry_widget(tab,name,args):
+    if name == "steady_state_entry_update":
+        return tab.steady_state_entry
+    if name == "noise_sigma_entry_update":
+        return tab.noise_sigma_entry
+    return tab.gain_entries[args[0]][args[1]]
+
+def select(root,app,index):
+    if app.notebook.index(app.notebook.select()) != index:
+        app.notebook.select(index)
+        app.tab_change(None)
+        root.update()
+
+def dispatch(app,event):
+    if event["callback"] == "tab_change":
+        app.notebook.select(event["tab"])
+        app.tab_change(None)
+        return
+    tab = controller_tabs(app)[event["tab"]]
+    args = event.get("args",[])
+    if event["callback"] in ENTRIES:
+        entry = entry_widget(tab,event["callback"],args)
+        entry.delete(0,"end")
+        entry.insert(0,event["text"])
+        args = args + [None]
+    getattr(tab,event["callback"])(*args)
+
+def replay(root,app,events,fps):
+    '''
+    latencies [s] of every event and the dropped frames of one trace
+    '''
+    draws = []
+    connections = [(tab.canvas,tab.canvas.mpl_connect("draw_event",
+        lambda event: draws.append(time.perf_counter())))
+        for tab in controller_tabs(app) if tab.initialized]
+    if events[0]["callback"] != "tab_change":
+        select(root,app,events[0]["tab"])
+
+    latencies = []
+    start = time.perf_counter() - events[0]["t"]
+    for event in events:
+        # idle until the recorded time, pending redraws run meanwhile
+        while time.perf_counter() < start + event["t"]:
+            root.update()
+            time.sleep(0.0005)
+        del draws[:]
+        dispatch(app,event)
+        # draw_idle redraws from the idle queue
+        root.update()
+        finished = draws[-1] if draws else time.perf_counter()
+        latencies.append(finished - (start + event["t"]))
+
+    for canvas, connection in connections:
+        canvas.mpl_disconnect(connection)
+    latencies = np.array(latencies)
+    dropped = int(np.maximum(np.ceil(latencies*fps) - 1.0,0.0).sum())
+    return latencies, dropped
+
+def load_traces(paths):
+    traces = {}
+    for path in paths:
+        with open(path) as trace:
+            events = [json.loads(line) for line in trace if line.strip()]
+        events.sort(key=lambda event: event["t"])
+        traces[os.path.splitext(os.path.basename(path))[0]] = events
+    return traces
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trace",nargs="*",default=[],
+        help="recorded traces to replay instead of the built-in scenarios")
+    parser.add_argument("--record",
+        help="run the GUI by hand and write its events to this trace")
+    parser.add_argument("--display",type=int,default=99,
+        help="first Xvfb display number to try")
+    parser.add_argument("--fps",type=float,default=60.0)
+    parser.add_argument("--repeats",type=int,default=3)
+    parser.add_argument("--seed",type=int,default=0)
+    parser.add_argument("--output",help="JSON lines file to append the run to")
+    args = parser.parse_args()
+
+    if args.record:
+        root, app = launch(args.seed)
+        # the tabs build their widgets on the first visit, after this
+        recorder = Recorder(app)
+        root.mainloop()
+        recorder.save(args.record)
+        return
+
+    xvfb = None
+    if not os.environ.get("DISPLAY"):
+        xvfb = start_display(args.display)
+    try:
+        root, app = launch(args.seed)
+        root.update()
+        # every tab is built before timing, tab_switch measures later visits
+        for index in range(len(controller_tabs(app))):
+            select(root,app,index)
+        traces = load_traces(args.trace) if args.trace else SCENARIOS
+
+        record = {"benchmark" : "gui_latency", "time" : time.time(),
+            "python" : sys.version.split()[0], "fps" : args.fps, "results" : {}}
+        for name, events in traces.items():
+            latencies, dropped = [], 0
+            for ii in range(args.repeats):
+                latency, frames = replay(root,app,events,args.fps)
+                latencies.append(latency)
+                dropped += frames
+            latencies = 1e3*np.concatenate(latencies)
+            p50, p90, p99 = np.percentile(latencies,[50.0,90.0,99.0])
+            record["results"][name] = {"events" : len(latencies),
+                "p50_ms" : p50,"p90_ms" : p90,"p99_ms" : p99,
+                "max_ms" : latencies.max(),"dropped_frames" : dropped}
+            print("%-22s %5d events  p50 %7.2f  p90 %7.2f  p99 %7.2f  max %7.2f ms"
+                "  dropped frames %d" % (name,len(latencies),p50,p90,p99,
+                latencies.max(),dropped))
+        root.destroy()
+    finally:
+        if xvfb is not None:
+            xvfb.terminate()
+
+    if args.output is not None:
+        with open(args.output,"a") as results:
+            results.write(json.dumps(record) + "\n")
+
+if __name__ == '__main__':
+    main()
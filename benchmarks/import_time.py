@@ -0,0 +1,71 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: Cold import time of the package entry points
+
+Every measurement runs in a fresh interpreter. Results are printed, and
+appended as one JSON line per run to --output if given, so import
+regressions can be followed over time.
+'''
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# statements timed in a fresh interpreter, numpy alone is the baseline the
+# others pay for; the lib.pid result also checks that the scalar controller
+# stays free of NumPy
+TARGETS = {
+    "lib.pid" : "from lib.pid import PID",
+    "lib.bank" : "from lib.bank import PIDBank",
+    "lib.simulation" : "from lib.simulation import Simulation",
+    "numpy" : "import numpy",
+    }
+
+SCRIPT = '''
+import sys, time
+start = time.perf_counter()
+%s
+elapsed = time.perf_counter() - start
+print(elapsed, "numpy" in sys.modules)
+'''
+
+
+def measure(statement,repeats):
+    times = []
+    for ii in range(repeats):
+        output = subprocess.check_output([sys.executable,"-c",SCRIPT % statement],
+            cwd=ROOT)
+        elapsed, numpy_loaded = output.split()
+        times.append(float(elapsed))
+    return times, numpy_loaded == b"True"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeats",type=int,default=10)
+    parser.add_argument("--output",help="JSON lines file to append the run to")
+    args = parser.parse_args()
+
+    record = {"benchmark" : "import_time", "time" : time.time(),
+        "python" : sys.version.split()[0], "results" : {}}
+    for name, statement in TARGETS.items():
+        times, numpy_loaded = measure(statement,args.repeats)
+        record["results"][name] = {"median_ms" : 1e3*statistics.median(times),
+            "min_ms" : 1e3*min(times), "numpy_loaded" : numpy_loaded}
+        print("%-16s median %7.2f ms  min %7.2f ms  numpy loaded: %s" % (name,
+            1e3*statistics.median(times),1e3*min(times),numpy_loaded))
+
+    if record["results"]["lib.pid"]["numpy_loaded"]:
+        print("warning: importing lib.pid loaded numpy")
+    if args.output is not None:
+        with open(args.output,"a") as results:
+            results.write(json.dumps(record) + "\n")
+
+if __name__ == '__main__':
+    main()
@@ -15,6 +15,7 @@ else:
     from tkinter import ttk
 from ttkthemes import ThemedStyle
 
+from lib.heatmap import HeatmapTab
 from lib.tab import Tab
 
 class Gui(tk.Frame):
@@ -50,6 +51,10 @@ class Gui(tk.Frame):
         # -----------------_- STEP INPUT  _--------------------#
         self.tab2 = Tab(self.master,self.notebook,"QUADRATIC")
 
+        # ------------------ GAIN HEATMAP ---------------------#
+        self.tab3 = HeatmapTab(self.master,self.notebook,
+            {"STEP" : self.tab0,"RAMP" : self.tab1,"QUADRATIC" : self.tab2})
+
     def tab_change(self, event):
         """
         runs whenever the tab is changed in the gui
@@ -62,6 +67,8 @@ class Gui(tk.Frame):
             self.tab1.run()
         elif active_tab == 2:
             self.tab2.run()
+        elif active_tab == 3:
+            self.tab3.run()
 
     def close_window(self,event):
         """
@@ -0,0 +1,40 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: PID control package, NumPy-backed features load on first use
+'''
+
+import importlib
+
+# public names and the submodule providing them, imported lazily so that
+# "from lib.pid import PID" only needs the standard library
+EXPORTS = {
+    "PID" : "pid",
+    "PIDBank" : "bank",
+    "BankOutputStage" : "bank",
+    "OutputStage" : "output",
+    "simulate" : "bank",
+    "IncrementalSimulator" : "bank",
+    "ClosedForm" : "closedform",
+    "ConvolutionEngine" : "convolution",
+    "Simulation" : "simulation",
+    "analyze" : "frequency",
+    "is_stable" : "frequency",
+    "monte_carlo" : "montecarlo",
+    "replay" : "replay",
+    "ControlServer" : "server",
+    "ControlClient" : "server",
+    }
+
+__all__ = list(EXPORTS)
+
+
+def __getattr__(name):
+    if name not in EXPORTS:
+        raise AttributeError("module %r has no attribute %r" % (__name__,name))
+    value = getattr(importlib.import_module("." + EXPORTS[name],__name__),name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,478 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: Vectorized bank of PID controllers and batched simulator
+'''
+
+import copy
+import time
+
+import numpy as np
+
+from .plant import Integrator
+
+
+class PIDBank():
+    '''
+    PIDBank Class
+
+    Array version of PID: every gain and intermediary holds one entry per
+    controller and update()/command() advance all controllers at once.
+    '''
+    # per-controller arrays, gains first then intermediaries
+    ARRAYS = ("kp","ki","kd","kd_error","feed_forward","noise_sigma",
+        "integrator","previous_state","previous_state_error",
+        "state_derivative","error_derivative")
+
+    def __init__(self,kp=0.0,ki=0.0,kd=0.0,kd_error=True,feed_forward=0.0,
+        noise_sigma=0.0,count=None,seed=None):
+        if count is None:
+            count = np.broadcast(np.asarray(kp),np.asarray(ki),np.asarray(kd),
+                np.asarray(kd_error),np.asarray(feed_forward),
+                np.asarray(noise_sigma)).size
+        self.count = count
+
+        # inputs
+        self.kp = self.column(kp)                       # proportional gains
+        self.ki = self.column(ki)                       # integral gains
+        self.kd = self.column(kd)                       # derivative gains
+        self.kd_error = self.column(kd_error,bool)      # error or state derivative
+        self.feed_forward = self.column(feed_forward)   # constant command offsets
+        self.noise_sigma = self.column(noise_sigma)     # command noise levels
+        self.rng = np.random.default_rng(seed)
+
+        # intermediaries
+        self.integrator = np.zeros(count)
+        self.previous_state = np.zeros(count)
+        self.previous_state_error = np.zeros(count)
+        self.state_derivative = np.zeros(count)
+        self.error_derivative = np.zeros(count)
+
+    @classmethod
+    def from_controllers(cls,controllers,seed=None):
+        '''
+        bank with the gains of a list of scalar PID controllers
+        '''
+        return cls([c.kp for c in controllers],[c.ki for c in controllers],
+            [c.kd for c in controllers],[c.kd_error for c in controllers],
+            [c.feed_forward for c in controllers],
+            [c.noise_sigma for c in controllers],seed=seed)
+
+    def copy(self):
+        # independent bank, e.g. to simulate without faulting the original
+        return copy.deepcopy(self)
+
+    def select(self,index):
+        '''
+        bank of the controllers at index, sharing the generator; write it
+        back with assign() after advancing it
+        '''
+        bank = PIDBank.__new__(PIDBank)
+        for name in self.ARRAYS:
+            setattr(bank,name,getattr(self,name)[index])
+        bank.count = len(bank.kp)
+        bank.rng = self.rng
+        return bank
+
+    def assign(self,index,bank):
+        for name in self.ARRAYS:
+            getattr(self,name)[index] = getattr(bank,name)
+
+    def column(self,value,dtype=np.float64):
+        # one writable entry per controller
+        return np.array(np.broadcast_to(np.asarray(value,dtype=dtype),
+            (self.count,)))
+
+    def update(self,current_state,desired_state,dt):
+        # implicit integrator plant: the command is added to the current state
+        return current_state + self.command(current_state,desired_state,dt)
+
+    def command(self,current_state,desired_state,dt):
+        with np.errstate(all='ignore'):
+            # calculate current error
+            state_error = desired_state - current_state
+
+            # update integrator
+            self.integrator += (dt/2.0) * (state_error + self.previous_state_error)
+
+            # update derivatives with the dirty derivative of PID
+            sigma = 10.0 * dt                               # cutoff frequency for dirty derivative
+            beta = (2.0 * sigma - dt) / (2.0 * sigma + dt)  # dirty derivative gain
+            error_derivative = beta * self.error_derivative \
+                + (1.0 - beta) * (state_error - self.previous_state_error) / dt
+            state_derivative = beta * self.state_derivative \
+                + (1.0 - beta) * (current_state - self.previous_state) / dt
+            np.copyto(self.error_derivative,error_derivative,where=self.kd_error)
+            np.copyto(self.state_derivative,state_derivative,where=~self.kd_error)
+            derivative = np.where(self.kd_error,self.error_derivative,
+                -self.state_derivative)
+
+            # calculate command
+            command = self.kp * state_error \
+                + self.ki * self.integrator \
+                + self.kd * derivative \
+                + self.feed_forward
+            if self.noise_sigma.any():
+                command += self.noise_sigma*self.rng.standard_normal(self.count)
+
+        # controllers that overflow are reset and switched off, like PID
+        faulted = ~np.isfinite(command)
+        if faulted.any():
+            self.fault(faulted)
+            command[faulted] = 0.0
+
+        # update current to previous
+        self.previous_state[:] = current_state
+        self.previous_state_error[:] = state_error
+
+        return command
+
+    def fault(self,mask):
+        self.reset(mask)
+        self.kp[mask] = 0.0
+        self.ki[mask] = 0.0
+        self.kd[mask] = 0.0
+        self.feed_forward[mask] = 0.0
+
+    def reset(self,mask=slice(None)):
+        self.integrator[mask] = 0.0
+        self.previous_state[mask] = 0.0
+        self.previous_state_error[mask] = 0.0
+        self.state_derivative[mask] = 0.0
+        self.error_derivative[mask] = 0.0
+
+    def snapshot(self):
+        # copies of the per-controller arrays (faults zero gains, schedules
+        # move them) and the generator position, for restore()
+        arrays = dict((name,value.copy()) for name, value in vars(self).items()
+            if isinstance(value,np.ndarray))
+        return arrays, self.rng.bit_generator.state
+
+    def restore(self,snapshot):
+        arrays, state = snapshot
+        for name, value in arrays.items():
+            np.copyto(getattr(self,name),value)
+        self.rng.bit_generator.state = state
+
+
+class ScheduledBank(PIDBank):
+    '''
+    ScheduledBank Class
+
+    PIDBank whose gains follow a GainTable shared by every controller, the
+    array version of ScheduledPID. Interpolation is vectorized and each
+    controller keeps the segment of its previous tick, so only controllers
+    that left their segment are searched.
+    '''
+    def __init__(self,table,count,kd_error=True,noise_sigma=0.0,seed=None):
+        PIDBank.__init__(self,kd_error=kd_error,noise_sigma=noise_sigma,
+            count=count,seed=seed)
+        self.breakpoints = np.array(table.breakpoints)
+        self.table = np.array(table.gains)          # shape (4, breakpoints)
+        self.segment = np.zeros(count,dtype=np.intp)
+        self.faulted = np.zeros(count,dtype=bool)
+        self.schedule(np.zeros(count))
+
+    def command(self,current_state,desired_state,dt,scheduling_variable=None):
+        self.schedule(current_state if scheduling_variable is None
+            else scheduling_variable)
+        return PIDBank.command(self,current_state,desired_state,dt)
+
+    def schedule(self,x):
+        x = np.broadcast_to(np.asarray(x,dtype=np.float64),(self.count,))
+        b = self.breakpoints
+        if len(b) == 1:
+            gains = np.repeat(self.table,self.count,axis=1)
+        else:
+            # cached segments first, searchsorted only for the ones that moved
+            last = len(b) - 2
+            segment = self.segment
+            moved = ((x < b[segment]) & (segment > 0)) \
+                | ((x >= b[segment + 1]) & (segment < last))
+            if moved.any():
+                segment[moved] = np.clip(np.searchsorted(b,x[moved],
+                    side='right') - 1,0,last)
+            with np.errstate(invalid='ignore'):
+                fraction = np.clip((x - b[segment])/(b[segment + 1] - b[segment]),
+                    0.0,1.0)
+            low = self.table[:,segment]
+            gains = low + fraction*(self.table[:,segment + 1] - low)
+        kp, ki, kd, feed_forward = np.where(self.faulted,0.0,gains)
+
+        # bumpless: the integrator absorbs the change of the feedback terms
+        derivative = np.where(self.kd_error,self.error_derivative,
+            -self.state_derivative)
+        with np.errstate(divide='ignore',invalid='ignore'):
+            integrator = (self.ki*self.integrator
+                + (self.kp - kp)*self.previous_state_error
+                + (self.kd - kd)*derivative)/ki
+        np.copyto(self.integrator,integrator,where=ki != 0.0)
+        self.kp[:] = kp
+        self.ki[:] = ki
+        self.kd[:] = kd
+        self.feed_forward[:] = feed_forward
+
+    def fault(self,mask):
+        PIDBank.fault(self,mask)
+        self.faulted[mask] = True
+
+    def reset(self,mask=slice(None)):
+        PIDBank.reset(self,mask)
+        if hasattr(self,'faulted'):
+            self.faulted[mask] = False
+
+
+class BankOutputStage():
+    '''
+    BankOutputStage Class
+
+    Array version of OutputStage for the commands of a PIDBank: deadband,
+    resolution, min_interval and the low and high limits hold one entry per
+    controller and submit()
+    returns only the controllers whose command must be sent.
+    '''
+    def __init__(self,count,deadband=0.0,resolution=0.0,min_interval=0.0,
+        low=-np.inf,high=np.inf):
+        self.count = count
+        self.deadband = self.column(deadband)
+        self.resolution = self.column(resolution)
+        self.min_interval = self.column(min_interval)
+        self.low = self.column(low)
+        self.high = self.column(high)
+        self.reset()
+
+    def column(self,value):
+        return np.array(np.broadcast_to(np.asarray(value,dtype=np.float64),
+            (self.count,)))
+
+    def submit(self,commands,now=None):
+        '''
+        indices and values of the commands to send at time now (default
+        monotonic clock) as two compact arrays
+        '''
+        now = time.monotonic() if now is None else now
+        self.submitted += 1
+        with np.errstate(divide='ignore',invalid='ignore'):
+            values = np.where(self.resolution > 0.0,
+                np.round(commands/self.resolution)*self.resolution,commands)
+        values = np.clip(values,self.low,self.high)
+        # nothing sent yet compares as nan, which is never inside the deadband
+        within = np.abs(values - self.last) <= self.deadband
+        early = ~within & (now - self.last_time < self.min_interval)
+        send = ~(within | early)
+        self.deadband_suppressed += within
+        self.interval_suppressed += early
+        self.pending[within] = False
+        self.pending[early] = True
+        self.pending_values[early] = values[early]
+        indices = np.flatnonzero(send)
+        return indices, self.send(indices,values[indices],now)
+
+    def flush(self,now=None):
+        # the changes held back by the interval, sent now
+        indices = np.flatnonzero(self.pending)
+        return indices, self.send(indices,self.pending_values[indices],
+            time.monotonic() if now is None else now)
+
+    def send(self,indices,values,now):
+        self.last[indices] = values
+        self.last_time[indices] = now
+        self.pending[indices] = False
+        self.published[indices] += 1
+        return values
+
+    def statistics(self):
+        # per controller counts, submitted is shared by all of them
+        suppressed = self.deadband_suppressed + self.interval_suppressed
+        return {"submitted" : self.submitted,"published" : self.published.copy(),
+            "deadband_suppressed" : self.deadband_suppressed.copy(),
+            "interval_suppressed" : self.interval_suppressed.copy(),
+            "suppressed_fraction" : suppressed/max(self.submitted,1)}
+
+    def reset(self):
+        self.last = np.full(self.count,np.nan)          # last sent values
+        self.last_time = np.full(self.count,-np.inf)
+        self.pending = np.zeros(self.count,dtype=bool)
+        self.pending_values = np.zeros(self.count)
+        self.submitted = 0
+        self.published = np.zeros(self.count,dtype=np.int64)
+        self.deadband_suppressed = np.zeros(self.count,dtype=np.int64)
+        self.interval_suppressed = np.zeros(self.count,dtype=np.int64)
+
+
+def simulate(bank,setpoint,dt,plant=None,offset=0.0,setpoint_noise=0.0,out=None,
+    dtype=np.float64,terms=None):
+    '''
+    closes the loop of every controller in bank around its own plant instance
+
+    setpoint is either one trajectory shared by the bank, shape (T,), or one
+    trajectory per controller, shape (T, count). offset is a constant
+    disturbance added to the commands, the steady state error of the GUI,
+    and setpoint_noise the sigma of fresh setpoint noise drawn from the bank
+    generator for every controller and sample. Returns the measured states
+    time-major, shape (T, count), written into out when given. terms, an
+    optional array of shape (5, T, count), receives the P, I, D, feed
+    forward and noise terms of every command.
+    '''
+    setpoint = np.asarray(setpoint)
+    time_length = len(setpoint)
+    if out is None:
+        out = np.empty((time_length,bank.count),dtype=dtype)
+    if plant is None:
+        plant = Integrator()
+
+    bank.reset()
+    plant.reset(bank.count,dt)
+    out[0] = plant.output()
+    if terms is not None:
+        terms[:,0] = 0.0
+    advance(bank,plant,setpoint,dt,out,1,time_length,offset,setpoint_noise,terms)
+    return out
+
+def advance(bank,plant,setpoint,dt,out,start,stop,offset=0.0,setpoint_noise=0.0,
+    terms=None):
+    # closed loop samples start to stop, out[start-1] holds the current state
+    if terms is not None:
+        advance_capture(bank,plant,setpoint,dt,out,start,stop,offset,
+            setpoint_noise,terms)
+        return
+    for ii in range(start,stop):
+        desired_state = setpoint[ii]
+        if setpoint_noise:
+            desired_state = desired_state \
+                + setpoint_noise*bank.rng.standard_normal(bank.count)
+        command = bank.command(out[ii-1],desired_state,dt)
+        command += offset
+        out[ii] = plant.step(command)
+
+
+def advance_capture(bank,plant,setpoint,dt,out,start,stop,offset,setpoint_noise,
+    terms):
+    # advance() that also writes every term into terms[:, ii] in place
+    negative_kd = -bank.kd
+    for ii in range(start,stop):
+        desired_state = setpoint[ii]
+        if setpoint_noise:
+            desired_state = desired_state \
+                + setpoint_noise*bank.rng.standard_normal(bank.count)
+        command = bank.command(out[ii-1],desired_state,dt)
+        p, i, d, ff, noise = terms[:,ii]
+        np.multiply(bank.kp,bank.previous_state_error,out=p)
+        np.multiply(bank.ki,bank.integrator,out=i)
+        np.multiply(bank.kd,bank.error_derivative,out=d,where=bank.kd_error)
+        np.multiply(negative_kd,bank.state_derivative,out=d,where=~bank.kd_error)
+        np.copyto(ff,bank.feed_forward)
+        # noise is what remains of the command, zero for faulted controllers
+        np.subtract(command,p,out=noise)
+        noise -= i
+        noise -= d
+        noise -= ff
+        command += offset
+        out[ii] = plant.step(command)
+
+
+class IncrementalSimulator():
+    '''
+    IncrementalSimulator Class
+
+    Runs simulate() while saving a snapshot of the state arrays of the bank
+    (integrator, previous error and state, derivative filters, gains and
+    generator position) and of the plant every interval samples. When the setpoint only changes from
+    some sample on, the run resumes from the last snapshot before that
+    sample, so the cost of an edit is proportional to the changed suffix and
+    the result is identical to a full simulate().
+    '''
+    def __init__(self,bank,dt,plant=None,offset=0.0,setpoint_noise=0.0,
+        interval=256,dtype=np.float64):
+        self.bank = bank
+        self.dt = dt
+        self.plant = Integrator() if plant is None else plant
+        self.offset = offset
+        self.setpoint_noise = setpoint_noise
+        self.interval = max(1,int(interval))
+        self.dtype = dtype
+        self.setpoint = None    # copy of the last simulated setpoint
+        self.out = None
+        self.snapshots = []     # snapshot jj is taken before sample jj*interval
+
+    def run(self,setpoint,out=None):
+        '''
+        full simulation from sample 0, drops every snapshot
+        '''
+        self.snapshots = []
+        return self.resume(setpoint,0,out)
+
+    def update(self,setpoint,out=None):
+        '''
+        resimulates from the first sample that differs from the last setpoint
+        '''
+        setpoint = np.asarray(setpoint)
+        if self.setpoint is None:
+            return self.run(setpoint,out)
+        length = min(len(setpoint),len(self.setpoint))
+        changed = np.flatnonzero(setpoint[:length] != self.setpoint[:length])
+        start = changed[0] if len(changed) else length
+        if start == len(setpoint) and len(setpoint) == len(self.setpoint):
+            return self.out
+        return self.resume(setpoint,start,out)
+
+    def resume(self,setpoint,start,out=None):
+        '''
+        resimulates samples start onwards, setpoint[:start] must be unchanged
+        '''
+        setpoint = np.asarray(setpoint)
+        time_length = len(setpoint)
+        self.allocate(time_length,out)
+
+        # restore the last snapshot at or before start, later ones are stale
+        index = min(min(start,time_length - 1)//self.interval,
+            len(self.snapshots) - 1)
+        del self.snapshots[index + 1:]
+        if index >= 0:
+            self.restore(index)
+        else:
+            index = 0
+            self.bank.reset()
+            self.plant.reset(self.bank.count,self.dt)
+            self.out[0] = self.plant.output()
+
+        ii = max(1,index*self.interval)
+        if not self.snapshots:
+            self.save()
+        while ii < time_length:
+            stop = min(time_length,(ii//self.interval + 1)*self.interval)
+            advance(self.bank,self.plant,setpoint,self.dt,self.out,ii,stop,
+                self.offset,self.setpoint_noise)
+            ii = stop
+            if ii < time_length:
+                self.save()
+
+        if self.setpoint is not None and len(self.setpoint) == time_length:
+            self.setpoint[start:] = setpoint[start:]
+        else:
+            self.setpoint = setpoint.copy()
+        return self.out
+
+    def allocate(self,time_length,out):
+        # keeps already simulated samples when the setpoint grows
+        if out is not None and out is not self.out:
+            if self.out is not None:
+                kept = min(len(out),len(self.out))
+                out[:kept] = self.out[:kept]
+            self.out = out
+        elif self.out is None or len(self.out) != time_length:
+            previous = self.out
+            self.out = np.zeros((time_length,self.bank.count),dtype=self.dtype)
+            if previous is not None:
+                kept = min(time_length,len(previous))
+                self.out[:kept] = previous[:kept]
+
+    def save(self):
+        self.snapshots.append((self.bank.snapshot(),self.plant.snapshot()))
+
+    def restore(self,index):
+        # copied into the bank and plant, the snapshot stays valid for later
+        # edits
+        bank, plant = self.snapshots[index]
+        self.bank.restore(bank)
+        self.plant.restore(plant)
@@ -0,0 +1,91 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: Cascaded PID loops advanced by one step function
+'''
+
+import numpy as np
+
+
+class Cascade():
+    '''
+    Cascade Class
+
+    Declares cascades as a graph of levels, each a PIDBank holding that
+    level for every cascade instance. A level tracks either an external
+    setpoint or the command of an earlier level (an outer position loop
+    feeding an inner velocity loop), so the graph is acyclic by
+    construction. A level with divider k runs every k-th tick with k*dt
+    and holds its command in between. compile() returns a step function
+    that loops over the levels in declaration order; each level advances
+    every instance in one PIDBank.command.
+    '''
+    def __init__(self,count):
+        self.count = count
+        self.names = []
+        self.levels = []        # (bank, source level or None, divider, external index)
+        self.externals = 0      # levels that track an external setpoint
+        self.tick = [0]
+        self.outputs = None
+
+    def add(self,name,bank,setpoint=None,divider=1):
+        '''
+        appends a level; setpoint names the level whose command it tracks,
+        None for an external setpoint
+        '''
+        if bank.count != self.count:
+            raise ValueError('every level needs one controller per cascade')
+        if name in self.names:
+            raise ValueError('level %s already exists' % name)
+        if setpoint is not None and setpoint not in self.names:
+            raise ValueError('unknown setpoint level %s' % setpoint)
+        if int(divider) < 1:
+            raise ValueError('divider must be a positive number of ticks')
+        source = None if setpoint is None else self.names.index(setpoint)
+        external = None
+        if source is None:
+            external = self.externals
+            self.externals += 1
+        self.names.append(name)
+        self.levels.append((bank,source,int(divider),external))
+        return self
+
+    def index(self,name):
+        # row of a level in the measurements and outputs
+        return self.names.index(name)
+
+    def reset(self):
+        self.tick[0] = 0
+        for bank, source, divider, external in self.levels:
+            bank.reset()
+        if self.outputs is not None:
+            self.outputs[:] = 0.0
+
+    def compile(self):
+        '''
+        step(measurements, setpoints, dt) for the declared graph, a plain
+        loop over the levels bound to the graph as it is now
+
+        measurements has one row per level, setpoints one row per external
+        level (rows may be scalars). Returns the commands of every level,
+        shape (levels, count); the levels nothing tracks drive the plant.
+        The returned array is reused by the next step.
+        '''
+        levels = tuple(self.levels)
+        outputs = np.zeros((len(levels),self.count))
+        tick = self.tick
+        self.outputs = outputs
+
+        def step(measurements,setpoints,dt):
+            t = tick[0]
+            for index, (bank, source, divider, external) in enumerate(levels):
+                if t % divider:
+                    continue
+                desired_state = setpoints[external] if source is None \
+                    else outputs[source]
+                outputs[index] = bank.command(measurements[index],
+                    desired_state,dt*divider)
+            tick[0] = t + 1
+            return outputs
+
+        return step
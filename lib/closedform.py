@@ -0,0 +1,168 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: Closed-form noise-free response of the PID loop at any sample
+'''
+
+from math import comb
+
+import numpy as np
+
+from . import setpoint
+
+# loop states: plant state, integrator, previous error, dirty derivative
+# (error or state), previous plant state
+STATES = 5
+
+
+class ClosedForm():
+    '''
+    ClosedForm Class
+
+    Noise-free loop of every controller of a bank around the implicit
+    integrator plant of PID.update, written as a linear state-transition
+    matrix. Within a setpoint segment the polynomial setpoint is generated
+    by a Pascal matrix appended to the loop states, so one augmented matrix
+    per segment advances any number of samples by repeated squaring. The
+    state at each segment start is computed once, after that the response
+    at any sample costs O(log N) whatever the horizon. Faults are not
+    modelled, a diverging loop gives inf or nan.
+    '''
+    def __init__(self,bank,profile="STEP",time_start=0.0,time_end=10.0,
+        hz=100.0,offset=0.0):
+        self.count = bank.count
+        self.dt = 1.0/float(hz)
+        self.time_start = float(time_start)
+        self.time_length = int(round((time_end - time_start)*hz))
+        self.transition, self.setpoint_input, self.constant_input = \
+            self.loop_matrices(bank)
+        # feed forward and steady state error add the same constant command
+        self.constant = bank.feed_forward + offset
+
+        segments = [segment for segment in
+            setpoint.segment_bounds(profile,self.time_length)
+            if segment[1] > segment[0]]
+        self.order = max(len(segment[3]) for segment in segments)
+        pascal = np.array([[comb(p,q) for q in range(self.order)]
+            for p in range(self.order)],dtype=np.float64)
+
+        # per segment: first sample, sample of the stored state, augmented
+        # transition and augmented state [loop states, (j**p)] at that sample
+        scale = setpoint.profile_scale(time_start,time_end)*self.dt
+        self.starts = []
+        self.bases = []
+        self.matrices = []
+        self.states = []
+        state = np.zeros((self.count,STATES))
+        for start, stop, center, coefficients in segments:
+            # sample 0 is the initial state, the loop only starts at sample 1
+            base = max(start - 1,0)
+            polynomial = self.polynomial(coefficients,
+                start*scale - center,scale)
+            matrix = np.zeros((self.count,STATES + self.order,STATES + self.order))
+            matrix[:,:STATES,:STATES] = self.transition
+            matrix[:,:STATES,STATES:] = self.setpoint_input[:,:,None]*polynomial
+            matrix[:,:STATES,STATES] += self.constant_input*self.constant[:,None]
+            matrix[:,STATES:,STATES:] = pascal
+            augmented = np.zeros((self.count,STATES + self.order))
+            augmented[:,:STATES] = state
+            augmented[:,STATES:] = (base + 1 - start)**np.arange(self.order)
+            self.starts.append(start)
+            self.bases.append(base)
+            self.matrices.append(matrix)
+            self.states.append(augmented)
+            state = self.advance(len(self.starts) - 1,stop - 1)[:,:STATES]
+        self.starts = np.array(self.starts)
+
+    def loop_matrices(self,bank):
+        '''
+        A, b and g of s_k = A s_k-1 + b r_k + g c for every controller
+        '''
+        dt = self.dt
+        sigma = 10.0 * dt                               # cutoff frequency for dirty derivative
+        beta = (2.0 * sigma - dt) / (2.0 * sigma + dt)  # dirty derivative gain
+        count = bank.count
+        transition = np.zeros((count,STATES,STATES))
+        setpoint_input = np.zeros((count,STATES))
+        constant_input = np.zeros(STATES)
+
+        # error, integrator and derivative of sample k
+        transition[:,2,0] = -1.0
+        setpoint_input[:,2] = 1.0
+        transition[:,1] = [-dt/2.0,1.0,dt/2.0,0.0,0.0]
+        setpoint_input[:,1] = dt/2.0
+        error_derivative = np.array([-(1.0 - beta)/dt,0.0,-(1.0 - beta)/dt,beta,0.0])
+        state_derivative = np.array([(1.0 - beta)/dt,0.0,0.0,beta,-(1.0 - beta)/dt])
+        kd_error = bank.kd_error[:,None]
+        transition[:,3] = np.where(kd_error,error_derivative,state_derivative)
+        setpoint_input[:,3] = np.where(bank.kd_error,(1.0 - beta)/dt,0.0)
+
+        # plant state x_k = x + kp e_k + ki I_k +- kd d_k + c
+        derivative_gain = np.where(bank.kd_error,bank.kd,-bank.kd)[:,None]
+        transition[:,0] = bank.kp[:,None]*transition[:,2] \
+            + bank.ki[:,None]*transition[:,1] + derivative_gain*transition[:,3]
+        transition[:,0,0] += 1.0
+        setpoint_input[:,0] = bank.kp*setpoint_input[:,2] \
+            + bank.ki*setpoint_input[:,1] + derivative_gain[:,0]*setpoint_input[:,3]
+        constant_input[0] = 1.0
+
+        # previous plant state
+        transition[:,4,0] = 1.0
+        return transition, setpoint_input, constant_input
+
+    def polynomial(self,coefficients,origin,scale):
+        '''
+        coefficients of the segment in powers of the samples j since its
+        start, from those in powers of u = origin + scale*j
+        '''
+        polynomial = np.zeros(self.order)
+        for p, coefficient in enumerate(coefficients):
+            for q in range(p + 1):
+                polynomial[q] += coefficient*comb(p,q)*origin**(p - q)*scale**q
+        return polynomial
+
+    def advance(self,segment,index):
+        # augmented state at sample index of a segment
+        steps = index - self.bases[segment]
+        power = np.linalg.matrix_power(self.matrices[segment],steps)
+        return np.einsum('nij,nj->ni',power,self.states[segment])
+
+    def response(self,indices):
+        '''
+        plant state at the sample indices, shape (len(indices), count)
+        '''
+        indices = np.atleast_1d(np.asarray(indices,dtype=np.int64))
+        if ((indices < 0) | (indices >= self.time_length)).any():
+            raise IndexError('sample index outside the horizon')
+        segments = np.searchsorted(self.starts,indices,side='right') - 1
+        out = np.empty((len(indices),self.count))
+        for ii, (index, segment) in enumerate(zip(indices,segments)):
+            out[ii] = 0.0 if index == 0 else self.advance(segment,index)[:,0]
+        return out
+
+    def time_response(self,times):
+        # response at the samples nearest to the given times
+        indices = np.rint((np.asarray(times) - self.time_start)/self.dt)
+        return self.response(np.clip(indices,0,self.time_length - 1).astype(np.int64))
+
+    def spectral_radius(self):
+        '''
+        largest eigenvalue magnitude of the loop, below 1 when stable
+        '''
+        return np.abs(np.linalg.eigvals(self.transition)).max(axis=-1)
+
+    def final_value(self):
+        '''
+        limit of the plant state if the last setpoint segment were held
+        forever, nan for unstable loops or a non-constant last segment
+        '''
+        polynomial = self.matrices[-1][:,:STATES,STATES + 1:]
+        values = np.full(self.count,np.nan)
+        stable = (self.spectral_radius() < 1.0) & ~polynomial.any(axis=(1,2))
+        if stable.any():
+            # fixed point of s = A s + (b r + g c)
+            drive = self.matrices[-1][stable,:STATES,STATES]
+            fixed = np.linalg.solve(np.eye(STATES) - self.transition[stable],
+                drive[:,:,None])
+            values[stable] = fixed[:,0,0]
+        return values
@@ -0,0 +1,200 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: Specialized step functions generated for fixed-gain PID controllers
+'''
+
+import copy
+import random
+from math import isfinite
+
+# finite floats lie strictly between the two literals, which the compiler
+# folds to -inf and inf, so the fault check needs no call
+FINITE = "not -1e400 < %s < 1e400"
+
+
+def controller_lines(controller,dt,suffix,mode):
+    '''
+    state variables and step lines of one controller with gains and dt
+    folded into literals
+
+    The state updates and fault checks are those of PID.step. A term of
+    zero gain is left out of the command, its value is checked instead
+    because PID adds 0.0 * inf = nan. After a fault PID has zero gains, so
+    the faulted command is the bias plus zero times every term.
+    '''
+    c = controller
+    for gain in (c.kp,c.ki,c.kd,c.feed_forward,c.noise_sigma):
+        if not isfinite(gain):
+            raise ValueError('gains must be finite')
+    sigma = 10.0 * dt                               # cutoff frequency for dirty derivative
+    beta = (2.0 * sigma - dt) / (2.0 * sigma + dt)  # dirty derivative gain
+    name = lambda variable: variable + suffix
+    faulted, integrator = name("faulted"), name("integrator")
+    previous_error, derivative = name("previous_error"), name("derivative")
+    previous_state, command = name("previous_state"), name("command")
+    current_state, state_error = name("current_state"), name("state_error")
+    state = [faulted,integrator,previous_error,derivative]
+    if not c.kd_error:
+        state.append(previous_state)
+    bias = current_state if mode == "update" else "0.0"
+    reset = ["    %s = 0.0" % variable for variable in state[1:]]
+
+    lines = ["%s = desired_state%s - %s" % (state_error,suffix,current_state),
+        "%s += %r * (%s + %s)" % (integrator,dt/2.0,state_error,previous_error)]
+    if c.kd_error:
+        difference = (state_error,previous_error)
+    else:
+        difference = (current_state,previous_state)
+    lines.append("%s = %r * %s + %r * (%s - %s) / %r" % ((derivative,beta,derivative,
+        1.0 - beta) + difference + (dt,)))
+    lines += ["if %s:" % (FINITE % derivative),"    %s = True" % faulted] + reset
+
+    # same order of additions as PID.step, a gain of one is not multiplied
+    term = lambda gain, value: value if gain == 1.0 else "%r * %s" % (gain,value)
+    sign = " + " if c.kd_error else " - "
+    terms = [] if mode == "command" else [bias]
+    dropped = []
+    if c.kp != 0.0:
+        terms.append(term(c.kp,state_error))
+    else:
+        dropped.append(state_error)
+    if c.ki != 0.0:
+        terms.append(term(c.ki,integrator))
+    else:
+        dropped.append(integrator)
+    expression = " + ".join(terms)
+    # the derivative is finite past its own check
+    if c.kd != 0.0:
+        expression += (sign if expression else sign.strip()) + term(c.kd,derivative)
+    if c.feed_forward != 0.0:
+        expression += (" + " if expression else "") + repr(c.feed_forward)
+    lines += ["if %s:" % faulted,"    %s = %s + 0.0 * %s + 0.0 * %s%s0.0 * %s + 0.0" % (
+        command,bias,state_error,integrator,sign,derivative),"else:",
+        "    %s = %s" % (command,expression or "0.0")]
+
+    # PID.fault leaves noise_sigma alone
+    if c.noise_sigma:
+        lines.append("%s += %r * gauss(0.0, 1.0)" % (command,c.noise_sigma))
+    checks = [FINITE % variable for variable in [command] + dropped]
+    lines += ["if %s:" % " or ".join(checks),"    %s = True" % faulted] + reset
+    lines.append("    %s = 0.0" % command)
+    lines.append("%s = %s" % (previous_error,state_error))
+    if not c.kd_error:
+        lines.append("%s = %s" % (previous_state,current_state))
+    return state, lines
+
+def generate(controllers,dt,mode="update",name="make_step"):
+    '''
+    source of a factory returning a step function for fixed gains
+
+    For one controller the step function is step(current_state,
+    desired_state) and returns what PID.update (mode "update") or
+    PID.command (mode "command") would. For a list of controllers it takes
+    and returns one value per controller. The state lives in closure cells
+    of the factory, call it again for a reset controller.
+    '''
+    single = not isinstance(controllers,(list,tuple))
+    if single:
+        controllers = [controllers]
+    if mode not in ("update","command"):
+        raise ValueError('mode must be update or command')
+    suffixes = [""] if single else ["_%d" % ii for ii in range(len(controllers))]
+
+    state, body = [], []
+    for controller, suffix in zip(controllers,suffixes):
+        controller_state, lines = controller_lines(controller,dt,suffix,mode)
+        state += controller_state
+        body += lines
+    commands = ["command" + suffix for suffix in suffixes]
+
+    source = ["def %s(gauss=random.gauss):" % name]
+    source += ["    %s = %s" % (variable,"False" if variable.startswith("faulted")
+        else "0.0") for variable in state]
+    if single:
+        source.append("    def step(current_state, desired_state):")
+    else:
+        source += ["    def step(current_states, desired_states):"]
+    source.append("        nonlocal %s" % ", ".join(state))
+    if not single:
+        source += ["        %s, = current_states" % ", ".join("current_state" + s
+            for s in suffixes),"        %s, = desired_states" % ", ".join(
+            "desired_state" + s for s in suffixes)]
+    source += ["        " + line for line in body]
+    source.append("        return %s" % (commands[0] if single
+        else "[%s]" % ", ".join(commands)))
+    source.append("    return step")
+    return "\n".join(source) + "\n"
+
+def compile_step(controllers,dt,mode="update",samples=2000,seed=0):
+    '''
+    step function generated for controllers, verified against the generic
+    path before it is returned
+    '''
+    source = generate(controllers,dt,mode)
+    namespace = {"random" : random}
+    exec(compile(source,"<generated pid>","exec"),namespace)
+    factory = namespace["make_step"]
+    difference = verify(controllers,factory,dt,mode,samples,seed)
+    if difference != 0.0:
+        raise ValueError('generated step differs from PID by %g' % difference)
+    return factory()
+
+def export(controllers,dt,path,mode="update"):
+    '''
+    writes the generated factory as a module with make_step()
+    '''
+    compile_step(controllers,dt,mode)
+    with open(path,"w") as module:
+        module.write("'''\nGenerated fixed-gain PID step, dt = %r, mode %s\n'''\n\n"
+            "import random\n\n\n" % (dt,mode))
+        module.write(generate(controllers,dt,mode))
+
+def verify(controllers,factory,dt,mode="update",samples=2000,seed=0):
+    '''
+    largest difference between the generated step and copies of the
+    controllers fed the same measurements and setpoints
+
+    The measurements do not follow the commands, so an unstable loop cannot
+    overflow into a false difference. Besides samples of bounded random
+    inputs the fault path is run: a setpoint growing until it overflows and
+    a nan measurement, each followed by bounded inputs.
+    '''
+    single = not isinstance(controllers,(list,tuple))
+    controllers = [controllers] if single else controllers
+    inputs = random.Random(seed)
+    bounded = lambda count: [[(inputs.uniform(-2.0,2.0),inputs.uniform(-2.0,2.0))
+        for c in controllers] for ii in range(count)]
+    ramp = []
+    setpoint = 1.0
+    while setpoint < float('inf'):
+        setpoint *= 1.1
+        ramp.append([(0.0,setpoint)]*len(controllers))
+    episodes = [bounded(samples),ramp + bounded(100),
+        [[(float('nan'),0.0)]*len(controllers)] + bounded(100)]
+
+    difference = 0.0
+    count = 0
+    state = random.getstate()
+    try:
+        for episode in episodes:
+            generic = [copy.deepcopy(c) for c in controllers]
+            for c in generic:
+                c.reset()
+            step = factory()
+            for pairs in episode:
+                random.seed(seed + count)
+                expected = [getattr(c,mode)(x,r,dt) for c, (x, r) in
+                    zip(generic,pairs)]
+                random.seed(seed + count)
+                count += 1
+                if single:
+                    actual = [step(*pairs[0])]
+                else:
+                    actual = step([x for x, r in pairs],[r for x, r in pairs])
+                for e, a in zip(expected,actual):
+                    if e != a and not (e != e and a != a):
+                        difference = max(difference,abs(e - a))
+    finally:
+        random.setstate(state)
+    return difference
@@ -0,0 +1,98 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: FFT convolution of setpoint batches with closed loop impulse responses
+'''
+
+import numpy as np
+
+from .bank import simulate
+
+
+class ConvolutionEngine():
+    '''
+    ConvolutionEngine Class
+
+    Without noise the closed loop of a controller and a linear plant is
+    linear and time invariant, so its response to any setpoint is the
+    setpoint convolved with one impulse response, plus the response to the
+    constant command of feed forward and steady state error. Both responses
+    are simulated once per gain set with the regular loop and setpoint
+    batches are then convolved with real FFTs, block by block (overlap-add)
+    for inputs longer than the block. The setpoint of sample 0 is ignored,
+    like in the loop, which starts at sample 1.
+    '''
+    def __init__(self,bank,dt,length,plant=None,offset=0.0,tolerance=1e-13,
+        block=None):
+        self.count = bank.count
+        self.dt = dt
+        self.length = int(length)
+
+        # response to a unit setpoint at sample 1 is the impulse response
+        # delayed by one sample; the constant response needs a unit command
+        bank = bank.copy()
+        bank.noise_sigma[:] = 0.0
+        constant = bank.feed_forward + offset
+        bank.feed_forward[:] = 0.0
+        impulse = np.zeros(self.length + 1)
+        impulse[1] = 1.0
+        gains = bank.copy()
+        response = simulate(bank,impulse,dt,plant=None if plant is None
+            else plant.clone())
+        unit = gains.copy()
+        unit.feed_forward[:] = 1.0
+        step = simulate(unit,np.zeros(self.length),dt,plant=None if plant is None
+            else plant.clone())
+        # faulted controllers have their gains zeroed, the loop is not
+        # linear for them
+        for name in ("kp","ki","kd"):
+            if (getattr(bank,name) != getattr(gains,name)).any() \
+                or (getattr(unit,name) != getattr(gains,name)).any():
+                raise ValueError('closed loop overflows within the horizon')
+        self.constant_response = step*constant          # (length, count)
+
+        # the decayed tail of the impulse response is dropped
+        self.impulse_response = response[1:]            # (length, count)
+        magnitude = np.abs(self.impulse_response).max(axis=1)
+        significant = np.flatnonzero(magnitude > tolerance*max(magnitude.max(),
+            np.finfo(np.float64).tiny))
+        taps = significant[-1] + 1 if len(significant) else 1
+        self.impulse_response = self.impulse_response[:taps]
+
+        # fft size for overlap-add blocks, a power of two
+        self.block = max(taps,1024) if block is None else int(block)
+        self.size = 1
+        while self.size < self.block + taps - 1:
+            self.size *= 2
+        self.transfer = np.fft.rfft(self.impulse_response,self.size,axis=0)
+
+    def convolve(self,setpoints,out=None):
+        '''
+        responses to a batch of setpoints, shape (T, batch) or (T,), with
+        T at most length; returns shape (T, batch, count) or (T, count)
+        '''
+        setpoints = np.asarray(setpoints,dtype=np.float64)
+        single = setpoints.ndim == 1
+        if single:
+            setpoints = setpoints[:,None]
+        time_length, batch = setpoints.shape
+        if time_length > self.length:
+            raise ValueError('setpoints longer than the impulse response horizon')
+        if out is None:
+            out = np.empty((time_length,batch,self.count))
+        taps = len(self.impulse_response)
+
+        # constant command, then every block added where it lands
+        out[:] = self.constant_response[:time_length,None,:]
+        for start in range(0,time_length,self.block):
+            stop = min(start + self.block,time_length)
+            segment = setpoints[start:stop]
+            if start == 0:
+                segment = segment.copy()
+                segment[0] = 0.0
+            spectrum = np.fft.rfft(segment,self.size,axis=0)
+            block = np.fft.irfft(spectrum[:,:,None]*self.transfer[:,None,:],
+                self.size,axis=0)
+            end = min(stop + taps - 1,time_length)
+            out[start:end] += block[:end - start]
+        return out[:,0] if single else out
@@ -0,0 +1,181 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: Frequency-domain analysis of the discrete PID controller
+'''
+
+import numpy as np
+
+from .plant import Integrator
+
+
+def pid_transfer_function(kp,ki,kd,dt):
+    '''
+    exact z-domain transfer function from error to command of PID
+
+    The trapezoidal integrator contributes dt/2 (z + 1)/(z - 1) and the dirty
+    derivative (1 - beta)/dt (z - 1)/(z - beta). Gains may be arrays of any
+    broadcastable shape; numerator and denominator come back with one extra
+    trailing axis of coefficients in descending powers of z. The derivative
+    on state variant has the same loop transfer function, only its setpoint
+    response differs. Without integral gain the integrator pole at z = 1
+    cancels against the numerator; it is replaced by a pole at the origin
+    so closed loop poles only hold modes that reach the command.
+    '''
+    kp, ki, kd = np.broadcast_arrays(*(np.asarray(g,dtype=np.float64)
+        for g in (kp,ki,kd)))
+    sigma = 10.0 * dt                               # cutoff frequency for dirty derivative
+    beta = (2.0 * sigma - dt) / (2.0 * sigma + dt)  # dirty derivative gain
+
+    proportional = np.array([1.0,-(1.0 + beta),beta])   # (z - 1)(z - beta)
+    integral = np.array([1.0,1.0 - beta,-beta])         # (z + 1)(z - beta)
+    derivative = np.array([1.0,-2.0,1.0])               # (z - 1)^2
+    # the same with z in place of z - 1 for the gain sets without ki
+    cancelled = (ki == 0.0)[...,None]
+    proportional = np.where(cancelled,[1.0,-beta,0.0],proportional)
+    derivative = np.where(cancelled,[1.0,-1.0,0.0],derivative)
+
+    numerator = kp[...,None]*proportional \
+        + (ki*dt/2.0)[...,None]*integral \
+        + (kd*(1.0 - beta)/dt)[...,None]*derivative
+    denominator = np.broadcast_to(proportional,numerator.shape).copy()
+    return numerator, denominator
+
+def loop_transfer_function(kp,ki,kd,dt,plant=None):
+    '''
+    open loop of controller, plant and the one sample measurement delay
+
+    plant defaults to the implicit integrator of PID.update.
+    '''
+    if plant is None:
+        plant = Integrator()
+    numerator, denominator = pid_transfer_function(kp,ki,kd,dt)
+    plant_numerator, plant_denominator = plant.transfer_function(dt)
+    plant_numerator = plant_numerator/plant_denominator[0]
+    plant_denominator = plant_denominator/plant_denominator[0]
+    numerator = polymul(numerator,plant_numerator)
+    denominator = polymul(denominator,np.append(plant_denominator,0.0))
+    return numerator, denominator
+
+def polymul(a,b):
+    '''
+    product of polynomials stored along the last axis, batched
+    '''
+    a = np.asarray(a)
+    b = np.asarray(b)
+    shape = np.broadcast_shapes(a.shape[:-1],b.shape[:-1])
+    product = np.zeros(shape + (a.shape[-1] + b.shape[-1] - 1,))
+    for ii in range(b.shape[-1]):
+        product[...,ii:ii + a.shape[-1]] += a*b[...,ii,None]
+    return product
+
+def polyval(coefficients,z):
+    '''
+    batched Horner evaluation, returns shape coefficients.shape[:-1] + z.shape
+    '''
+    z = np.asarray(z)
+    value = np.zeros(coefficients.shape[:-1] + z.shape,dtype=np.complex128)
+    for ii in range(coefficients.shape[-1]):
+        value *= z
+        value += coefficients[(Ellipsis,ii) + (None,)*z.ndim]
+    return value
+
+def frequency_grid(dt,count=512,decades=3.0):
+    '''
+    log spaced angular frequencies up to the Nyquist frequency
+    '''
+    nyquist = np.pi/dt
+    return np.logspace(np.log10(nyquist) - decades,np.log10(nyquist),count)
+
+def frequency_response(numerator,denominator,dt,frequencies):
+    '''
+    transfer function evaluated on the unit circle for every gain set
+    '''
+    z = np.exp(1j*np.asarray(frequencies)*dt)
+    with np.errstate(divide='ignore',invalid='ignore'):
+        return polyval(numerator,z)/polyval(denominator,z)
+
+def margins(response,frequencies):
+    '''
+    gain and phase margins of open loop responses, shape (..., frequencies)
+
+    Returns the gain margin (linear), phase margin (degrees) and the phase
+    and gain crossover frequencies. Margins are inf and crossovers nan where
+    no crossing exists on the grid; with several crossings the binding one
+    is reported.
+    '''
+    frequencies = np.asarray(frequencies)
+    with np.errstate(divide='ignore',invalid='ignore'):
+        log_magnitude = np.log(np.abs(response))
+    phase = np.degrees(np.unwrap(np.angle(response),axis=-1))
+
+    # phase crossovers: the phase passes -180 degrees modulo 360
+    turns = (phase + 180.0)/360.0
+    low, high = turns[...,:-1], turns[...,1:]
+    crossed = np.floor(np.maximum(low,high))
+    mask = (crossed > np.minimum(low,high)) & np.isfinite(log_magnitude[...,:-1]) \
+        & np.isfinite(log_magnitude[...,1:])
+    with np.errstate(divide='ignore',invalid='ignore'):
+        fraction = np.where(mask,(crossed - low)/(high - low),0.0)
+    crossing_magnitude = log_magnitude[...,:-1] \
+        + fraction*(log_magnitude[...,1:] - log_magnitude[...,:-1])
+    # the binding crossing is the one whose magnitude is closest to one,
+    # conditionally stable loops can report a margin below one
+    distance = np.where(mask,np.abs(crossing_magnitude),np.inf)
+    index = distance.argmin(axis=-1)
+    gain_margin = np.exp(-np.take_along_axis(crossing_magnitude,
+        index[...,None],axis=-1)[...,0])
+    gain_margin[~mask.any(axis=-1)] = np.inf
+    phase_crossover = interpolate(frequencies,fraction,index)
+    phase_crossover[~mask.any(axis=-1)] = np.nan
+
+    # gain crossovers: the magnitude passes one
+    low, high = log_magnitude[...,:-1], log_magnitude[...,1:]
+    mask = (np.sign(low) != np.sign(high)) & np.isfinite(low) & np.isfinite(high)
+    with np.errstate(divide='ignore',invalid='ignore'):
+        fraction = np.where(mask,-low/(high - low),0.0)
+    crossing_phase = phase[...,:-1] + fraction*(phase[...,1:] - phase[...,:-1])
+    margin = np.mod(crossing_phase + 180.0,360.0)
+    margin = np.where(margin > 180.0,margin - 360.0,margin)
+    phase_margin = np.where(mask,margin,np.inf).min(axis=-1)
+    index = np.where(mask,margin,np.inf).argmin(axis=-1)
+    gain_crossover = interpolate(frequencies,fraction,index)
+    gain_crossover[~mask.any(axis=-1)] = np.nan
+
+    return gain_margin, phase_margin, phase_crossover, gain_crossover
+
+def interpolate(frequencies,fraction,index):
+    # frequency at a fractional position inside the grid interval index
+    fraction = np.take_along_axis(fraction,index[...,None],axis=-1)[...,0]
+    return frequencies[index] + fraction*(frequencies[index + 1] - frequencies[index])
+
+def closed_loop_poles(kp,ki,kd,dt,plant=None):
+    '''
+    roots of the closed loop characteristic polynomial for every gain set
+    '''
+    numerator, denominator = loop_transfer_function(kp,ki,kd,dt,plant)
+    characteristic = denominator.copy()
+    characteristic[...,-numerator.shape[-1]:] += numerator
+    # the characteristic polynomial is monic, eigenvalues of its companion
+    # matrices give all roots in one batched call
+    order = characteristic.shape[-1] - 1
+    companion = np.zeros(characteristic.shape[:-1] + (order,order))
+    companion[...,0,:] = -characteristic[...,1:]
+    companion[...,np.arange(1,order),np.arange(order - 1)] = 1.0
+    return np.linalg.eigvals(companion)
+
+def is_stable(kp,ki,kd,dt,plant=None):
+    '''
+    True where every closed loop pole lies inside the unit circle
+    '''
+    return (np.abs(closed_loop_poles(kp,ki,kd,dt,plant)) < 1.0).all(axis=-1)
+
+def analyze(kp,ki,kd,dt,plant=None,frequencies=None):
+    '''
+    loop frequency response and margins for whole arrays of gain sets
+    '''
+    if frequencies is None:
+        frequencies = frequency_grid(dt)
+    numerator, denominator = loop_transfer_function(kp,ki,kd,dt,plant)
+    response = frequency_response(numerator,denominator,dt,frequencies)
+    return (frequencies,response) + margins(response,frequencies)
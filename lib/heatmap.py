@@ -0,0 +1,209 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: Gain-space heatmap tab for PID control GUI
+'''
+
+import sys
+import threading
+
+if sys.version_info[0] < 3:
+    import Tkinter as tk
+    import ttk
+else:
+    import tkinter as tk
+    from tkinter import ttk
+
+from .sweep import METRICS, ProgressiveGrid, evaluate
+from .tab import GAINS
+
+import numpy as np
+from matplotlib.backends.backend_tkagg import (
+    FigureCanvasTkAgg, NavigationToolbar2Tk)
+from matplotlib.figure import Figure
+
+# gain planes offered by the heatmap, x gain then y gain
+PLANES = {
+    "kp x ki" : ("kp","ki"),
+    "kp x kd" : ("kp","kd"),
+    }
+
+
+class HeatmapTab():
+    '''
+    HeatmapTab Class
+
+    Shows a metric over a plane of two gains for the setpoint profile,
+    plant and remaining gains of one controller slot of a controller tab.
+    A background thread fills a ProgressiveGrid coarse to fine with batched
+    simulations and the image is refreshed as results arrive; zooming
+    refines the visible region first and clicking a cell loads its gains
+    into the slot.
+    '''
+    def __init__(self, master, notebook, tabs, resolution=64):
+        self.master = master
+        self.notebook = notebook
+        self.tabs = tabs        # controller tabs by profile name
+        self.resolution = resolution
+        self.initialized = False
+        self.worker = None
+        self.running = False
+        self.lock = threading.Lock()
+        self.grid = None
+
+        self.tab = ttk.Frame(self.notebook)
+        self.notebook.add(self.tab, text="GAIN HEATMAP")
+        for x in range(6):
+            tk.Grid.columnconfigure(self.tab,x,weight=1)
+        for y in range(12):
+            tk.Grid.rowconfigure(self.tab,y,weight=1)
+
+    def run(self):
+        if not(self.initialized):
+            self.initialize()
+            self.initialized = True
+
+    def initialize(self):
+        self.fig = Figure(figsize=(8,5))
+        self.canvas = FigureCanvasTkAgg(self.fig, master=self.tab)
+        self.canvas.get_tk_widget().grid(row=0,rowspan=9,column=0,columnspan=6)
+        # zoom and pan of the toolbar steer the refinement
+        toolbar_frame = ttk.Frame(self.tab)
+        toolbar_frame.grid(row=9,column=0,columnspan=6,sticky=tk.W)
+        self.toolbar = NavigationToolbar2Tk(self.canvas,toolbar_frame)
+        self.canvas.mpl_connect('button_press_event',self.click)
+
+        self.profile_var = self.combobox(0,'Profile',list(self.tabs))
+        self.plane_var = self.combobox(1,'Plane',list(PLANES))
+        self.metric_var = self.combobox(2,'Metric',list(METRICS))
+        slot_label = ttk.Label(self.tab, anchor=tk.CENTER,
+            text='Controller #',foreground='midnight blue')
+        slot_label.grid(row=10,column=3,sticky=tk.E+tk.W,padx=5,pady=5)
+        self.slot_var = tk.IntVar(self.tab)
+        self.slot_var.set(1)
+        slot_entry = ttk.Entry(self.tab,textvariable=self.slot_var)
+        slot_entry.bind("<Return>",lambda event: self.restart())
+        slot_entry.grid(row=11,column=3,sticky=tk.E+tk.W,padx=5,pady=5)
+        self.status_var = tk.StringVar(self.tab)
+        status_label = ttk.Label(self.tab,textvariable=self.status_var)
+        status_label.grid(row=11,column=4,columnspan=2,sticky=tk.W,padx=5,pady=5)
+
+        self.restart()
+        self.poll()
+
+    def combobox(self,column,text,values):
+        label = ttk.Label(self.tab, anchor=tk.CENTER,
+            text=text,foreground='midnight blue')
+        label.grid(row=10,column=column,sticky=tk.E+tk.W,padx=5,pady=5)
+        var = tk.StringVar(self.tab)
+        var.set(values[0])
+        combobox = ttk.Combobox(self.tab,textvariable=var,values=values,
+            state='readonly')
+        combobox.bind("<<ComboboxSelected>>",lambda event: self.restart())
+        combobox.grid(row=11,column=column,sticky=tk.E+tk.W,padx=5,pady=5)
+        return var
+
+    def slot(self):
+        tab = self.tabs[self.profile_var.get()]
+        tab.run()
+        try:
+            index = int(self.slot_var.get()) - 1
+        except (ValueError, tk.TclError):
+            index = 0
+        index = int(np.clip(index,0,tab.controller_count - 1))
+        self.slot_var.set(index + 1)
+        return tab, index
+
+    def restart(self):
+        # new grid for the current profile, plane, metric and slot
+        self.stop()
+        tab, index = self.slot()
+        x_name, y_name = PLANES[self.plane_var.get()]
+        ranges = dict((name,(low,high)) for name, low, high, text in GAINS)
+        self.grid = ProgressiveGrid(ranges[x_name],ranges[y_name],
+            self.resolution)
+
+        # every other gain of the slot is held fixed
+        controllers = tab.controllers
+        fixed = dict((name,getattr(controllers,name)[index]) for name in
+            ("kp","ki","kd","kd_error","feed_forward"))
+        job = (x_name,y_name,fixed,tab.simulation.setpoint.copy(),
+            tab.simulation.time.copy(),tab.simulation.dt,self.metric_var.get(),
+            tab.simulation.plant,tab.steady_state_error)
+
+        self.fig.clear()
+        self.my_plot = self.fig.add_subplot(111)
+        self.image = self.my_plot.imshow(self.grid.values,origin='lower',
+            aspect='auto',interpolation='nearest',
+            extent=self.grid.extent())
+        self.colorbar = self.fig.colorbar(self.image,ax=self.my_plot)
+        self.my_plot.set_xlabel(x_name)
+        self.my_plot.set_ylabel(y_name)
+        self.my_plot.set_title('%s, %s profile' % (self.metric_var.get(),
+            self.profile_var.get()))
+        self.my_plot.callbacks.connect('xlim_changed',self.zoom)
+        self.canvas.draw()
+        self.status_var.set('')
+
+        self.running = True
+        self.worker = threading.Thread(target=self.refine,args=job)
+        self.worker.daemon = True
+        self.worker.start()
+
+    def stop(self):
+        self.running = False
+        if self.worker is not None:
+            self.worker.join()
+            self.worker = None
+
+    def refine(self,x_name,y_name,fixed,setpoint,time,dt,metric,plant,offset):
+        # background thread, only the grid bookkeeping holds the lock
+        grid = self.grid
+        while self.running:
+            with self.lock:
+                batch = grid.next_batch()
+                x, y = grid.points(batch)
+            if not batch:
+                return
+            gains = dict(fixed)
+            gains[x_name] = x
+            gains[y_name] = y
+            values = evaluate(gains,setpoint,time,dt,metric,plant,offset)
+            with self.lock:
+                grid.apply(batch,values)
+
+    def poll(self):
+        # redraws the image with whatever results have arrived
+        if self.grid is not None and self.status_var.get() != 'complete':
+            with self.lock:
+                values = self.grid.values.copy()
+                done = self.grid.done()
+                evaluated = self.grid.evaluated
+            finite = values[np.isfinite(values)]
+            if len(finite):
+                low, high = np.percentile(finite,[2.0,98.0])
+                self.image.set_clim(low,max(high,low + 1e-12))
+            self.image.set_data(values)
+            self.status_var.set('complete' if done else
+                'refining, %d%% of cells evaluated' % (100*evaluated/values.size))
+            self.canvas.draw_idle()
+        self.tab.after(200,self.poll)
+
+    def zoom(self,axes):
+        # the visible region is refined first
+        if self.grid is None:
+            return
+        with self.lock:
+            self.grid.set_focus(axes.get_xlim(),axes.get_ylim())
+
+    def click(self,event):
+        if event.inaxes is not self.my_plot or event.button != 1:
+            return
+        # a plain click loads the cell gains, tool modes (zoom, pan) do not
+        if self.toolbar.mode:
+            return
+        tab, index = self.slot()
+        x_name, y_name = PLANES[self.plane_var.get()]
+        ix = int(np.abs(self.grid.x - event.xdata).argmin())
+        iy = int(np.abs(self.grid.y - event.ydata).argmin())
+        tab.load_gains(index,{x_name : self.grid.x[ix],y_name : self.grid.y[iy]})
@@ -0,0 +1,164 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: Real-time control loop thread with ring buffers for live plots
+'''
+
+import itertools
+import threading
+import time
+
+import numpy as np
+
+from .plant import Integrator
+
+
+class RingBuffer():
+    '''
+    fixed window of the latest rows, preallocated once, nan until written
+    '''
+    def __init__(self,length,width,dtype=np.float64):
+        self.data = np.full((length,width),np.nan,dtype=dtype)
+        self.index = 0          # row written next
+        self.filled = 0
+
+    def append(self,row):
+        self.data[self.index] = row
+        self.index += 1
+        if self.index == len(self.data):
+            self.index = 0
+        self.filled = min(self.filled + 1,len(self.data))
+
+    def ordered(self,out):
+        # oldest to newest into out, which has the shape of data
+        head = len(self.data) - self.index
+        out[:head] = self.data[self.index:]
+        out[head:] = self.data[:self.index]
+        return out
+
+
+def looped(values):
+    '''
+    endless setpoint feed that repeats values, e.g. a simulation profile
+    '''
+    return itertools.cycle(np.asarray(values,dtype=np.float64).tolist())
+
+
+class LiveLoop():
+    '''
+    LiveLoop Class
+
+    Runs a bank against a plant on its own thread, one sample every dt of
+    wall clock time, with setpoints drawn from an iterator (a simulated or
+    replayed feed) plus setpoint_noise times one fresh normal draw per
+    sample. The latest window samples of time, setpoint and states are kept
+    in ring buffers. The loop computes a sample without holding the lock
+    and only takes it to append the row and to pick up the changes queued
+    by set_gain() and set_input(); snapshot() holds it for the copy. Drawing
+    therefore never waits for a sample to be computed, though both threads
+    still share the GIL. A loop that falls more than a sample behind
+    restarts its schedule from the current time instead of catching up in
+    a burst. Memory stays constant however long it runs.
+    '''
+    def __init__(self,bank,dt,source,window=1000,plant=None,offset=0.0,
+        setpoint_noise=0.0,realtime=True):
+        self.bank = bank
+        self.dt = dt
+        self.source = iter(source)
+        self.plant = Integrator() if plant is None else plant
+        self.offset = offset
+        self.setpoint_noise = setpoint_noise
+        self.realtime = realtime
+        self.lock = threading.Lock()
+        self.thread = None
+        self.running = False
+        self.changes = []       # (name, index or None, value) for the next sample
+        self.samples = 0
+        self.overruns = 0       # samples computed later than their deadline
+        self.lateness = 0.0     # worst delay past a deadline, seconds
+        self.slipped = 0        # samples of delay given up instead of caught up
+
+        # column 0 time, column 1 setpoint, then one column per controller
+        self.buffer = RingBuffer(window,2 + bank.count)
+        self.view = np.zeros_like(self.buffer.data)
+
+    def start(self):
+        self.bank.reset()
+        self.plant.reset(self.bank.count,self.dt)
+        self.state = self.plant.output().copy()
+        self.running = True
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def run(self):
+        row = np.zeros(2 + self.bank.count)
+        deadline = time.perf_counter()
+        for desired_state in self.source:
+            if not self.running:
+                return
+            if self.realtime:
+                deadline += self.dt
+                delay = deadline - time.perf_counter()
+                if delay > 0.0:
+                    time.sleep(delay)
+                else:
+                    self.overruns += 1
+                    self.lateness = max(self.lateness,-delay)
+                    if -delay > self.dt:
+                        self.slipped += int(-delay/self.dt)
+                        deadline = time.perf_counter()
+
+            if self.changes:
+                self.apply()
+            if self.setpoint_noise:
+                desired_state = desired_state \
+                    + self.setpoint_noise*self.bank.rng.standard_normal()
+            command = self.bank.command(self.state,desired_state,self.dt)
+            command += self.offset
+            self.state[:] = self.plant.step(command)
+            row[0] = (self.samples + 1)*self.dt
+            row[1] = desired_state
+            row[2:] = self.state
+            with self.lock:
+                self.samples += 1
+                self.buffer.append(row)
+        self.running = False
+
+    def set_gain(self,name,index,value):
+        # gains may change while the loop runs, from the next sample on
+        with self.lock:
+            self.changes.append((name,index,value))
+
+    def set_input(self,name,value):
+        # offset or setpoint_noise, from the next sample on
+        if name not in ("offset","setpoint_noise"):
+            raise ValueError('unknown input %s' % name)
+        with self.lock:
+            self.changes.append((name,None,value))
+
+    def apply(self):
+        with self.lock:
+            changes, self.changes = self.changes, []
+        for name, index, value in changes:
+            if index is None:
+                setattr(self,name,value)
+            else:
+                getattr(self.bank,name)[index] = value
+
+    def snapshot(self):
+        '''
+        time relative to the newest sample, setpoint and states, oldest first
+        '''
+        with self.lock:
+            self.buffer.ordered(self.view)
+            newest = self.samples*self.dt
+        view = self.view
+        view[:,0] -= newest
+        return view[:,0], view[:,1], view[:,2:]
@@ -0,0 +1,82 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: Response metrics of simulated trajectories
+'''
+
+import numpy as np
+
+
+def tracking_error(states,setpoint):
+    # setpoint shape (T,) or like states, states shape (T,) or (T, controllers)
+    states = np.asarray(states)
+    setpoint = np.asarray(setpoint)
+    if setpoint.ndim < states.ndim:
+        setpoint = setpoint.reshape(setpoint.shape + (1,)*(states.ndim - setpoint.ndim))
+    return setpoint - states
+
+def iae(states,setpoint,dt):
+    '''
+    integral of the absolute tracking error, per controller
+    '''
+    return np.abs(tracking_error(states,setpoint)).sum(axis=0)*dt
+
+def ise(states,setpoint,dt):
+    '''
+    integral of the squared tracking error, per controller
+    '''
+    return (tracking_error(states,setpoint)**2).sum(axis=0)*dt
+
+def last_step(setpoint):
+    '''
+    first sample of the final setpoint level and the size of the change
+    that led to it, zero when the setpoint never changes
+    '''
+    setpoint = np.asarray(setpoint)
+    changes = np.flatnonzero(setpoint[1:] != setpoint[:-1])
+    if not len(changes):
+        return 0, 0.0
+    start = changes[-1] + 1
+    return start, setpoint[-1] - setpoint[start - 1]
+
+def overshoot(states,setpoint):
+    '''
+    largest excursion past the final setpoint after its last change, as a
+    fraction of that change, nan where the setpoint never changes
+    '''
+    setpoint = np.asarray(setpoint)
+    start, size = last_step(setpoint)
+    error = tracking_error(np.asarray(states)[start:],setpoint[-1])
+    if size == 0.0:
+        return np.full(error.shape[1:],np.nan)
+    return np.maximum((-error*np.sign(size)).max(axis=0)/abs(size),0.0)
+
+def settling_time(time,states,setpoint,tolerance=0.02):
+    '''
+    time from the last setpoint change until the states stay within
+    tolerance times that change of the final setpoint, nan where they
+    never settle or the setpoint never changes
+    '''
+    setpoint = np.asarray(setpoint)
+    start, size = last_step(setpoint)
+    time = np.asarray(time)[start:] - np.asarray(time)[start]
+    error = tracking_error(np.asarray(states)[start:],setpoint[-1])
+    outside = np.abs(error) > tolerance*abs(size)
+    if size == 0.0:
+        return np.full(error.shape[1:],np.nan)
+    # index of the last sample outside the band
+    last = len(time) - 1 - outside[::-1].argmax(axis=0)
+    settled = np.where(outside.any(axis=0),
+        time[np.minimum(last + 1,len(time) - 1)],0.0)
+    return np.where(outside[-1],np.nan,settled)
+
+def summary(time,states,setpoint,dt):
+    '''
+    every metric as a dict of arrays, one entry per controller
+    '''
+    return {
+        "iae" : iae(states,setpoint,dt),
+        "ise" : ise(states,setpoint,dt),
+        "overshoot" : overshoot(states,setpoint),
+        "settling_time" : settling_time(time,states,setpoint),
+        }
@@ -0,0 +1,278 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: Monte Carlo noise analysis with streaming statistics
+'''
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .bank import PIDBank, simulate
+
+# P-square histogram markers every 5 %, traced by every worker when there
+# are several so that their quantiles can be pooled
+HISTOGRAM = [ii/20.0 for ii in range(21)]
+
+
+class Welford():
+    '''
+    running mean and variance over a stream of equally shaped arrays
+    '''
+    def __init__(self,shape):
+        self.count = 0
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)
+
+    def update(self,samples):
+        # samples stacked along axis 0 are merged as one batch (Chan et al.)
+        count = len(samples)
+        mean = samples.mean(axis=0)
+        m2 = ((samples - mean)**2).sum(axis=0)
+        self.combine(count,mean,m2)
+
+    def merge(self,other):
+        self.combine(other.count,other.mean,other.m2)
+
+    def combine(self,count,mean,m2):
+        if count == 0:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta*(count/total)
+        self.m2 += m2 + delta**2*(self.count*count/total)
+        self.count = total
+
+    def variance(self):
+        return self.m2/max(self.count - 1,1)
+
+
+class P2Quantile():
+    '''
+    P-square streaming quantile estimate (Jain and Chlamtac) for every
+    element of an array, five markers per element. Given fractions, the
+    markers follow those quantiles instead (the P-square histogram), which
+    traces the whole distribution for merging (see pooled_quantiles).
+    '''
+    def __init__(self,p,shape,fractions=None):
+        self.p = p
+        if fractions is None:
+            fractions = [0.0,p/2.0,p,(1.0 + p)/2.0,1.0]
+            self.index = 2                  # marker of the estimate
+        else:
+            fractions = list(fractions)
+            self.index = fractions.index(p)
+        self.size = len(fractions)          # markers per element
+        self.count = 0
+        self.initial = []
+        self.heights = np.zeros((self.size,) + tuple(shape))
+        self.positions = np.zeros((self.size,) + tuple(shape))
+        self.desired = np.zeros((self.size,) + tuple(shape))
+        self.increments = np.array(fractions).reshape((self.size,) + (1,)*len(shape))
+
+    def update(self,sample):
+        self.count += 1
+        last = self.size - 1
+        if self.count <= self.size:
+            self.initial.append(np.array(sample,dtype=np.float64))
+            if self.count == self.size:
+                self.heights[:] = np.sort(np.stack(self.initial),axis=0)
+                self.positions[:] = np.arange(1.0,self.size + 1.0).reshape(
+                    self.increments.shape)
+                self.desired[:] = (1.0 + last*self.increments)
+                self.initial = []
+            return
+
+        q, n = self.heights, self.positions
+        # extend the extreme markers and count the cell the sample falls in
+        np.minimum(q[0],sample,out=q[0])
+        np.maximum(q[last],sample,out=q[last])
+        for ii in range(1,last):
+            n[ii] += sample < q[ii]
+        n[last] = self.count
+        self.desired += self.increments
+
+        # nudge the middle markers towards their desired positions
+        for ii in range(1,last):
+            d = self.desired[ii] - n[ii]
+            move = ((d >= 1.0) & (n[ii+1] - n[ii] > 1.0)) \
+                | ((d <= -1.0) & (n[ii-1] - n[ii] < -1.0))
+            if not move.any():
+                continue
+            d = np.sign(d)
+            with np.errstate(divide='ignore',invalid='ignore'):
+                parabolic = q[ii] + d/(n[ii+1] - n[ii-1])*(
+                    (n[ii] - n[ii-1] + d)*(q[ii+1] - q[ii])/(n[ii+1] - n[ii])
+                    + (n[ii+1] - n[ii] - d)*(q[ii] - q[ii-1])/(n[ii] - n[ii-1]))
+                neighbour = np.where(d > 0.0,q[ii+1],q[ii-1])
+                neighbour_position = np.where(d > 0.0,n[ii+1],n[ii-1])
+                linear = q[ii] + d*(neighbour - q[ii])/(neighbour_position - n[ii])
+            inside = (q[ii-1] < parabolic) & (parabolic < q[ii+1])
+            q[ii] = np.where(move,np.where(inside,parabolic,linear),q[ii])
+            n[ii] += np.where(move,d,0.0)
+
+    def markers(self):
+        '''
+        marker heights and their ranks among the samples, the exact
+        samples while there are too few for the markers
+        '''
+        if self.count < self.size:
+            heights = np.sort(np.stack(self.initial),axis=0)
+            ranks = np.arange(1.0,self.count + 1.0).reshape((self.count,)
+                + (1,)*(heights.ndim - 1))
+            return heights, np.broadcast_to(ranks,heights.shape).copy()
+        return self.heights.copy(), self.positions.copy()
+
+    def value(self):
+        if self.count < self.size:
+            return np.quantile(np.stack(self.initial),self.p,axis=0)
+        return self.heights[self.index].copy()
+
+
+class MonteCarloResult():
+    '''
+    mean, standard deviation and quantile bands, each shape (T, controllers)
+    '''
+    def __init__(self,count,mean,variance,quantiles,bands):
+        self.count = count
+        self.mean = mean
+        self.std = np.sqrt(variance)
+        self.quantiles = quantiles
+        self.bands = bands      # shape (len(quantiles), T, controllers)
+
+
+def monte_carlo(kp,ki,kd,setpoint,dt,kd_error=True,feed_forward=0.0,
+    noise_sigma=0.0,setpoint_noise=0.0,offset=0.0,plant=None,realizations=100,
+    chunk=64,workers=1,seed=None,quantiles=(0.05,0.5,0.95)):
+    '''
+    runs realizations noisy closed loop trajectories for every controller
+
+    Controllers are given by broadcastable gain arrays. Realizations run in
+    chunks that are simulated together as one bank, so only chunk
+    trajectories are held at a time; mean and variance are merged with
+    Welford updates and quantiles with P-square estimators. Every worker
+    draws from its own SeedSequence-spawned generator, so results only
+    depend on seed, realizations, chunk and workers. With several workers
+    each also traces its distribution with a P-square histogram and the
+    quantiles are read from the pooled distribution (see pooled_quantiles);
+    like P-square itself they are estimates.
+    '''
+    gains = [np.atleast_1d(np.asarray(g,dtype=np.float64)) for g in
+        (kp,ki,kd,feed_forward,noise_sigma)]
+    kd_error = np.atleast_1d(np.asarray(kd_error,dtype=bool))
+    gains = np.broadcast_arrays(*gains,kd_error)
+
+    workers = max(1,min(workers,realizations))
+    streams = np.random.SeedSequence(seed).spawn(workers)
+    counts = [realizations//workers + (ii < realizations % workers)
+        for ii in range(workers)]
+    jobs = [(gains,setpoint,dt,setpoint_noise,offset,plant,count,chunk,
+        stream,quantiles,workers > 1) for count, stream in zip(counts,streams)]
+    if workers == 1:
+        partials = [realize(*jobs[0])]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            partials = list(executor.map(realize,*zip(*jobs)))
+
+    moments = partials[0][0]
+    for partial in partials[1:]:
+        moments.merge(partial[0])
+    if workers == 1:
+        bands = partials[0][1]
+    else:
+        bands = pooled_quantiles([partial[2] for partial in partials],counts,
+            quantiles)
+    return MonteCarloResult(moments.count,moments.mean,moments.variance(),
+        quantiles,bands)
+
+def realize(gains,setpoint,dt,setpoint_noise,offset,plant,count,chunk,stream,
+    quantiles,traced=False):
+    '''
+    one worker: count realizations drawn from one SeedSequence stream
+    '''
+    kp, ki, kd, feed_forward, noise_sigma, kd_error = gains
+    controllers = len(kp)
+    shape = (len(setpoint),controllers)
+    rng = np.random.default_rng(stream)
+    moments = Welford(shape)
+    estimators = [P2Quantile(p,shape) for p in quantiles]
+    if traced:
+        estimators.append(P2Quantile(0.5,shape,HISTOGRAM))
+    out = None
+
+    remaining = count
+    while remaining > 0:
+        batch = min(chunk,remaining)
+        remaining -= batch
+        # realization-major layout, the bank holds batch copies of every controller
+        bank = PIDBank(np.tile(kp,batch),np.tile(ki,batch),np.tile(kd,batch),
+            np.tile(kd_error,batch),np.tile(feed_forward,batch),
+            np.tile(noise_sigma,batch))
+        bank.rng = rng
+        if out is None or out.shape[1] != bank.count:
+            out = np.empty((len(setpoint),bank.count))
+        simulate(bank,setpoint,dt,plant=None if plant is None else plant.clone(),
+            offset=offset,setpoint_noise=setpoint_noise,out=out)
+        trajectories = out.reshape(len(setpoint),batch,controllers)
+        moments.update(np.moveaxis(trajectories,1,0))
+        for jj in range(batch):
+            for estimator in estimators:
+                estimator.update(trajectories[:,jj])
+
+    bands = np.stack([estimator.value() for estimator in estimators[:len(quantiles)]])
+    markers = [estimator.markers() for estimator in estimators]
+    summary = (np.concatenate([m[0] for m in markers]),
+        np.concatenate([m[1] for m in markers]))
+    return moments, bands, summary
+
+def pooled_quantiles(summaries,counts,quantiles):
+    '''
+    quantiles of the samples of several workers together, from the marker
+    heights and ranks of each worker
+
+    The markers of a worker trace its empirical distribution, the rank of
+    a value is interpolated between them, so denser markers (HISTOGRAM)
+    pool more accurately. Summed over the workers this is
+    the rank among all samples, which is inverted at the rank of each
+    quantile. Averaging the per-worker quantiles instead is not the
+    quantile of the pooled samples.
+    '''
+    traces = []
+    for heights, ranks in summaries:
+        order = np.argsort(heights,axis=0)
+        heights = np.take_along_axis(heights,order,axis=0)
+        ranks = np.maximum.accumulate(np.take_along_axis(ranks,order,axis=0),axis=0)
+        traces.append((heights,ranks))
+    candidates = np.sort(np.concatenate([heights for heights, ranks in traces]),axis=0)
+    pooled = sum(rank(heights,ranks,count,candidates) for (heights, ranks), count
+        in zip(traces,counts))
+
+    total = sum(counts)
+    bands = []
+    for p in quantiles:
+        target = 1.0 + p*(total - 1.0)
+        # first candidate reaching the target rank and the one before it
+        upper = np.argmax(pooled >= target,axis=0)[np.newaxis]
+        lower = np.maximum(upper - 1,0)
+        x0 = np.take_along_axis(candidates,lower,axis=0)[0]
+        x1 = np.take_along_axis(candidates,upper,axis=0)[0]
+        r0 = np.take_along_axis(pooled,lower,axis=0)[0]
+        r1 = np.take_along_axis(pooled,upper,axis=0)[0]
+        with np.errstate(divide='ignore',invalid='ignore'):
+            fraction = np.clip((target - r0)/(r1 - r0),0.0,1.0)
+        bands.append(np.where(r1 > r0,x0 + fraction*(x1 - x0),x1))
+    return np.stack(bands)
+
+def rank(heights,ranks,count,values):
+    # samples of one worker up to each of values, interpolated between markers
+    below = np.zeros(values.shape,dtype=np.intp)
+    for height in heights:
+        below += height <= values
+    inside = np.clip(below,1,len(heights) - 1)
+    h0 = np.take_along_axis(heights,inside - 1,axis=0)
+    h1 = np.take_along_axis(heights,inside,axis=0)
+    r0 = np.take_along_axis(ranks,inside - 1,axis=0)
+    r1 = np.take_along_axis(ranks,inside,axis=0)
+    with np.errstate(divide='ignore',invalid='ignore'):
+        interpolated = np.where(h1 > h0,r0 + (values - h0)/(h1 - h0)*(r1 - r0),r1)
+    return np.where(below == 0,0.0,np.where(below == len(heights),count,interpolated))
@@ -0,0 +1,87 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: Saturation, deadband, quantization and rate limit stage for PID
+    commands
+'''
+
+from math import isfinite
+import time
+
+
+def quantize(command,resolution):
+    # nearest multiple of the actuator resolution, ties to even like NumPy;
+    # inf and nan of a faulting controller pass through
+    if resolution <= 0.0 or not isfinite(command):
+        return command
+    return round(command/resolution)*resolution
+
+
+class OutputStage():
+    '''
+    OutputStage Class
+
+    Decides which commands of a PID reach the actuator. A command is
+    quantized to the actuator resolution, clamped to the low and high
+    limits of the actuator and only sent when it moved more
+    than the deadband from the last sent value and at least min_interval
+    seconds passed since the last send. A change held back by the interval
+    stays pending and is sent by a later submit or by flush(). Standard
+    library only, like PID; PIDBank has BankOutputStage.
+    '''
+    def __init__(self,deadband=0.0,resolution=0.0,min_interval=0.0,
+        low=float('-inf'),high=float('inf')):
+        self.deadband = deadband
+        self.resolution = resolution
+        self.min_interval = min_interval
+        self.low = low
+        self.high = high
+        self.reset()
+
+    def submit(self,command,now=None):
+        '''
+        value to send for command at time now (default monotonic clock),
+        None when nothing has to be sent
+        '''
+        now = time.monotonic() if now is None else now
+        self.submitted += 1
+        value = min(max(quantize(command,self.resolution),self.low),self.high)
+        if self.last is not None and abs(value - self.last) <= self.deadband:
+            self.deadband_suppressed += 1
+            self.pending = None
+            return None
+        if now - self.last_time < self.min_interval:
+            self.interval_suppressed += 1
+            self.pending = value
+            return None
+        return self.send(value,now)
+
+    def flush(self,now=None):
+        # the change held back by the interval, if any, sent now
+        if self.pending is None:
+            return None
+        return self.send(self.pending,time.monotonic() if now is None else now)
+
+    def send(self,value,now):
+        self.last = value
+        self.last_time = now
+        self.pending = None
+        self.published += 1
+        return value
+
+    def statistics(self):
+        suppressed = self.deadband_suppressed + self.interval_suppressed
+        return {"submitted" : self.submitted,"published" : self.published,
+            "deadband_suppressed" : self.deadband_suppressed,
+            "interval_suppressed" : self.interval_suppressed,
+            "suppressed_fraction" : suppressed/self.submitted if self.submitted
+            else 0.0}
+
+    def reset(self):
+        self.last = None                # last sent value
+        self.last_time = float('-inf')
+        self.pending = None
+        self.submitted = 0
+        self.published = 0
+        self.deadband_suppressed = 0
+        self.interval_suppressed = 0
@@ -4,13 +4,17 @@ Date: 7.2019
 Description: PID control template
 '''
 
-import warnings
-warnings.filterwarnings("error")
-import numpy as np
+import random
+from math import isfinite
+
+# order of the terms written by capture
+TERMS = ("P","I","D","FF","noise")
 
 class PID():
     '''
     PID control class template
+
+    Only needs the standard library, so it can be embedded without NumPy.
     '''
     def __init__(self,kp=0.0,ki=0.0,kd=0.0,kd_error=True):
         # inputs
@@ -27,8 +31,18 @@ class PID():
         self.error_derivative = 0.0
         self.feed_forward = 0.0
         self.noise_sigma = 0.0
+        self.terms = None
+        self.faults = 0             # number of faults so far
 
     def update(self,current_state,desired_state,dt):
+        # implicit integrator plant: the command is added to the current state
+        return self.step(current_state,desired_state,dt,current_state)
+
+    def command(self,current_state,desired_state,dt):
+        # controller output alone, for use with an explicit plant model
+        return self.step(current_state,desired_state,dt,0.0)
+
+    def step(self,current_state,desired_state,dt,bias):
         # calculate current error
         state_error = desired_state - current_state
 
@@ -42,48 +56,67 @@ class PID():
             self.state_derivative = self.calculate_state_derivative(current_state, dt)
 
         # calculate  command
-        try:
-            if self.kd_error:
-                command = current_state + self.kp * state_error \
-                    + self.ki * self.integrator \
-                    + self.kd * self.error_derivative \
-                    + self.feed_forward \
-                    + self.noise_sigma*np.random.randn()
-            else:
-                command = current_state + self.kp * state_error \
-                    + self.ki * self.integrator \
-                    - self.kd * self.state_derivative \
-                    + self.feed_forward \
-                    + self.noise_sigma*np.random.randn()
-
-        except RuntimeWarning as warn:
-            self.reset()
-            self.kp = 0.0
-            self.ki = 0.0
-            self.kd = 0.0
-            self.feed_forward = 0.0
+        if self.kd_error:
+            command = bias + self.kp * state_error \
+                + self.ki * self.integrator \
+                + self.kd * self.error_derivative \
+                + self.feed_forward
+        else:
+            command = bias + self.kp * state_error \
+                + self.ki * self.integrator \
+                - self.kd * self.state_derivative \
+                + self.feed_forward
+        if self.noise_sigma:
+            command += self.noise_sigma*random.gauss(0.0,1.0)
+        if not isfinite(command):
+            self.fault()
             command = 0.0
 
-
         # update current to previous
         self.previous_state = current_state
         self.previous_state_error = state_error
 
         return command
 
+    def capture(self,terms):
+        '''
+        writes the terms of TERMS of every following step into terms[0:5],
+        a caller-provided list or array row; None switches capture off
+        '''
+        # the step variant is bound once here, so update() pays nothing
+        # while capture is off
+        self.terms = terms
+        if terms is None:
+            self.__dict__.pop('step',None)
+        else:
+            self.step = self.capture_step
+
+    def capture_step(self,current_state,desired_state,dt,bias):
+        faults = self.faults
+        command = PID.step(self,current_state,desired_state,dt,bias)
+        terms = self.terms
+        terms[0] = self.kp * self.previous_state_error
+        terms[1] = self.ki * self.integrator
+        if self.kd_error:
+            terms[2] = self.kd * self.error_derivative
+        else:
+            terms[2] = -self.kd * self.state_derivative
+        terms[3] = self.feed_forward
+        # noise is what remains of the command, nothing in a step that faulted
+        if self.noise_sigma and self.faults == faults:
+            terms[4] = command - bias - terms[0] - terms[1] - terms[2] - terms[3]
+        else:
+            terms[4] = 0.0
+        return command
+
     def calculate_derivative(self, state_error, dt):
         # dirty derivative calculation
         sigma = 10.0 * dt                               # cutoff frequency for dirty derivative
         beta = (2.0 * sigma - dt) / (2.0 * sigma + dt)  # dirty derivative gain
-        try:
-            error_derivative_updated = beta * self.error_derivative \
-                + (1.0 - beta) * (state_error - self.previous_state_error) / dt
-        except RuntimeWarning as warn:
-            self.reset()
-            self.kp = 0.0
-            self.ki = 0.0
-            self.kd = 0.0
-            self.feed_forward = 0.0
+        error_derivative_updated = beta * self.error_derivative \
+            + (1.0 - beta) * (state_error - self.previous_state_error) / dt
+        if not isfinite(error_derivative_updated):
+            self.fault()
             error_derivative_updated = 0.0
         return error_derivative_updated
 
@@ -91,20 +124,24 @@ class PID():
         # dirty derivative calculation
         sigma = 10.0 * dt                               # cutoff frequency for dirty derivative
         beta = (2.0 * sigma - dt) / (2.0 * sigma + dt)  # dirty derivative gain
-        try:
-            state_derivative_updated = beta * self.state_derivative \
-                + (1.0 - beta) * (current_state - self.previous_state) / dt
-        except RuntimeWarning as warn:
-            self.reset()
-            self.kp = 0.0
-            self.ki = 0.0
-            self.kd = 0.0
-            self.feed_forward = 0.0
+        state_derivative_updated = beta * self.state_derivative \
+            + (1.0 - beta) * (current_state - self.previous_state) / dt
+        if not isfinite(state_derivative_updated):
+            self.fault()
             state_derivative_updated = 0.0
         return state_derivative_updated
 
 
 
+    def fault(self):
+        # overflowing controllers are reset and switched off
+        self.faults += 1
+        self.reset()
+        self.kp = 0.0
+        self.ki = 0.0
+        self.kd = 0.0
+        self.feed_forward = 0.0
+
     def reset(self):
         self.integrator = 0.0
         self.previous_state = 0.0
@@ -0,0 +1,245 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: Vectorized discrete plant models driven by PID commands
+'''
+
+import copy
+
+import numpy as np
+
+
+def expm(matrix):
+    '''
+    matrix exponential by scaling and squaring a Taylor series
+    '''
+    matrix = np.asarray(matrix,dtype=np.float64)
+    norm = np.linalg.norm(matrix,np.inf)
+    squarings = max(0,int(np.ceil(np.log2(norm))) + 1) if norm > 0.0 else 0
+    scaled = matrix/(2.0**squarings)
+    result = np.eye(len(matrix))
+    term = np.eye(len(matrix))
+    for order in range(1,16):
+        term = term.dot(scaled)/order
+        result = result + term
+    for ii in range(squarings):
+        result = result.dot(result)
+    return result
+
+
+class Plant():
+    '''
+    Plant base class
+
+    A plant holds the state of count independent instances. step() applies
+    one command per instance and returns the measured outputs, which is the
+    current_state fed to the controllers on the next sample. STATE names
+    the attributes that change with step(), a plant without it is copied
+    whole by snapshot().
+    '''
+    STATE = None
+
+    def reset(self,count,dt):
+        raise NotImplementedError
+
+    def output(self):
+        raise NotImplementedError
+
+    def step(self,command):
+        raise NotImplementedError
+
+    def transfer_function(self,dt):
+        # numerator and denominator in descending powers of z from the
+        # command of a sample to the output returned by the same step()
+        raise NotImplementedError
+
+    def clone(self):
+        # fresh copy with the same parameters and independent state
+        return copy.deepcopy(self)
+
+    def snapshot(self):
+        # copy of the state for restore(), parameters are not copied
+        if self.STATE is None:
+            return copy.deepcopy(vars(self))
+        return dict((name,np.copy(getattr(self,name)) if isinstance(
+            getattr(self,name),np.ndarray) else getattr(self,name))
+            for name in self.STATE)
+
+    def restore(self,snapshot):
+        # copies again so the snapshot can be restored more than once
+        for name, value in copy.deepcopy(snapshot).items():
+            setattr(self,name,value)
+
+
+class Integrator(Plant):
+    '''
+    implicit plant of PID.update: the command is added to the state
+    '''
+    STATE = ("state",)
+
+    def __init__(self,gain=1.0):
+        self.gain = gain
+
+    def reset(self,count,dt):
+        self.state = np.zeros(count)
+
+    def output(self):
+        return self.state
+
+    def step(self,command):
+        self.state += self.gain*command
+        return self.state
+
+    def transfer_function(self,dt):
+        return np.array([self.gain,0.0]), np.array([1.0,-1.0])
+
+
+class FirstOrderLag(Plant):
+    '''
+    first-order lag with static gain and time constant, zero-order hold
+    '''
+    STATE = ("state",)
+
+    def __init__(self,gain=1.0,time_constant=0.5):
+        self.gain = gain
+        self.time_constant = time_constant
+
+    def reset(self,count,dt):
+        self.state = np.zeros(count)
+        self.pole = np.exp(-dt/self.time_constant)
+
+    def output(self):
+        return self.state
+
+    def step(self,command):
+        self.state *= self.pole
+        self.state += (1.0 - self.pole)*self.gain*command
+        return self.state
+
+    def transfer_function(self,dt):
+        pole = np.exp(-dt/self.time_constant)
+        return np.array([(1.0 - pole)*self.gain,0.0]), np.array([1.0,-pole])
+
+
+class StateSpace(Plant):
+    '''
+    general discrete state space plant x+ = A x + B u, y = C x+ + D u
+    '''
+    STATE = ("state","measurement")
+
+    def __init__(self,A,B,C,D=0.0):
+        self.A = np.atleast_2d(np.asarray(A,dtype=np.float64))
+        self.B = np.asarray(B,dtype=np.float64).reshape(-1)
+        self.C = np.asarray(C,dtype=np.float64).reshape(-1)
+        self.D = float(D)
+        if self.A.shape != (len(self.B),len(self.B)) or len(self.C) != len(self.B):
+            raise ValueError('A must be square and match the sizes of B and C')
+
+    def reset(self,count,dt):
+        # states are stored instance-major so each step is one matrix product
+        self.state = np.zeros((count,len(self.B)))
+        self.scratch = np.zeros_like(self.state)
+        self.measurement = np.zeros(count)
+
+    def output(self):
+        return self.measurement
+
+    def step(self,command):
+        np.dot(self.state,self.A.T,out=self.scratch)
+        self.state, self.scratch = self.scratch, self.state
+        self.state += np.multiply.outer(command,self.B)
+        np.dot(self.state,self.C,out=self.measurement)
+        if self.D != 0.0:
+            self.measurement += self.D*command
+        return self.measurement
+
+    def transfer_function(self,dt):
+        # C (zI - A)^-1 B = (det(zI - A + B C) - det(zI - A)) / det(zI - A)
+        denominator = np.poly(self.A)
+        residual = np.poly(self.A - np.outer(self.B,self.C)) - denominator
+        numerator = np.append(residual[1:],0.0) + self.D*denominator
+        return numerator, denominator
+
+
+class MassSpringDamper(StateSpace):
+    '''
+    second-order mass-spring-damper measured in position, zero-order hold
+    '''
+    def __init__(self,mass=1.0,spring=10.0,damping=2.0):
+        self.mass = mass
+        self.spring = spring
+        self.damping = damping
+        StateSpace.__init__(self,np.eye(2),np.zeros(2),[1.0,0.0])
+
+    def discretize(self,dt):
+        # exponentiate the input-augmented continuous system
+        continuous = np.zeros((3,3))
+        continuous[0,1] = 1.0
+        continuous[1,0] = -self.spring/self.mass
+        continuous[1,1] = -self.damping/self.mass
+        continuous[1,2] = 1.0/self.mass
+        discrete = expm(continuous*dt)
+        self.A = discrete[:2,:2]
+        self.B = discrete[:2,2]
+
+    def reset(self,count,dt):
+        self.discretize(dt)
+        StateSpace.reset(self,count,dt)
+
+    def transfer_function(self,dt):
+        self.discretize(dt)
+        return StateSpace.transfer_function(self,dt)
+
+
+class DeadTime(Plant):
+    '''
+    delays the commands to another plant by a whole number of samples
+    '''
+    STATE = ("buffer","index")
+
+    def __init__(self,plant,delay=10):
+        self.plant = plant
+        self.delay = int(delay)
+        if self.delay < 0:
+            raise ValueError('delay must be zero or a positive number of samples')
+
+    def reset(self,count,dt):
+        self.plant.reset(count,dt)
+        # ring buffer of pending commands, one row per delayed sample
+        self.buffer = np.zeros((self.delay,count))
+        self.index = 0
+
+    def output(self):
+        return self.plant.output()
+
+    def snapshot(self):
+        return Plant.snapshot(self), self.plant.snapshot()
+
+    def restore(self,snapshot):
+        own, plant = snapshot
+        Plant.restore(self,own)
+        self.plant.restore(plant)
+
+    def step(self,command):
+        if self.delay == 0:
+            return self.plant.step(command)
+        row = self.buffer[self.index]
+        delayed = row.copy()
+        row[:] = command
+        self.index += 1
+        if self.index == self.delay:
+            self.index = 0
+        return self.plant.step(delayed)
+
+    def transfer_function(self,dt):
+        numerator, denominator = self.plant.transfer_function(dt)
+        return numerator, np.append(denominator,np.zeros(self.delay))
+
+
+# plants offered by the GUI, None keeps the implicit plant of PID.update
+PLANTS = {
+    "Implicit Integrator" : lambda: None,
+    "First-Order Lag" : FirstOrderLag,
+    "Mass-Spring-Damper" : MassSpringDamper,
+    "Dead Time + Lag" : lambda: DeadTime(FirstOrderLag(),10),
+    }
@@ -0,0 +1,158 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: Chunked replay of recorded logs through a bank of controllers
+'''
+
+import itertools
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from .montecarlo import Welford
+
+
+def read_chunks(path,chunk=65536,columns=(0,1),width=None,dtype=np.float64,
+    delimiter=','):
+    '''
+    yields (state, setpoint) arrays of up to chunk rows from a log, or
+    (state, setpoint, command) when columns has a third index
+
+    .npy files are memory mapped, .csv files are parsed chunk by chunk (a
+    header row may name the columns "state", "setpoint" and "command") and
+    any other file is read as a memory mapped binary table of width columns
+    of dtype. columns gives the state, setpoint and optionally the logged
+    command column indices. Only one chunk is held in memory at a time.
+    '''
+    if str(path).endswith('.csv'):
+        for block in read_csv(path,chunk,columns,delimiter):
+            yield block
+        return
+
+    if str(path).endswith('.npy'):
+        table = np.load(path,mmap_mode='r')
+    else:
+        check_width(width)
+        table = np.memmap(path,dtype=dtype,mode='r').reshape(-1,width)
+    for start in range(0,len(table),chunk):
+        block = table[start:start + chunk]
+        yield tuple(np.array(block[:,column],dtype=np.float64)
+            for column in columns)
+
+def read_csv(path,chunk,columns,delimiter):
+    with open(path) as log:
+        first = log.readline()
+        fields = [field.strip() for field in first.split(delimiter)]
+        try:
+            [float(field) for field in fields]
+            lines = itertools.chain([first],log)
+        except ValueError:
+            # header row, named columns take precedence
+            names = ('state','setpoint','command')[:len(columns)]
+            if all(name in fields for name in names):
+                columns = [fields.index(name) for name in names]
+            lines = log
+        while True:
+            block = list(itertools.islice(lines,chunk))
+            if not block:
+                return
+            table = np.loadtxt(block,delimiter=delimiter,ndmin=2,
+                usecols=columns)
+            yield tuple(table[:,ii] for ii in range(len(columns)))
+
+def check_width(width):
+    if width is None:
+        raise ValueError('binary logs need the number of columns (width)')
+
+def log_length(path,width=None,dtype=np.float64):
+    # rows of a memory mappable log, None for csv
+    if str(path).endswith('.csv'):
+        return None
+    if str(path).endswith('.npy'):
+        return len(np.load(path,mmap_mode='r'))
+    check_width(width)
+    return len(np.memmap(path,dtype=dtype,mode='r'))//width
+
+
+class ReplayResult():
+    '''
+    per controller command statistics of a replay, each shape (controllers,)
+    '''
+    def __init__(self,count,mean,variance,peak,total_variation,effort,deviation):
+        self.count = count                      # replayed samples
+        self.mean = mean                        # mean command
+        self.std = np.sqrt(variance)            # command standard deviation
+        self.peak = peak                        # largest absolute command
+        self.total_variation = total_variation  # sum of command changes
+        self.effort = effort                    # integral of squared command
+        self.deviation = deviation              # integral of absolute difference
+                                                # to the logged command, or None
+
+
+def replay(bank,path,dt,chunk=65536,commands=None,**options):
+    '''
+    runs the measured state and setpoint of a log through every controller
+
+    The log streams in chunks (see read_chunks for options) and the bank is
+    advanced one sample at a time, all controllers together. Commands are
+    written chunk by chunk to commands when given: a .npy path is created
+    with shape (rows, controllers) for memory mappable logs, any other path
+    receives raw float64 rows in C order. With a logged command column
+    (a third index in columns) the commands are also compared with the
+    logged ones. Statistics are accumulated as the chunks go, so peak
+    memory only depends on chunk and the bank size.
+    '''
+    width = options.get('width')
+    dtype = options.get('dtype',np.float64)
+    rows = log_length(path,width,dtype)
+    writer = None
+    if commands is not None:
+        if str(commands).endswith('.npy') and rows is not None:
+            writer = open_memmap(commands,mode='w+',dtype=np.float64,
+                shape=(rows,bank.count))
+        else:
+            writer = open(commands,'wb')
+
+    moments = Welford(bank.count)
+    peak = np.zeros(bank.count)
+    total_variation = np.zeros(bank.count)
+    effort = np.zeros(bank.count)
+    deviation = None
+    previous = None
+    block = None
+    written = 0
+
+    bank.reset()
+    try:
+        for columns in read_chunks(path,chunk,**options):
+            state, setpoint = columns[:2]
+            if block is None or len(block) != len(state):
+                block = np.empty((len(state),bank.count))
+            for ii in range(len(state)):
+                block[ii] = bank.command(state[ii],setpoint[ii],dt)
+
+            moments.update(block)
+            np.maximum(peak,np.abs(block).max(axis=0),out=peak)
+            total_variation += np.abs(np.diff(block,axis=0)).sum(axis=0)
+            if previous is not None:
+                total_variation += np.abs(block[0] - previous)
+            previous = block[-1].copy()
+            effort += (block**2).sum(axis=0)*dt
+            if len(columns) == 3:
+                if deviation is None:
+                    deviation = np.zeros(bank.count)
+                deviation += np.abs(block - columns[2][:,None]).sum(axis=0)*dt
+
+            if isinstance(writer,np.ndarray):
+                writer[written:written + len(block)] = block
+            elif writer is not None:
+                writer.write(block.tobytes())
+            written += len(block)
+    finally:
+        if isinstance(writer,np.ndarray):
+            writer.flush()
+        elif writer is not None:
+            writer.close()
+
+    return ReplayResult(moments.count,moments.mean,moments.variance(),peak,
+        total_variation,effort,deviation)
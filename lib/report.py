@@ -0,0 +1,170 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: Headless parallel rendering of response plots and metric reports
+'''
+
+import hashlib
+import html
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+# Agg only, the report never touches Tk or pyplot
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from .bank import PIDBank
+from . import metrics
+from .plant import PLANTS
+from .simulation import Simulation
+
+# bump to re-render every report after changing how figures look
+VERSION = 1
+
+# configuration keys and their defaults
+DEFAULTS = {
+    "kp" : 0.0,
+    "ki" : 0.0,
+    "kd" : 0.0,
+    "kd_error" : True,
+    "feed_forward" : 0.0,
+    "noise_sigma" : 0.0,
+    "profile" : "STEP",
+    "plant" : "Implicit Integrator",
+    "steady_state_error" : 0.0,
+    "time_end" : 10.0,
+    "hz" : 100.0,
+    }
+
+# figure reused by every job of one worker process
+figure = None
+
+
+def complete(config):
+    # config with every default filled in
+    full = dict(DEFAULTS)
+    full.update(config)
+    return full
+
+def content_hash(config):
+    '''
+    key of the rendered files, changes with the configuration or VERSION
+    '''
+    text = json.dumps([VERSION,complete(config)],sort_keys=True)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+def simulate_config(config):
+    # time, setpoint and states of one configuration, seeded by its hash so
+    # noisy configurations render the same on every run
+    config = complete(config)
+    simulation = Simulation(config["profile"],time_end=config["time_end"],
+        hz=config["hz"])
+    simulation.plant = PLANTS[config["plant"]]()
+    simulation.steady_state_error = config["steady_state_error"]
+    bank = PIDBank(config["kp"],config["ki"],config["kd"],config["kd_error"],
+        config["feed_forward"],config["noise_sigma"],
+        seed=int(content_hash(config),16))
+    simulation.bank_update(bank)
+    return simulation.time, simulation.setpoint, simulation.results[:,0], \
+        simulation.dt
+
+def render(config,directory,key,formats):
+    '''
+    one job of a worker: simulate, draw into the worker figure and save
+    '''
+    global figure
+    if figure is None:
+        figure = Figure(figsize=(8,4),dpi=100)
+        FigureCanvasAgg(figure)
+    figure.clear()
+
+    time, setpoint, states, dt = simulate_config(config)
+    values = metrics.summary(time,states,setpoint,dt)
+    values = dict((name,float(value)) for name, value in values.items())
+
+    config = complete(config)
+    plot = figure.add_subplot(111)
+    plot.plot(time,setpoint,color='xkcd:indigo',label='setpoint')
+    plot.plot(time,states,color='xkcd:orangered',label='state')
+    plot.set_ylim([-3.2,3.2])
+    plot.set_xlabel('time [s]')
+    plot.set_title('%s, %s: kp %.3g, ki %.3g, kd %.3g' % (config["profile"],
+        config["plant"],config["kp"],config["ki"],config["kd"]))
+    plot.legend(loc='lower right')
+    for extension in formats:
+        figure.savefig(os.path.join(directory,'%s.%s' % (key,extension)))
+    return key, values
+
+def render_report(configs,directory,workers=None,formats=("png","svg"),
+    force=False):
+    '''
+    renders every configuration (dicts with the keys of DEFAULTS) into
+    directory with an index.html and a metrics.csv
+
+    Files are named by the content hash of their configuration and a
+    manifest keeps the metrics of earlier runs, so a repeated report only
+    renders configurations that changed. Jobs run on a process pool where
+    each worker draws every plot into the same Agg figure. Returns the
+    number of rendered configurations.
+    '''
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    manifest_path = os.path.join(directory,'manifest.json')
+    manifest = {}
+    if os.path.exists(manifest_path) and not force:
+        with open(manifest_path) as manifest_file:
+            manifest = json.load(manifest_file)
+
+    keys = [content_hash(config) for config in configs]
+    jobs = []
+    queued = set()
+    for key, config in zip(keys,configs):
+        done = key in manifest and all(os.path.exists(os.path.join(directory,
+            '%s.%s' % (key,extension))) for extension in formats)
+        if not done and key not in queued:
+            jobs.append((config,directory,key,formats))
+            queued.add(key)
+
+    if jobs:
+        if workers == 1:
+            results = [render(*job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(render,*zip(*jobs)))
+        for key, values in results:
+            manifest[key] = values
+        with open(manifest_path,'w') as manifest_file:
+            json.dump(manifest,manifest_file,indent=1,sort_keys=True)
+
+    write_index(configs,keys,manifest,directory,formats)
+    return len(jobs)
+
+def write_index(configs,keys,manifest,directory,formats):
+    names = ["iae","ise","overshoot","settling_time"]
+    columns = ["kp","ki","kd","kd_error","feed_forward","noise_sigma",
+        "profile","plant","steady_state_error"]
+
+    with open(os.path.join(directory,'metrics.csv'),'w') as table:
+        table.write(','.join(["key"] + columns + names) + '\n')
+        for key, config in zip(keys,configs):
+            config = complete(config)
+            table.write(','.join([key] + [str(config[c]) for c in columns]
+                + ['%.6g' % manifest[key][n] for n in names]) + '\n')
+
+    rows = []
+    for key, config in zip(keys,configs):
+        config = complete(config)
+        cells = ''.join('<td>%s</td>' % html.escape(str(config[c]))
+            for c in columns)
+        cells += ''.join('<td>%.4g</td>' % manifest[key][n] for n in names)
+        image = '%s.%s' % (key,formats[0])
+        rows.append('<tr><td><a href="%s"><img src="%s" width="320"></a></td>%s</tr>'
+            % (image,image,cells))
+    header = ''.join('<th>%s</th>' % name for name in ["plot"] + columns + names)
+    with open(os.path.join(directory,'index.html'),'w') as index:
+        index.write('<!DOCTYPE html>\n<html><head><meta charset="utf-8">'
+            '<title>PID report</title></head><body>\n<table border="1">\n'
+            '<tr>%s</tr>\n%s\n</table>\n</body></html>\n'
+            % (header,'\n'.join(rows)))
@@ -0,0 +1,106 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: Gain scheduling from breakpoint tables for PID
+'''
+
+from bisect import bisect_right
+
+from .pid import PID
+
+
+class GainTable():
+    '''
+    GainTable Class
+
+    Gains at increasing breakpoints of a scheduling variable, linearly
+    interpolated in between and held constant outside. Standard library
+    only, like PID.
+    '''
+    def __init__(self,breakpoints,kp,ki,kd,feed_forward=None):
+        self.breakpoints = [float(b) for b in breakpoints]
+        if any(b >= c for b, c in zip(self.breakpoints,self.breakpoints[1:])):
+            raise ValueError('breakpoints must be strictly increasing')
+        if feed_forward is None:
+            feed_forward = [0.0]*len(self.breakpoints)
+        self.gains = [[float(g) for g in gain] for gain in (kp,ki,kd,feed_forward)]
+        if any(len(gain) != len(self.breakpoints) for gain in self.gains):
+            raise ValueError('every gain needs one value per breakpoint')
+
+    def segment(self,x,hint=0):
+        '''
+        index of the segment holding x, checking hint and its neighbours
+        before searching
+        '''
+        b = self.breakpoints
+        last = len(b) - 2
+        for index in (hint,hint + 1,hint - 1):
+            if 0 <= index <= last and (b[index] <= x or index == 0) \
+                and (x < b[index + 1] or index == last):
+                return index
+        return min(max(bisect_right(b,x) - 1,0),max(last,0))
+
+    def lookup(self,x,hint=0):
+        '''
+        segment index and the interpolated (kp, ki, kd, feed_forward)
+        '''
+        b = self.breakpoints
+        if len(b) == 1:
+            return 0, tuple(gain[0] for gain in self.gains)
+        index = self.segment(x,hint)
+        fraction = (x - b[index])/(b[index + 1] - b[index])
+        fraction = min(max(fraction,0.0),1.0)
+        return index, tuple(gain[index] + fraction*(gain[index + 1] - gain[index])
+            for gain in self.gains)
+
+
+class ScheduledPID(PID):
+    '''
+    ScheduledPID Class
+
+    PID whose gains follow a GainTable. The scheduling variable defaults to
+    the current state; the segment of the previous tick is tried first so
+    steady operation skips the search. Gain changes are bumpless: the
+    integrator absorbs the change of the feedback terms the new gains would
+    cause.
+    '''
+    def __init__(self,table,kd_error=True):
+        PID.__init__(self,kd_error=kd_error)
+        self.table = table
+        self.segment = 0
+        self.faulted = False
+        self.kp, self.ki, self.kd, self.feed_forward = table.lookup(0.0)[1]
+
+    def update(self,current_state,desired_state,dt,scheduling_variable=None):
+        self.schedule(current_state if scheduling_variable is None
+            else scheduling_variable)
+        return PID.update(self,current_state,desired_state,dt)
+
+    def command(self,current_state,desired_state,dt,scheduling_variable=None):
+        self.schedule(current_state if scheduling_variable is None
+            else scheduling_variable)
+        return PID.command(self,current_state,desired_state,dt)
+
+    def schedule(self,x):
+        # faulted controllers stay switched off until reset
+        if self.faulted:
+            return
+        self.segment, gains = self.table.lookup(x,self.segment)
+        kp, ki, kd, feed_forward = gains
+        derivative = self.error_derivative if self.kd_error \
+            else -self.state_derivative
+        # keep kp e + ki I + kd d of the last tick unchanged, a scheduled
+        # feed forward is meant to move the command and is left alone
+        if ki != 0.0:
+            self.integrator = (self.ki*self.integrator
+                + (self.kp - kp)*self.previous_state_error
+                + (self.kd - kd)*derivative)/ki
+        self.kp, self.ki, self.kd, self.feed_forward = kp, ki, kd, feed_forward
+
+    def fault(self):
+        PID.fault(self)
+        self.faulted = True
+
+    def reset(self):
+        PID.reset(self)
+        self.faulted = False
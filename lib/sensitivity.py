@@ -0,0 +1,121 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: Forward sensitivities of the closed loop with respect to the gains
+'''
+
+import numpy as np
+
+from .plant import Integrator
+
+# gains the sensitivities are taken with respect to, in gradient order
+PARAMETERS = ("kp","ki","kd","feed_forward")
+
+
+class SensitivityResult():
+    '''
+    costs of a batched run and their gradients with respect to PARAMETERS
+    '''
+    def __init__(self,states,iae,ise,iae_gradient,ise_gradient,sensitivities=None):
+        self.states = states                # shape (T, controllers)
+        self.iae = iae                      # shape (controllers,)
+        self.ise = ise                      # shape (controllers,)
+        self.iae_gradient = iae_gradient    # shape (controllers, parameters)
+        self.ise_gradient = ise_gradient    # shape (controllers, parameters)
+        self.sensitivities = sensitivities  # shape (T, parameters, controllers)
+
+
+def sensitivity(bank,setpoint,dt,plant=None,offset=0.0,setpoint_noise=0.0,
+    trajectories=False):
+    '''
+    simulate() plus the derivatives of every state with respect to the gains
+
+    The controller and plant are linear in their states, so the derivatives
+    of integrator, derivative filters, command and plant output with respect
+    to kp, ki, kd and feed_forward follow their own linear recursions and
+    are carried along with the simulation. The plant runs one instance per
+    controller and per parameter next to the regular ones, as its response
+    to a command perturbation is its response to the perturbation alone.
+    IAE and ISE of the tracking error and their gradients come out of the
+    same pass; trajectories=True also returns the state sensitivities.
+    Noise realizations are held fixed, which leaves the gradients exact.
+    '''
+    setpoint = np.asarray(setpoint)
+    time_length = len(setpoint)
+    count = bank.count
+    parameters = len(PARAMETERS)
+    if plant is None:
+        plant = Integrator()
+
+    sigma = 10.0 * dt                               # cutoff frequency for dirty derivative
+    beta = (2.0 * sigma - dt) / (2.0 * sigma + dt)  # dirty derivative gain
+
+    states = np.empty((time_length,count))
+    sensitivities = np.zeros((time_length,parameters,count)) if trajectories else None
+    state_sensitivity = np.zeros((parameters,count))
+    previous_state_sensitivity = np.zeros((parameters,count))
+    error_sensitivity = np.zeros((parameters,count))
+    integrator_sensitivity = np.zeros((parameters,count))
+    error_derivative_sensitivity = np.zeros((parameters,count))
+    state_derivative_sensitivity = np.zeros((parameters,count))
+    # d command / d parameter of the explicit gain terms, row per parameter
+    direct = np.zeros((parameters,count))
+    direct[3] = 1.0
+    iae = np.zeros(count)
+    ise = np.zeros(count)
+    iae_gradient = np.zeros((parameters,count))
+    ise_gradient = np.zeros((parameters,count))
+    perturbation = np.zeros((1 + parameters)*count)
+
+    bank.reset()
+    plant.reset((1 + parameters)*count,dt)
+    states[0] = plant.output()[:count]
+    with np.errstate(all='ignore'):
+        for ii in range(1,time_length):
+            desired_state = setpoint[ii]
+            if setpoint_noise:
+                desired_state = desired_state \
+                    + setpoint_noise*bank.rng.standard_normal(count)
+            command = bank.command(states[ii-1],desired_state,dt)
+
+            # the same recursions differentiated, the setpoint is fixed
+            previous_error_sensitivity = error_sensitivity
+            error_sensitivity = -state_sensitivity
+            integrator_sensitivity += (dt/2.0) \
+                * (error_sensitivity + previous_error_sensitivity)
+            error_derivative_sensitivity *= beta
+            error_derivative_sensitivity += (1.0 - beta) \
+                * (error_sensitivity - previous_error_sensitivity) / dt
+            state_derivative_sensitivity *= beta
+            state_derivative_sensitivity += (1.0 - beta) \
+                * (state_sensitivity - previous_state_sensitivity) / dt
+            derivative = np.where(bank.kd_error,bank.error_derivative,
+                -bank.state_derivative)
+            derivative_sensitivity = np.where(bank.kd_error,
+                error_derivative_sensitivity,-state_derivative_sensitivity)
+
+            direct[0] = bank.previous_state_error
+            direct[1] = bank.integrator
+            direct[2] = derivative
+            command_sensitivity = bank.kp*error_sensitivity \
+                + bank.ki*integrator_sensitivity \
+                + bank.kd*derivative_sensitivity + direct
+
+            perturbation[:count] = command + offset
+            perturbation[count:] = command_sensitivity.ravel()
+            output = plant.step(perturbation)
+            previous_state_sensitivity = state_sensitivity
+            states[ii] = output[:count]
+            state_sensitivity = output[count:].reshape(parameters,count).copy()
+            if trajectories:
+                sensitivities[ii] = state_sensitivity
+
+            # costs of the tracking error of the noise-free setpoint
+            error = setpoint[ii] - states[ii]
+            iae += np.abs(error)*dt
+            ise += error**2*dt
+            iae_gradient -= np.sign(error)*state_sensitivity*dt
+            ise_gradient -= 2.0*error*state_sensitivity*dt
+
+    return SensitivityResult(states,iae,ise,iae_gradient.T,ise_gradient.T,
+        sensitivities)
@@ -0,0 +1,226 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: Local control server hosting a PIDBank over a Unix socket
+'''
+
+import os
+import socket
+import socketserver
+import struct
+import threading
+
+import numpy as np
+
+# every frame starts with kind, status, sequence, record count and dt
+HEADER = struct.Struct('<HHIId')
+
+UPDATE = 1      # (id, state, setpoint) records, replied with one command each
+GAINS = 2       # (id, kp, ki, kd, feed_forward, kd_error) records
+RESET = 3       # controller ids
+
+OK = 0
+ERROR = 1
+
+# packed little endian records, no padding
+RECORDS = {
+    UPDATE : np.dtype([('id','<u4'),('state','<f8'),('setpoint','<f8')]),
+    GAINS : np.dtype([('id','<u4'),('kp','<f8'),('ki','<f8'),('kd','<f8'),
+        ('feed_forward','<f8'),('kd_error','u1')]),
+    RESET : np.dtype('<u4'),
+    }
+COMMAND = np.dtype('<f8')
+
+
+class ControlHandler(socketserver.StreamRequestHandler):
+    '''
+    serves the frames of one client connection in order
+    '''
+    def handle(self):
+        while True:
+            header = self.rfile.read(HEADER.size)
+            if len(header) < HEADER.size:
+                return
+            kind, status, sequence, count, dt = HEADER.unpack(header)
+            record = RECORDS.get(kind)
+            if record is None:
+                # the payload size of an unknown kind is unknown too, so the
+                # rest of the stream cannot be framed
+                self.request.sendall(HEADER.pack(kind,ERROR,sequence,0,0.0))
+                return
+            size = count*record.itemsize
+            payload = self.rfile.read(size)
+            if len(payload) < size:
+                return
+
+            try:
+                reply = self.server.dispatch(kind,
+                    np.frombuffer(payload,dtype=record),dt)
+                status = OK
+            except (TypeError, IndexError, ValueError):
+                reply = b''
+                status = ERROR
+            self.request.sendall(HEADER.pack(kind,status,sequence,
+                len(reply)//COMMAND.itemsize,0.0) + reply)
+
+
+class ControlServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    '''
+    ControlServer Class
+
+    One process owns every controller in bank. Clients send batches of
+    updates as binary frames and each batch advances the addressed
+    controllers in one vectorized bank step, so the cost per controller is
+    a few array operations rather than a syscall. Clients are served on
+    their own threads and the bank is shared under a lock.
+    '''
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self,path,bank):
+        self.path = path
+        self.bank = bank
+        self.lock = threading.Lock()
+        if os.path.exists(path):
+            os.unlink(path)
+        socketserver.UnixStreamServer.__init__(self,path,ControlHandler)
+
+    def start(self):
+        # serves from a background thread, e.g. for tests in one process
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def dispatch(self,kind,records,dt):
+        if kind == UPDATE:
+            ids = self.indices(records['id'])
+            with self.lock:
+                bank = self.bank.select(ids)
+                command = bank.command(records['state'],records['setpoint'],dt)
+                self.bank.assign(ids,bank)
+            return command.astype(COMMAND).tobytes()
+        if kind == GAINS:
+            ids = self.indices(records['id'])
+            with self.lock:
+                for name in ('kp','ki','kd','feed_forward'):
+                    getattr(self.bank,name)[ids] = records[name]
+                self.bank.kd_error[ids] = records['kd_error'].astype(bool)
+            return b''
+        if kind == RESET:
+            ids = self.indices(records)
+            with self.lock:
+                self.bank.reset(ids)
+            return b''
+        raise ValueError('unknown frame kind %d' % kind)
+
+    def indices(self,ids):
+        # a controller may only appear once per batch
+        ids = ids.astype(np.intp)
+        if len(ids) and (ids.max() >= self.bank.count
+            or len(np.unique(ids)) != len(ids)):
+            raise IndexError('invalid or repeated controller ids')
+        return ids
+
+
+class ControlClient():
+    '''
+    ControlClient Class
+
+    Connection to a ControlServer. submit() sends a batch without waiting
+    and receive() returns the replies in the order they were submitted, so
+    several batches can be in flight at once.
+    '''
+    def __init__(self,path):
+        self.socket = socket.socket(socket.AF_UNIX,socket.SOCK_STREAM)
+        self.socket.connect(path)
+        self.reader = self.socket.makefile('rb')
+        self.sequence = 0
+        self.pending = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*args):
+        self.close()
+
+    def close(self):
+        self.reader.close()
+        self.socket.close()
+
+    def send(self,kind,records,dt=0.0):
+        self.sequence += 1
+        self.pending += 1
+        self.socket.sendall(HEADER.pack(kind,OK,self.sequence,len(records),dt)
+            + records.tobytes())
+        return self.sequence
+
+    def receive(self):
+        '''
+        next reply as (sequence, commands)
+        '''
+        header = self.reader.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise ConnectionError('control server closed the connection')
+        kind, status, sequence, count, dt = HEADER.unpack(header)
+        payload = self.reader.read(count*COMMAND.itemsize)
+        self.pending -= 1
+        if status != OK:
+            raise ValueError('control server rejected request %d' % sequence)
+        return sequence, np.frombuffer(payload,dtype=COMMAND)
+
+    def submit(self,ids,states,setpoints,dt):
+        records = np.empty(len(ids),dtype=RECORDS[UPDATE])
+        records['id'] = ids
+        records['state'] = states
+        records['setpoint'] = setpoints
+        return self.send(UPDATE,records,dt)
+
+    def update(self,ids,states,setpoints,dt):
+        '''
+        commands of the controllers ids for one batch of samples
+        '''
+        self.drain()
+        self.submit(ids,states,setpoints,dt)
+        return self.receive()[1]
+
+    def pipeline(self,batches,dt,depth=16):
+        '''
+        commands for a sequence of (ids, states, setpoints) batches with up
+        to depth batches in flight
+        '''
+        commands = []
+        for batch in batches:
+            if self.pending >= depth:
+                commands.append(self.receive()[1])
+            self.submit(batch[0],batch[1],batch[2],dt)
+        while self.pending:
+            commands.append(self.receive()[1])
+        return commands
+
+    def drain(self):
+        while self.pending:
+            self.receive()
+
+    def set_gains(self,ids,kp,ki,kd,feed_forward=0.0,kd_error=True):
+        records = np.empty(len(ids),dtype=RECORDS[GAINS])
+        records['id'] = ids
+        records['kp'] = kp
+        records['ki'] = ki
+        records['kd'] = kd
+        records['feed_forward'] = feed_forward
+        records['kd_error'] = kd_error
+        self.drain()
+        self.send(GAINS,records)
+        self.receive()
+
+    def reset(self,ids):
+        self.drain()
+        self.send(RESET,np.asarray(ids,dtype=RECORDS[RESET]))
+        self.receive()
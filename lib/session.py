@@ -0,0 +1,159 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: Compressed tuning session snapshots with lazily loaded trajectories
+'''
+
+import json
+
+import numpy as np
+
+from .bank import PIDBank
+from .plant import PLANTS
+from .simulation import Simulation
+
+# bump when the stored parameters change meaning
+VERSION = 1
+
+GAINS = ("kp","ki","kd","kd_error","feed_forward","noise_sigma")
+
+
+def parameters(simulation,bank,enabled=None,plant="Implicit Integrator",
+    settings=None):
+    '''
+    JSON-ready description of everything that produced the results
+    '''
+    enabled = np.ones(bank.count,dtype=bool) if enabled is None else enabled
+    description = {"version" : VERSION,"profile" : simulation.profile,
+        "time_start" : simulation.time_start,"time_end" : simulation.time_end,
+        "hz" : simulation.hz,"dtype" : simulation.dtype.name,"plant" : plant,
+        "steady_state_error" : simulation.steady_state_error,
+        "setpoint_noise_sigma" : simulation.noise_sigma,
+        "noise_seed" : simulation.noise_seed,"controller_count" : bank.count,
+        "enabled" : [bool(e) for e in enabled],"settings" : settings or {}}
+    for name in GAINS:
+        description[name] = getattr(bank,name).tolist()
+    return description
+
+def configure(description,setpoint=None):
+    '''
+    Simulation with the setpoint, noise and plant of a description
+    '''
+    simulation = Simulation(description["profile"],description["time_start"],
+        description["time_end"],description["hz"],description["dtype"],
+        controller_count=description["controller_count"])
+    simulation.plant = PLANTS[description["plant"]]()
+    simulation.steady_state_error = description["steady_state_error"]
+    simulation.noise_sigma = description["setpoint_noise_sigma"]
+    simulation.setpoint_noise_draw(description["noise_seed"])
+    if setpoint is not None:
+        simulation.setpoint[:] = setpoint
+        simulation.setpoint_noise_update()
+    return simulation
+
+def regenerate(simulation,bank,index):
+    # results of the controllers at index, the way the tabs compute them
+    simulation.superposition_update(bank.copy(),index)
+    return simulation.results
+
+def save(path,simulation,bank,enabled=None,plant="Implicit Integrator",
+    settings=None):
+    '''
+    writes a session to a compressed .npz
+
+    The parameters are one JSON member. Results that the parameters
+    regenerate bit for bit (controllers without command noise, whose
+    setpoint noise comes from the stored seed) are not stored, every other
+    trajectory is its own member so it is only decompressed when read. The
+    setpoint is stored only when it was edited away from its profile.
+    '''
+    description = parameters(simulation,bank,enabled,plant,settings)
+    arrays = {}
+    fresh = configure(description)
+    if not np.array_equal(fresh.setpoint,simulation.setpoint):
+        arrays["setpoint"] = simulation.setpoint
+        fresh = configure(description,simulation.setpoint)
+
+    candidates = np.flatnonzero(bank.noise_sigma == 0.0)
+    regenerated = candidates
+    if len(candidates):
+        results = regenerate(fresh,bank,candidates)
+        same = (results[:,candidates] == simulation.results[:,candidates]).all(axis=0)
+        regenerated = candidates[same]
+    stored = np.setdiff1d(np.arange(bank.count),regenerated)
+    for index in stored:
+        arrays["result_%d" % index] = simulation.results[:,index]
+    description["stored"] = stored.tolist()
+    np.savez_compressed(path,parameters=np.array(json.dumps(description)),**arrays)
+
+def load(path):
+    return Session(path)
+
+
+class Session():
+    '''
+    Session Class
+
+    A saved session: parameters, gains and enabled flags load eagerly, the
+    setpoint and trajectories only when asked for. Stored trajectories are
+    decompressed one controller at a time, regenerable ones are simulated
+    together on first use, and both are cached. The archive stays open
+    until close(), or the end of a with block.
+    '''
+    def __init__(self,path):
+        self.path = path
+        self.archive = np.load(path)
+        self.parameters = json.loads(str(self.archive["parameters"]))
+        if self.parameters["version"] > VERSION:
+            raise ValueError('session written by a newer version')
+        self.bank = PIDBank(**dict((name,self.parameters[name]) for name in GAINS))
+        self.enabled = np.array(self.parameters["enabled"],dtype=bool)
+        self.stored = set(self.parameters["stored"])
+        self.settings = self.parameters["settings"]
+        self.cache = {}
+        self.simulation = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*args):
+        self.close()
+
+    def configured(self):
+        # Simulation holding the setpoint of the session, built once
+        if self.simulation is None:
+            setpoint = self.archive["setpoint"] if "setpoint" in self.archive \
+                else None
+            self.simulation = configure(self.parameters,setpoint)
+        return self.simulation
+
+    def setpoint(self):
+        return self.configured().setpoint
+
+    def setpoint_with_noise(self):
+        return self.configured().setpoint_with_noise
+
+    def time(self):
+        return self.configured().time
+
+    def result(self,index):
+        '''
+        trajectory of controller index
+        '''
+        if index not in self.cache:
+            if index in self.stored:
+                self.cache[index] = self.archive["result_%d" % index]
+            else:
+                regenerable = [ii for ii in range(self.bank.count)
+                    if ii not in self.stored]
+                results = regenerate(self.configured(),self.bank,regenerable)
+                for ii in regenerable:
+                    self.cache[ii] = results[:,ii].copy()
+        return self.cache[index]
+
+    def results(self):
+        # every trajectory, shape (T, controllers)
+        return np.stack([self.result(ii) for ii in range(self.bank.count)],axis=1)
+
+    def close(self):
+        self.archive.close()
@@ -0,0 +1,97 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: Setpoint profiles for the PID control GUI
+'''
+
+import numpy as np
+
+# every profile is laid out over a 10 second reference horizon and is
+# stretched to whatever horizon the simulation is configured with
+PROFILE_DURATION = 10.0
+
+# each segment is (start fraction, end fraction, center, coefficients) and
+# evaluates to sum(coefficients[p] * (u - center)**p) where u is the time
+# scaled onto the reference horizon
+PROFILES = {
+    "STEP" : [
+        (0.0, 0.1, 0.0, ( 0.0,)),
+        (0.1, 0.2, 0.0, ( 1.0,)),
+        (0.2, 0.3, 0.0, ( 0.0,)),
+        (0.3, 0.4, 0.0, (-1.0,)),
+        (0.4, 0.5, 0.0, ( 0.0,)),
+        (0.5, 0.6, 0.0, ( 1.0,)),
+        (0.6, 0.7, 0.0, (-1.0,)),
+        (0.7, 0.8, 0.0, ( 2.0,)),
+        (0.8, 0.9, 0.0, (-3.0,)),
+        (0.9, 1.0, 0.0, ( 0.0,)),
+        ],
+    "RAMP" : [
+        (0.0,  0.1,  0.0, (  0.0,)),
+        (0.1,  0.15, 0.0, ( -2.0,  2.0)),
+        (0.15, 0.2,  0.0, (  4.0, -2.0)),
+        (0.2,  0.3,  0.0, (  0.0,)),
+        (0.3,  0.35, 0.0, (  6.0, -2.0)),
+        (0.35, 0.4,  0.0, ( -8.0,  2.0)),
+        (0.4,  0.5,  0.0, (  0.0,)),
+        (0.5,  0.55, 0.0, (-10.0,  2.0)),
+        (0.55, 0.6,  0.0, ( 12.0, -2.0)),
+        (0.6,  0.65, 0.0, ( 12.0, -2.0)),
+        (0.65, 0.7,  0.0, (-14.0,  2.0)),
+        (0.7,  0.75, 7.0, (  0.0,  4.0)),
+        (0.75, 0.8,  7.5, (  2.0, -4.0)),
+        (0.8,  0.85, 8.0, (  0.0, -6.0)),
+        (0.85, 0.9,  8.5, ( -3.0,  6.0)),
+        (0.9,  1.0,  0.0, (  0.0,)),
+        ],
+    "QUADRATIC" : [
+        (0.0, 0.1, 0.0, ( 0.0,)),
+        (0.1, 0.2, 1.5, ( 1.0, 0.0, -4.0)),
+        (0.2, 0.3, 0.0, ( 0.0,)),
+        (0.3, 0.4, 3.5, (-1.0, 0.0,  4.0)),
+        (0.4, 0.5, 0.0, ( 0.0,)),
+        (0.5, 0.6, 5.5, ( 1.0, 0.0, -4.0)),
+        (0.6, 0.7, 6.5, (-1.0, 0.0,  4.0)),
+        (0.7, 0.8, 7.5, ( 2.0, 0.0, -8.0)),
+        (0.8, 0.9, 8.5, (-3.0, 0.0, 12.0)),
+        (0.9, 1.0, 0.0, ( 0.0,)),
+        ],
+    }
+
+def profile_scale(time_start,time_end):
+    '''
+    factor that maps elapsed time onto the reference horizon
+    '''
+    return PROFILE_DURATION/(time_end - time_start)
+
+def segment_bounds(profile,time_length):
+    '''
+    sample index ranges of each segment of a profile
+    '''
+    if profile not in PROFILES:
+        raise ValueError('need valid input type (STEP, RAMP, etc.)')
+    bounds = []
+    for start, end, center, coefficients in PROFILES[profile]:
+        stop = time_length if end >= 1.0 else int(end*time_length)
+        bounds.append((int(start*time_length), stop, center, coefficients))
+    return bounds
+
+def build(profile,time,time_start,time_end,out):
+    '''
+    writes the setpoint profile sampled at time into out
+    '''
+    scale = profile_scale(time_start,time_end)
+    for start, stop, center, coefficients in segment_bounds(profile,len(out)):
+        if stop <= start:
+            continue
+        if len(coefficients) == 1:
+            out[start:stop] = coefficients[0]
+            continue
+        offset = (time[start:stop] - time_start)*scale - center
+        segment = out[start:stop]
+        segment[:] = coefficients[0]
+        power = np.ones_like(offset)
+        for coefficient in coefficients[1:]:
+            power *= offset
+            segment += coefficient*power
+    return out
@@ -0,0 +1,310 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: Crash-resumable gain sweeps sharded over a shared filesystem
+
+Layout of a sweep directory:
+    plan.json           profile, horizon, plant, metric and shard count
+    axes.npz            gain axes of the grid
+    claims/shard_N      held by a worker, its mtime is the heartbeat
+    results/shard_N.npz columns index, value and one per gain
+
+Workers on any node run "python -m lib.shard work DIRECTORY". Claims are
+created with O_CREAT | O_EXCL, so exactly one worker gets a shard; a claim
+whose heartbeat is older than the lease is renamed away by one worker and
+claimed again, a live claim renamed in a race is put back. A worker whose
+claim was taken over discards its result. Results are written to a
+temporary file and renamed into place. Node clocks must agree to well within
+the lease.
+'''
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import uuid
+
+import numpy as np
+
+from .plant import PLANTS
+from .simulation import Simulation
+from .sweep import evaluate
+
+
+def plan(directory,axes,fixed=None,metric="iae",profile="STEP",time_end=10.0,
+    hz=100.0,plant="Implicit Integrator",offset=0.0,shard_size=4096):
+    '''
+    lays out the sweep of the grid spanned by axes (gain name to values,
+    every combination) with the other PIDBank gains in fixed; planning the
+    same sweep again keeps its finished shards
+    '''
+    names = list(axes)
+    shape = [len(axes[name]) for name in names]
+    description = {"names" : names,"shape" : shape,"fixed" : fixed or {},
+        "metric" : metric,"profile" : profile,"time_end" : time_end,"hz" : hz,
+        "plant" : plant,"offset" : offset,"shard_size" : shard_size,
+        "shards" : -(-int(np.prod(shape))//shard_size)}
+    for name in ("claims","results"):
+        os.makedirs(os.path.join(directory,name),exist_ok=True)
+    path = os.path.join(directory,"plan.json")
+    if os.path.exists(path):
+        existing = read_plan(directory)
+        same_axes = all(np.array_equal(existing["axes"][name],axes[name])
+            for name in names) if existing["names"] == names else False
+        del existing["axes"]
+        if existing != description or not same_axes:
+            raise ValueError('%s holds a different sweep' % directory)
+        return description
+    atomic_write(os.path.join(directory,"axes.npz"),lambda f:
+        np.savez(f,**dict((name,np.asarray(axes[name],dtype=np.float64))
+        for name in names)))
+    atomic_write(path,lambda f: f.write(json.dumps(description).encode()))
+    return description
+
+def read_plan(directory):
+    with open(os.path.join(directory,"plan.json")) as f:
+        description = json.load(f)
+    with np.load(os.path.join(directory,"axes.npz")) as axes:
+        description["axes"] = dict((name,axes[name]) for name in description["names"])
+    return description
+
+def atomic_write(path,write):
+    # readers see the old file or the whole new one, never a partial write
+    temporary = "%s.%s.tmp" % (path,uuid.uuid4().hex)
+    with open(temporary,"wb") as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary,path)
+
+def shard_path(directory,kind,shard):
+    if kind == "results":
+        return os.path.join(directory,"results","shard_%d.npz" % shard)
+    return os.path.join(directory,"claims","shard_%d" % shard)
+
+def claim(directory,shard,worker,lease):
+    '''
+    True when worker now holds shard; stale claims are taken over
+    '''
+    path = shard_path(directory,"claims",shard)
+    for attempt in range(2):
+        try:
+            descriptor = os.open(path,os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                stale = time.time() - os.stat(path).st_mtime > lease
+            except FileNotFoundError:
+                continue
+            if not stale:
+                return False
+            # only one of the workers seeing the stale claim renames it
+            tombstone = "%s.stale.%s.%s" % (path,worker,uuid.uuid4().hex)
+            try:
+                os.rename(path,tombstone)
+            except FileNotFoundError:
+                return False
+            # another worker may have replaced the stale claim with a live
+            # one between the stat and the rename, that one goes back
+            if time.time() - os.stat(tombstone).st_mtime <= lease:
+                try:
+                    os.link(tombstone,path)
+                except FileExistsError:
+                    pass
+                os.remove(tombstone)
+                return False
+            os.remove(tombstone)
+            continue
+        with os.fdopen(descriptor,"w") as f:
+            f.write("%s %f\n" % (worker,time.time()))
+        return True
+    return False
+
+def holds(path,worker):
+    # True while the claim at path is the one worker created
+    try:
+        with open(path) as f:
+            return f.read().rsplit(" ",1)[0] == worker
+    except FileNotFoundError:
+        return False
+
+def release(path,worker):
+    if holds(path,worker):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+class Heartbeat():
+    '''
+    Heartbeat Class
+
+    Touches the claim file of worker every interval seconds from a
+    background thread while a shard is evaluated. lost is set once the
+    claim is gone or belongs to another worker, i.e. the shard was taken
+    over; the result is then discarded.
+    '''
+    def __init__(self,path,worker,interval):
+        self.path = path
+        self.worker = worker
+        self.interval = interval
+        self.lost = False
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self,*exception):
+        self.stopped.set()
+        self.thread.join()
+        if not holds(self.path,self.worker):
+            self.lost = True
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            if not holds(self.path,self.worker):
+                self.lost = True
+                return
+            try:
+                os.utime(self.path)
+            except FileNotFoundError:
+                self.lost = True
+                return
+
+
+def work(directory,worker=None,heartbeat=5.0,lease=30.0,chunk=1024):
+    '''
+    claims and evaluates shards until every shard has a result, returns
+    the shards this worker finished
+    '''
+    worker = worker or "%s-%d-%s" % (socket.gethostname(),os.getpid(),
+        uuid.uuid4().hex[:6])
+    description = read_plan(directory)
+    simulation = Simulation(description["profile"],time_end=description["time_end"],
+        hz=description["hz"])
+    plant = PLANTS[description["plant"]]()
+    names, shape = description["names"], description["shape"]
+    size, shards = description["shard_size"], description["shards"]
+
+    finished = []
+    # workers start at different shards to avoid contending for the same ones
+    first = int(uuid.uuid5(uuid.NAMESPACE_DNS,worker).int % shards)
+    while True:
+        pending = [shard for shard in itertools.chain(range(first,shards),
+            range(first)) if not os.path.exists(shard_path(directory,"results",shard))]
+        if not pending:
+            return finished
+        claimed = None
+        for shard in pending:
+            if claim(directory,shard,worker,lease):
+                claimed = shard
+                break
+        if claimed is None:
+            # everything left is held by live workers, wait for them or
+            # for their leases to run out
+            time.sleep(heartbeat)
+            continue
+
+        path = shard_path(directory,"claims",claimed)
+        if os.path.exists(shard_path(directory,"results",claimed)):
+            # finished by another worker since the pending list was made
+            release(path,worker)
+            continue
+        index = np.arange(claimed*size,min((claimed + 1)*size,int(np.prod(shape))))
+        coordinates = np.unravel_index(index,shape)
+        gains = dict(description["fixed"])
+        for name, coordinate in zip(names,coordinates):
+            gains[name] = description["axes"][name][coordinate]
+        with Heartbeat(path,worker,heartbeat) as beat:
+            values = evaluate(gains,simulation.setpoint,simulation.time,
+                simulation.dt,description["metric"],plant,description["offset"],
+                chunk)
+        if beat.lost:
+            # the shard was taken over, its new holder writes the result
+            continue
+        columns = dict((name,gains[name]) for name in names)
+        atomic_write(shard_path(directory,"results",claimed),lambda f:
+            np.savez(f,index=index,value=values,**columns))
+        release(path,worker)
+        finished.append(claimed)
+
+def status(directory,lease=30.0):
+    '''
+    number of finished, claimed, stale (claimed, heartbeat older than
+    lease) and pending shards
+    '''
+    description = read_plan(directory)
+    counts = {"finished" : 0,"claimed" : 0,"stale" : 0,"pending" : 0}
+    for shard in range(description["shards"]):
+        if os.path.exists(shard_path(directory,"results",shard)):
+            counts["finished"] += 1
+            continue
+        try:
+            age = time.time() - os.stat(shard_path(directory,"claims",shard)).st_mtime
+        except FileNotFoundError:
+            counts["pending"] += 1
+            continue
+        counts["claimed"] += 1
+        if age > lease:
+            counts["stale"] += 1
+    return counts
+
+def merge(directory):
+    '''
+    columns of every shard in grid order, written to merged.npz; value is
+    also returned in the grid shape as "grid"
+    '''
+    description = read_plan(directory)
+    parts = []
+    for shard in range(description["shards"]):
+        path = shard_path(directory,"results",shard)
+        if not os.path.exists(path):
+            raise ValueError('shard %d has no result yet' % shard)
+        with np.load(path) as part:
+            parts.append(dict((name,part[name]) for name in part.files))
+    columns = dict((name,np.concatenate([part[name] for part in parts]))
+        for name in parts[0])
+    atomic_write(os.path.join(directory,"merged.npz"),lambda f:
+        np.savez(f,**columns))
+    columns["grid"] = columns["value"].reshape(description["shape"])
+    return columns
+
+def run_local(directory,workers=4,**options):
+    '''
+    runs workers as separate processes on this host until the sweep is done
+    '''
+    processes = [multiprocessing.Process(target=work,args=(directory,),
+        kwargs=options) for ii in range(workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    return status(directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command",choices=("work","status","merge"))
+    parser.add_argument("directory")
+    parser.add_argument("--heartbeat",type=float,default=5.0)
+    parser.add_argument("--lease",type=float,default=30.0)
+    args = parser.parse_args()
+    if args.command == "work":
+        finished = work(args.directory,heartbeat=args.heartbeat,lease=args.lease)
+        print("finished %d shards" % len(finished))
+    elif args.command == "status":
+        print(status(args.directory,args.lease))
+    else:
+        grid = merge(args.directory)["grid"]
+        print("merged %s grid" % (grid.shape,))
+
+if __name__ == '__main__':
+    main()
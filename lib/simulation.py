@@ -0,0 +1,355 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: Headless setpoint and result buffers for PID simulations
+'''
+
+import numpy as np
+
+from . import setpoint
+from .bank import IncrementalSimulator, PIDBank, simulate
+from .plant import Integrator
+
+
+class Simulation():
+    '''
+    Simulation Class
+
+    Owns the time, setpoint and controller result buffers for one setpoint
+    profile. Buffers are contiguous arrays that are only reallocated when
+    the horizon, sample rate, dtype or number of controllers changes. The
+    results are time-major, shape (T, controllers), so every simulated
+    sample writes one contiguous row.
+    '''
+    def __init__(self,profile="STEP",time_start=0.0,time_end=10.0,hz=100.0,
+        dtype=np.float64,controller_count=4,seed=None):
+        self.profile = profile
+        self.controller_count = controller_count
+        self.max_plot_points = 20000    # samples drawn per line
+
+        self.steady_state_error = 0.0
+        self.noise_sigma = 0.0
+        self.plant = None               # None keeps the implicit plant of PID.update
+        self.rng = np.random.default_rng(seed)
+        self.noise_seed = None          # seed of the unit setpoint noise
+        self.simulator = None           # checkpoints of the last bank_update
+        self.basis = None               # basis responses of superposition_update
+        self.basis_key = None
+        self.basis_gains = None         # kp, ki, kd, kd_error behind each basis column
+        self.basis_faulted = None
+        self.basis_setpoint = None      # setpoint the basis was simulated for
+        self.basis_simulator = None     # checkpoints of the setpoint responses
+        self.basis_memory = 256*2**20   # bytes of basis before direct runs are used
+        self.scratch = None
+
+        self.time_length = 0
+        self.dtype = None
+        self.time = None
+        self.setpoint = None
+        self.setpoint_with_noise = None
+        self.results = None
+
+        self.configure(time_start,time_end,hz,dtype)
+
+    def configure(self,time_start=None,time_end=None,hz=None,dtype=None):
+        '''
+        changes the horizon, sample rate or dtype and rebuilds the setpoint
+        '''
+        time_start = self.time_start if time_start is None else float(time_start)
+        time_end = self.time_end if time_end is None else float(time_end)
+        hz = self.hz if hz is None else float(hz)
+        dtype = self.dtype if dtype is None else np.dtype(dtype)
+        if hz <= 0.0 or time_end <= time_start:
+            raise ValueError('need a positive sample rate and horizon')
+        if dtype not in (np.float32, np.float64):
+            raise ValueError('dtype must be float32 or float64')
+
+        self.hz = hz                    # time frequency
+        self.time_start = time_start    # start time
+        self.time_end = time_end        # end time
+        self.dt = 1.0/self.hz           # timestep
+        time_length = int(round((self.time_end-self.time_start)*self.hz))
+
+        if time_length != self.time_length or dtype != self.dtype:
+            # drop the old buffers first so peak memory stays at one set
+            self.time = None
+            self.setpoint = None
+            self.setpoint_with_noise = None
+            self.unit_noise = None
+            self.results = None
+            self.basis = None
+            self.scratch = None
+            self.time_length = time_length
+            self.dtype = dtype
+            self.time = np.empty(self.time_length,dtype=self.dtype)
+            self.setpoint = np.empty(self.time_length,dtype=self.dtype)
+            self.setpoint_with_noise = np.empty(self.time_length,dtype=self.dtype)
+            self.unit_noise = np.empty(self.time_length,dtype=self.dtype)
+            self.results = np.zeros((self.time_length,self.controller_count),
+                dtype=self.dtype)
+
+        self.simulator = None
+        self.basis_key = None
+
+        # time array
+        np.multiply(np.arange(self.time_length),self.dt,out=self.time,
+            casting='unsafe')
+        self.time += self.time_start
+
+        setpoint.build(self.profile,self.time,self.time_start,self.time_end,
+            self.setpoint)
+        self.setpoint_noise_draw()
+
+    def resize(self,controller_count):
+        # number of result columns, existing columns are kept
+        if controller_count == self.controller_count:
+            return
+        results = np.zeros((self.time_length,controller_count),dtype=self.dtype)
+        kept = min(controller_count,self.controller_count)
+        results[:,:kept] = self.results[:,:kept]
+        self.results = None
+        self.results = results
+        self.simulator = None
+        self.basis_key = None
+        self.controller_count = controller_count
+
+    def setpoint_noise_draw(self,seed=None):
+        # unit noise sequence of seed, a fresh seed by default; noise_sigma
+        # only scales it and the seed regenerates it
+        self.noise_seed = int(self.rng.integers(2**63)) if seed is None else int(seed)
+        np.random.default_rng(self.noise_seed).standard_normal(dtype=self.dtype,
+            out=self.unit_noise)
+        self.basis_key = None
+        self.setpoint_noise_update()
+
+    def setpoint_noise_update(self):
+        np.multiply(self.unit_noise,self.noise_sigma,out=self.setpoint_with_noise)
+        self.setpoint_with_noise += self.setpoint
+
+    def bank_update(self,bank):
+        # every controller of the bank in one batched run into self.results,
+        # checkpointed so later setpoint edits only resimulate the suffix
+        self.resize(bank.count)
+        self.simulator = IncrementalSimulator(bank,self.dt,plant=self.plant,
+            offset=self.steady_state_error,dtype=self.dtype)
+        self.simulator.run(self.setpoint_with_noise,out=self.results)
+
+    def setpoint_edit(self,start,values):
+        '''
+        overwrites the setpoint from sample start on, keeping its noise, and
+        resimulates the last bank_update from the checkpoint before start;
+        the next superposition_update resumes its setpoint responses the same
+        way
+        '''
+        stop = start + len(values)
+        noise = self.setpoint_with_noise[start:stop] - self.setpoint[start:stop]
+        self.setpoint[start:stop] = values
+        np.add(self.setpoint[start:stop],noise,out=self.setpoint_with_noise[start:stop])
+        if self.simulator is not None:
+            self.simulator.resume(self.setpoint_with_noise,start,out=self.results)
+
+    def superposition_update(self,bank,index=None):
+        '''
+        results of the controllers at index (all when None) as a sum of
+        precomputed basis responses
+
+        Steady state error, feed forward, setpoint noise and command noise
+        all enter the loop linearly, so the results are the setpoint
+        response plus those inputs times the responses to a unit constant
+        command, the unit setpoint noise and a unit command noise sequence.
+        The basis of a controller is only simulated again when its kp, ki,
+        kd or derivative type, dt or the plant change; otherwise an update
+        is a few multiply-adds. When only a later part of the setpoint
+        changed, the setpoint responses are resumed from the checkpoint
+        before the first changed sample. The checkpoints are taken by the
+        first setpoint change after a basis run, which still covers the
+        whole horizon. Controllers whose basis run faults are simulated
+        directly, as their loop is no longer linear, and so is every
+        controller when the basis would take more than basis_memory bytes.
+        Columns outside index are left untouched.
+        '''
+        self.resize(bank.count)
+        count = bank.count
+        index = np.arange(count) if index is None \
+            else np.unique(np.asarray(index,dtype=np.intp))
+        self.simulator = None
+        if self.time_length*4*count*self.dtype.itemsize > self.basis_memory:
+            self.basis = None
+            self.basis_simulator = None
+            self.basis_key = None
+            self.columns_update(bank,index)
+            return
+
+        key = (self.dt,id(self.plant))
+        if key != self.basis_key or self.basis is None \
+            or self.basis.shape[2] != count:
+            # basis responses time-major, shape (T, 4, controllers)
+            self.basis_key = key
+            self.basis = None
+            self.basis_simulator = None
+            self.basis = np.zeros((self.time_length,4,count),dtype=self.dtype)
+            self.basis_gains = np.full((4,count),np.nan)
+            self.basis_faulted = np.zeros((4,count),dtype=bool)
+            self.basis_setpoint = self.setpoint.copy()
+        else:
+            changed = self.setpoint != self.basis_setpoint
+            if changed.any():
+                start = int(np.argmax(changed))
+                self.basis_resume(start)
+                self.basis_setpoint[start:] = self.setpoint[start:]
+        gains = np.array([bank.kp,bank.ki,bank.kd,bank.kd_error])
+        stale = index[(self.basis_gains[:,index] != gains[:,index]).any(axis=0)]
+        if len(stale):
+            self.basis_simulate(bank,stale)
+            self.basis_gains[:,stale] = gains[:,stale]
+
+        faulted = self.basis_faulted[:,index].any(axis=0)
+        if faulted.any():
+            self.columns_update(bank,index[faulted])
+        index = index[~faulted]
+        # whole buffers are updated in place, a subset column by column
+        if len(index) == count:
+            self.combine(bank,slice(None))
+        else:
+            for ii in index:
+                self.combine(bank,ii)
+
+    def combine(self,bank,columns):
+        # results[:, columns] as the sum of their scaled basis responses
+        target = self.results[:,columns]
+        setpoint, constant, setpoint_noise, command_noise = \
+            [self.basis[:,ii,columns] for ii in range(4)]
+        np.copyto(target,setpoint)
+        self.axpy(target,(bank.feed_forward + self.steady_state_error)[columns],
+            constant)
+        if self.noise_sigma:
+            self.axpy(target,self.noise_sigma,setpoint_noise)
+        if np.any(bank.noise_sigma[columns]):
+            self.axpy(target,bank.noise_sigma[columns],command_noise)
+
+    def axpy(self,target,scale,basis):
+        # target += scale*basis, scale per controller, without temporaries
+        if self.scratch is None or self.scratch.size < target.size:
+            self.scratch = None
+            self.scratch = np.empty(target.size,dtype=self.dtype)
+        scratch = self.scratch[:target.size].reshape(target.shape)
+        np.multiply(basis,scale,out=scratch)
+        target += scratch
+
+    def basis_simulate(self,bank,index):
+        # the four basis responses of the controllers at index in one
+        # batched run, every sample written straight into the basis rows so
+        # no (T, 4*controllers) inputs or outputs are built
+        count = len(index)
+        tile = lambda value: np.tile(value[index],4)
+        block = lambda values: np.repeat(np.array(values,dtype=np.float64),count)
+        basis_bank = PIDBank(tile(bank.kp),tile(bank.ki),tile(bank.kd),
+            tile(bank.kd_error),block([0.0,1.0,0.0,0.0]),block([0.0,0.0,0.0,1.0]))
+        basis_bank.rng = self.rng
+        plant = Integrator() if self.plant is None else self.plant.clone()
+        plant.reset(4*count,self.dt)
+        # the rows of the basis are (4, controllers), the bank is flat; inputs
+        # keep the dtype of the setpoint like in simulate()
+        columns = slice(None) if count == self.basis.shape[2] else index
+        desired = np.zeros((4,count),dtype=self.dtype)
+        self.basis[0][:,columns] = plant.output().reshape(4,count)
+        for ii in range(1,self.time_length):
+            desired[0] = self.setpoint[ii]
+            desired[2] = self.unit_noise[ii]
+            command = basis_bank.command(self.basis[ii-1][:,columns].reshape(-1),
+                desired.reshape(-1),self.dt)
+            self.basis[ii][:,columns] = plant.step(command).reshape(4,count)
+        # faulted controllers have their gains zeroed
+        changed = (basis_bank.kp != tile(bank.kp)) | (basis_bank.ki != tile(bank.ki)) \
+            | (basis_bank.kd != tile(bank.kd))
+        self.basis_faulted[:,index] = changed.reshape(4,count)
+        # the checkpoints of the setpoint responses used other gains
+        self.basis_simulator = None
+
+    def basis_resume(self,start):
+        # setpoint responses of every controller from the checkpoint before
+        # start, only the first change after a basis run starts from sample 0
+        gains = np.nan_to_num(self.basis_gains)     # nan: no basis yet
+        if self.basis_simulator is None:
+            self.basis_simulator = IncrementalSimulator(PIDBank(gains[0],
+                gains[1],gains[2],gains[3] != 0.0),self.dt,plant=None
+                if self.plant is None else self.plant.clone(),dtype=self.dtype)
+            self.basis_simulator.run(self.setpoint,out=self.basis[:,0])
+        else:
+            self.basis_simulator.resume(self.setpoint,start)
+        # the new setpoint may make a response diverge, or stop it diverging
+        resumed = self.basis_simulator.bank
+        self.basis_faulted[0] = (resumed.kp != gains[0]) | (resumed.ki != gains[1]) \
+            | (resumed.kd != gains[2])
+
+    def columns_update(self,bank,index):
+        # direct batched run of the controllers at index into their columns
+        self.results[:,index] = simulate(bank.select(index),
+            self.setpoint_with_noise,self.dt,plant=None if self.plant is None
+            else self.plant.clone(),offset=self.steady_state_error,
+            dtype=self.dtype)
+
+    def controller_update(self,controller,result,terms=None):
+        controller.reset()
+        if terms is not None:
+            self.capture_update(controller,result,terms)
+            return
+        if self.plant is not None:
+            self.plant_update(controller,result)
+            return
+        result[0] = 0.0
+        # the buffers hold NumPy scalars, PID checks for overflow itself
+        with np.errstate(all='ignore'):
+            for ii in range(1,self.time_length):
+                result[ii] = controller.update(result[ii-1],
+                    self.setpoint_with_noise[ii],self.dt) \
+                    + self.steady_state_error
+
+    def plant_update(self,controller,result):
+        # same loop with the controller output driving an explicit plant
+        self.plant.reset(1,self.dt)
+        result[0] = self.plant.output()[0]
+        with np.errstate(all='ignore'):
+            for ii in range(1,self.time_length):
+                command = controller.command(result[ii-1],
+                    self.setpoint_with_noise[ii],self.dt) \
+                    + self.steady_state_error
+                result[ii] = self.plant.step(command)[0]
+
+    def capture_update(self,controller,result,terms):
+        # controller_update that also writes the terms of every sample into
+        # the rows of terms, shape (T, 5)
+        if self.plant is not None:
+            self.plant.reset(1,self.dt)
+            result[0] = self.plant.output()[0]
+        else:
+            result[0] = 0.0
+        terms[0] = 0.0
+        controller.capture(terms[0])
+        with np.errstate(all='ignore'):
+            for ii in range(1,self.time_length):
+                controller.terms = terms[ii]
+                command = controller.command(result[ii-1],
+                    self.setpoint_with_noise[ii],self.dt) \
+                    + self.steady_state_error
+                if self.plant is not None:
+                    result[ii] = self.plant.step(command)[0]
+                else:
+                    result[ii] = result[ii-1] + command
+        controller.capture(None)
+
+    def terms_update(self,bank,terms):
+        '''
+        runs bank once more and writes the P, I, D, feed forward and noise
+        terms of every controller into terms, shape (5, T, controllers)
+        '''
+        simulate(bank,self.setpoint_with_noise,self.dt,plant=None if self.plant
+            is None else self.plant.clone(),offset=self.steady_state_error,
+            terms=terms)
+
+    def plot_slice(self):
+        '''
+        strided view that keeps drawn lines below max_plot_points samples
+        '''
+        stride = max(1,-(-self.time_length//self.max_plot_points))
+        return slice(None,None,stride)
@@ -0,0 +1,156 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: Batched metric evaluation and progressive refinement of gain grids
+'''
+
+import heapq
+
+import numpy as np
+
+from .bank import PIDBank, simulate
+from . import metrics
+
+# metrics offered for sweeps, all of them lower is better
+METRICS = ("iae","ise","overshoot","settling_time")
+
+
+def evaluate(gains,setpoint,time,dt,metric="iae",plant=None,offset=0.0,
+    chunk=1024):
+    '''
+    metric of the closed loop for every gain set in one batched simulation
+
+    gains is a dict of PIDBank keyword arrays (kp, ki, kd, kd_error,
+    feed_forward) that broadcast to the number of gain sets; they are
+    simulated chunk at a time to bound the memory of the trajectories.
+    '''
+    arrays = np.broadcast_arrays(*[np.atleast_1d(np.asarray(value))
+        for value in gains.values()])
+    gains = dict(zip(gains.keys(),arrays))
+    count = len(arrays[0])
+    values = np.empty(count)
+    out = None
+    for start in range(0,count,chunk):
+        bank = PIDBank(**dict((name,value[start:start + chunk])
+            for name, value in gains.items()))
+        if out is None or out.shape[1] != bank.count:
+            out = np.empty((len(setpoint),bank.count))
+        simulate(bank,setpoint,dt,plant=None if plant is None else plant.clone(),
+            offset=offset,out=out)
+        if metric in ("iae","ise"):
+            values[start:start + chunk] = getattr(metrics,metric)(out,setpoint,dt)
+        elif metric == "overshoot":
+            values[start:start + chunk] = metrics.overshoot(out,setpoint)
+        else:
+            values[start:start + chunk] = metrics.settling_time(time,out,setpoint)
+    return values
+
+
+class ProgressiveGrid():
+    '''
+    ProgressiveGrid Class
+
+    Square grid of resolution x resolution cells over two gains that is
+    filled coarse to fine. A coarse grid of blocks is evaluated first, each
+    evaluated point paints its whole block, and then blocks are split in
+    four, the ones with the largest difference to their neighbours (or
+    inside the focus region) first, until every cell holds its own value.
+    next_batch() hands out points to evaluate and apply() takes their
+    values, so evaluation can run anywhere, e.g. on a background thread.
+    '''
+    def __init__(self,x_range,y_range,resolution=64,coarse=8):
+        self.resolution = resolution
+        self.x = np.linspace(x_range[0],x_range[1],resolution)
+        self.y = np.linspace(y_range[0],y_range[1],resolution)
+        self.values = np.full((resolution,resolution),np.nan)   # [y, x]
+        self.focus = None
+        self.heap = []
+        self.evaluated = 0      # points with a value of their own
+
+        stride = 1
+        while 2*stride*coarse <= resolution:
+            stride *= 2
+        self.initial = [(iy,ix,stride) for iy in range(0,resolution,stride)
+            for ix in range(0,resolution,stride)]
+
+    def done(self):
+        return not self.initial and not self.heap
+
+    def next_batch(self,size=64):
+        '''
+        list of (iy, ix, stride) points, each painting a stride sized block
+        '''
+        if self.initial:
+            batch, self.initial = self.initial[:size], self.initial[size:]
+            return batch
+        batch = []
+        while self.heap and len(batch) < size:
+            priority, iy, ix, stride = heapq.heappop(self.heap)
+            half = stride//2
+            # the top left child is the parent point itself, children past
+            # the edge of a grid that is no power of two apart are skipped
+            self.push(iy,ix,half)
+            batch += [(y,x,half) for y, x in ((iy,ix + half),(iy + half,ix),
+                (iy + half,ix + half)) if y < self.resolution and x < self.resolution]
+        return batch
+
+    def apply(self,batch,values):
+        self.evaluated += len(batch)
+        for (iy,ix,stride), value in zip(batch,values):
+            self.values[iy:iy + stride,ix:ix + stride] = value
+        for iy, ix, stride in batch:
+            self.push(iy,ix,stride)
+
+    def extent(self):
+        # cell edges for imshow, the points are the cell centres
+        edges = lambda axis: (axis[0] - (axis[1] - axis[0])/2.0,
+            axis[-1] + (axis[-1] - axis[-2])/2.0) if len(axis) > 1 else \
+            (axis[0] - 0.5,axis[0] + 0.5)
+        return list(edges(self.x) + edges(self.y))
+
+    def points(self,batch):
+        # gain values of a batch along x and y
+        return self.x[[p[1] for p in batch]], self.y[[p[0] for p in batch]]
+
+    def push(self,iy,ix,stride):
+        if stride > 1:
+            heapq.heappush(self.heap,(self.priority(iy,ix,stride),iy,ix,stride))
+
+    def priority(self,iy,ix,stride):
+        # focused blocks first, then by the largest step to a neighbour block
+        value = self.values[iy,ix]
+        neighbours = []
+        if iy >= stride:
+            neighbours.append(self.values[iy - stride,ix])
+        if iy + stride < self.resolution:
+            neighbours.append(self.values[iy + stride,ix])
+        if ix >= stride:
+            neighbours.append(self.values[iy,ix - stride])
+        if ix + stride < self.resolution:
+            neighbours.append(self.values[iy,ix + stride])
+        with np.errstate(invalid='ignore'):
+            steps = np.abs(np.array(neighbours) - value)
+        steps = steps[np.isfinite(steps)]
+        # unknown values (diverged or unsettled) border interesting regions
+        gradient = steps.max() if len(steps) else 0.0
+        if not np.isfinite(value) or len(steps) < len(neighbours):
+            gradient = np.inf
+        focused = self.focus is not None and iy < self.focus[1] \
+            and iy + stride > self.focus[0] and ix < self.focus[3] \
+            and ix + stride > self.focus[2]
+        return (not focused,-gradient)
+
+    def set_focus(self,x_range,y_range):
+        '''
+        refines the blocks in the given gain ranges first, None clears it
+        '''
+        if x_range is None:
+            self.focus = None
+        else:
+            self.focus = (np.searchsorted(self.y,min(y_range)),
+                np.searchsorted(self.y,max(y_range),side='right'),
+                np.searchsorted(self.x,min(x_range)),
+                np.searchsorted(self.x,max(x_range),side='right'))
+        self.heap = [(self.priority(iy,ix,stride),iy,ix,stride)
+            for priority, iy, ix, stride in self.heap]
+        heapq.heapify(self.heap)
@@ -5,39 +5,82 @@ Description: Tab widgets and functions for PID control GUI
 '''
 
 import sys
+from functools import partial
 
 if sys.version_info[0] < 3:
     import Tkinter as tk
     import ttk
+    import tkFileDialog as filedialog
+    import tkMessageBox as messagebox
 else:
     import tkinter as tk
     from tkinter import ttk
+    from tkinter import filedialog, messagebox
 from ttkthemes import ThemedStyle
 
-from .pid import PID
+from .bank import PIDBank
+from .frequency import analyze
+from .live import LiveLoop, looped
+from .montecarlo import monte_carlo
+from .pid import TERMS
+from . import session
+from .plant import PLANTS
+from .setpoint import PROFILES
+from .simulation import Simulation
 
 import numpy as np
 from matplotlib.backends.backend_tkagg import (
     FigureCanvasTkAgg, NavigationToolbar2Tk)
 # Implement the default Matplotlib key bindings.
 from matplotlib.backend_bases import key_press_handler
+from matplotlib.collections import LineCollection
 from matplotlib.figure import Figure
+from matplotlib import colormaps, colors
 import matplotlib.animation as animation
 from matplotlib import style
 style.use('ggplot')
 from PyQt5.QtWidgets import QApplication
 import random
 
+# controller parameters with slider range and label, in panel order
+GAINS = [
+    ("kp", 0.0, 2.0, 'Proportional Gain'),
+    ("ki", 0.0, 20.0, 'Integral Gain'),
+    ("kd", 0.0, 0.25, 'Derivative Gain'),
+    ("feed_forward", -5.0, 5.0, 'Feed Forward'),
+    ("noise_sigma", 0.0, 1.0, 'Noise Sigma'),
+    ]
+
+# plot and label colors of the first controllers, later ones use tab20
+PLOT_COLORS = ['xkcd:orangered','xkcd:goldenrod','xkcd:azure','xkcd:teal']
+LABEL_COLORS = ['orange red','goldenrod','DodgerBlue2','cyan4']
+
 
 class Tab():
     '''
     Tab Class
+
+    Controllers live in one parameter table (a PIDBank plus an enabled
+    mask), are simulated together in one batched call and drawn as a single
+    LineCollection, so any number of them can be overlaid. Every controller
+    has a dirty flag: an event only resimulates the changed controllers that
+    are enabled (disabled ones wait until they are enabled again) and only
+    their lines are updated in place and blitted over a cached background
+    instead of redrawing the figure.
     '''
-    def __init__(self, master, notebook, type):
+    def __init__(self, master, notebook, type, controller_count=4):
         self.master = master # gui master handle
         self.notebook = notebook
         self.type = type
+        self.controller_count = controller_count
         self.initialized = False
+        self.ready = False      # handlers only resimulate once this is set
+        self.live = None        # control loop thread of the live mode
+        self.animation = None
+        self.terms = None       # per-term capture buffer, shape (5, T, controllers)
+        self.collection = None  # controller lines of the last full draw
+        self.background = None  # axes without the lines, for blitting
+        self.background_key = None
 
 
         self.tab = ttk.Frame(self.notebook)
@@ -58,21 +101,18 @@ class Tab():
             self.initialized = True
 
     def initialize(self):
-        if self.type == "STEP":
-            self.setpoint_setup_step()
-        elif self.type == "RAMP":
-            self.setpoint_setup_ramp()
-        elif self.type == "QUADRATIC":
-            self.setpoint_setup_quadratic()
-        else:
+        if self.type not in PROFILES:
             sys.exit('need valid input type (STEP, RAMP, etc.)')
+        self.setpoint_setup()
 
-        self.controller_setup()
+        self.controller_setup(self.controller_count)
 
         self.scrollbar_setup()
 
         self.random_initialization()
 
+        self.ready = True
+        self.controller_update()
         self.draw()
 
 
@@ -93,60 +133,56 @@ class Tab():
             column=0,columnspan=10)
         self.my_plot = self.fig.add_subplot(111)
         self.my_plot.set_ylim([-5,5])
+        self.bode_magnitude_plot = None
+        self.bode_phase_plot = None
+
+    def bode_update(self):
+        # split the figure between the time response and the bode panel
+        self.live_enabled.set(False)
+        self.live_stop()
+        self.fig.clear()
+        if self.bode_enabled.get():
+            self.my_plot = self.fig.add_subplot(211)
+            self.bode_magnitude_plot = self.fig.add_subplot(223)
+            self.bode_phase_plot = self.fig.add_subplot(224)
+        else:
+            self.my_plot = self.fig.add_subplot(111)
+            self.bode_magnitude_plot = None
+            self.bode_phase_plot = None
+        self.draw()
 
-    def setpoint_setup_step(self):
-        self.hz = 100.0         # time frequency
-        self.time_start = 0.0   # start time
-        self.time_end = 10.0    # end time
-        self.dt = 1.0/self.hz   # timestep
-        self.time_length = int((self.time_end-self.time_start)/self.dt)
-
-        # time array
-        self.time = np.arange(self.time_start, self.time_end, self.dt)
-
-        self.steady_state_low = -1.5
-        self.steady_state_high = 1.5
-        self.steady_state_error = 0.0
-
-        self.noise_sigma_low = 0.0
-        self.noise_sigma_high = 1.0
-        self.noise_sigma = 0.0
-
-        # create setpoint list
-        self.setpoint = np.ones((self.time_length,1))
-        self.setpoint_with_noise = np.ones((self.time_length,1))
-        #  0% - 10% =  0.0
-        self.setpoint[0:int(0.1*self.time_length)] *= 0.0
-        # 10% - 20% =  1.0
-        self.setpoint[int(0.1*self.time_length):int(0.2*self.time_length)] *=  1.0
-        # 20% - 30% =  0.0
-        self.setpoint[int(0.2*self.time_length):int(0.3*self.time_length)] *=  0.0
-        # 30% - 40% = -1.0
-        self.setpoint[int(0.3*self.time_length):int(0.4*self.time_length)] *= -1.0
-        # 40% - 50% =  0.0
-        self.setpoint[int(0.4*self.time_length):int(0.5*self.time_length)] *=  0.0
-        # 50% - 60% =  1.0
-        self.setpoint[int(0.5*self.time_length):int(0.6*self.time_length)] *=  1.0
-        # 60% - 70% = -1.0
-        self.setpoint[int(0.6*self.time_length):int(0.7*self.time_length)] *= -1.0
-        # 70% - 80% =  2.0
-        self.setpoint[int(0.7*self.time_length):int(0.8*self.time_length)] *=  2.0
-        # 80% - 90% = -3.0
-        self.setpoint[int(0.8*self.time_length):int(0.9*self.time_length)] *= -3.0
-        # 90% -100% =  0.0
-        self.setpoint[int(0.9*self.time_length):] *= -0.0
-
-        self.setpoint_noise_update()
-
-    def setpoint_setup_ramp(self):
-        self.hz = 100.0         # time frequency
-        self.time_start = 0.0   # start time
-        self.time_end = 10.0    # end time
-        self.dt = 1.0/self.hz   # timestep
-        self.time_length = int((self.time_end-self.time_start)/self.dt)
-
-        # time array
-        self.time = np.arange(self.time_start, self.time_end, self.dt)
+    def bode_draw(self):
+        self.bode_magnitude_plot.clear()
+        self.bode_phase_plot.clear()
+
+        # every enabled controller in one vectorized pass
+        enabled = np.flatnonzero(self.enabled)
+        frequencies, response, gain_margin, phase_margin, phase_crossover, \
+            gain_crossover = analyze(self.controllers.kp[enabled],
+            self.controllers.ki[enabled],self.controllers.kd[enabled],
+            self.simulation.dt,self.simulation.plant)
+        with np.errstate(divide='ignore'):
+            magnitude = 20.0*np.log10(np.abs(response))
+        phase = np.degrees(np.unwrap(np.angle(response),axis=-1))
+        for jj, ii in enumerate(enabled):
+            label = 'GM %.1f dB, PM %.0f deg' % (20.0*np.log10(gain_margin[jj]),
+                phase_margin[jj])
+            self.bode_magnitude_plot.semilogx(frequencies,magnitude[jj],
+                color=self.plot_colors[ii],label=label)
+            self.bode_phase_plot.semilogx(frequencies,phase[jj],
+                color=self.plot_colors[ii])
+        self.bode_magnitude_plot.axhline(0.0,color='gray',linewidth=0.5)
+        self.bode_phase_plot.axhline(-180.0,color='gray',linewidth=0.5)
+        self.bode_magnitude_plot.set_ylabel('loop magnitude [dB]')
+        self.bode_phase_plot.set_ylabel('loop phase [deg]')
+        self.bode_magnitude_plot.set_xlabel('frequency [rad/s]')
+        self.bode_phase_plot.set_xlabel('frequency [rad/s]')
+        if 0 < len(enabled) <= 8:
+            self.bode_magnitude_plot.legend(fontsize='small')
+
+    def setpoint_setup(self):
+        self.simulation = Simulation(self.type,
+            controller_count=self.controller_count)
 
         self.steady_state_low = -1.5
         self.steady_state_high = 1.5
@@ -156,219 +192,384 @@ class Tab():
         self.noise_sigma_high = 1.0
         self.noise_sigma = 0.0
 
-        # create setpoint list
-        self.setpoint = np.ones((self.time_length,1))
-        self.setpoint_with_noise = np.ones((self.time_length,1))
-        #  0% - 10% =  0.0
-        self.setpoint[0:int(0.1*self.time_length)] *= 0.0
-        # 10% - 20% =  1.0 ramp
-        for ii in range(int(0.1*self.time_length),int(0.15*self.time_length)):
-            self.setpoint[ii] = 2.0 * self.time[ii] - 2.0
-        for ii in range(int(0.15*self.time_length),int(0.2*self.time_length)):
-            self.setpoint[ii] = -2.0 * self.time[ii] + 4.0
-        # 20% - 30% =  0.0
-        self.setpoint[int(0.2*self.time_length):int(0.3*self.time_length)] *=  0.0
-        # 30% - 40% = -1.0 ramp
-        for ii in range(int(0.3*self.time_length),int(0.35*self.time_length)):
-            self.setpoint[ii] = -2.0 * self.time[ii] + 6.0
-        for ii in range(int(0.35*self.time_length),int(0.4*self.time_length)):
-            self.setpoint[ii] = 2.0 * self.time[ii] - 8.0
-        # 40% - 50% =  0.0
-        self.setpoint[int(0.4*self.time_length):int(0.5*self.time_length)] *=  0.0
-        # 50% - 60% =  1.0 ramp
-        for ii in range(int(0.5*self.time_length),int(0.55*self.time_length)):
-            self.setpoint[ii] = 2.0 * self.time[ii] - 10.0
-        for ii in range(int(0.55*self.time_length),int(0.6*self.time_length)):
-            self.setpoint[ii] = -2.0 * self.time[ii] + 12.0
-        # 60% - 70% = -1.0 ramp
-        for ii in range(int(0.6*self.time_length),int(0.65*self.time_length)):
-            self.setpoint[ii] = -2.0 * self.time[ii] + 12.0
-        for ii in range(int(0.65*self.time_length),int(0.7*self.time_length)):
-            self.setpoint[ii] = 2.0 * self.time[ii] - 14.0
-        # 70% - 80% =  2.0 ramp
-        for ii in range(int(0.7*self.time_length),int(0.75*self.time_length)):
-            self.setpoint[ii] = 4.0 * (self.time[ii] - 7.0)
-        for ii in range(int(0.75*self.time_length),int(0.8*self.time_length)):
-            self.setpoint[ii] = -4.0 * (self.time[ii] - 7.5) + 2.0
-        # 80% - 90% = -3.0 ramp
-        for ii in range(int(0.8*self.time_length),int(0.85*self.time_length)):
-            self.setpoint[ii] = -6.0 * (self.time[ii] - 8.0)
-        for ii in range(int(0.85*self.time_length),int(0.9*self.time_length)):
-            self.setpoint[ii] = 6.0 * (self.time[ii] - 8.5) - 3.0
-        # 90% -100% =  0.0
-        self.setpoint[int(0.9*self.time_length):] *= -0.0
-
-        self.setpoint_noise_update()
-
-    def setpoint_setup_quadratic(self):
-        self.hz = 100.0         # time frequency
-        self.time_start = 0.0   # start time
-        self.time_end = 10.0    # end time
-        self.dt = 1.0/self.hz   # timestep
-        self.time_length = int((self.time_end-self.time_start)/self.dt)
-
-        # time array
-        self.time = np.arange(self.time_start, self.time_end, self.dt)
+    def setpoint_noise_update(self):
+        self.simulation.noise_sigma = self.noise_sigma
+        self.simulation.setpoint_noise_update()
 
-        self.steady_state_low = -1.5
-        self.steady_state_high = 1.5
-        self.steady_state_error = 0.0
+    def plant_update(self,event):
+        self.simulation.plant = PLANTS[self.plant_var.get()]()
+        self.dirty[:] = True
+        self.controller_update()
+        self.draw()
 
-        self.noise_sigma_low = 0.0
-        self.noise_sigma_high = 1.0
-        self.noise_sigma = 0.0
+    def horizon_update(self,event):
+        try:
+            time_end = float(self.time_end_var.get())
+            hz = float(self.hz_var.get())
+            dtype = np.float32 if self.float32_enabled.get() else np.float64
+            self.simulation.configure(time_end=time_end,hz=hz,dtype=dtype)
+        except (ValueError, tk.TclError):
+            pass
+        self.time_end_var.set(self.simulation.time_end)
+        self.hz_var.set(self.simulation.hz)
+        self.dirty[:] = True
+        self.controller_update()
+        self.draw()
 
-        # create setpoint list
-        self.setpoint = np.ones((self.time_length,1))
-        self.setpoint_with_noise = np.ones((self.time_length,1))
-        #  0% - 10% =  0.0
-        self.setpoint[0:int(0.1*self.time_length)] *= 0.0
-        # 10% - 20% =  1.0 parabola
-        for ii in range(int(0.1*self.time_length),int(0.2*self.time_length)):
-            self.setpoint[ii] = -4.0 * (self.time[ii] - 1.5)**2 + 1.0
-        # 20% - 30% =  0.0
-        self.setpoint[int(0.2*self.time_length):int(0.3*self.time_length)] *=  0.0
-        # 30% - 40% = -1.0 parabola
-        for ii in range(int(0.3*self.time_length),int(0.4*self.time_length)):
-            self.setpoint[ii] = 4.0 * (self.time[ii] - 3.5)**2 - 1.0
-        # 40% - 50% =  0.0
-        self.setpoint[int(0.4*self.time_length):int(0.5*self.time_length)] *=  0.0
-        # 50% - 60% =  1.0 parabola
-        for ii in range(int(0.5*self.time_length),int(0.6*self.time_length)):
-            self.setpoint[ii] = -4.0 * (self.time[ii] - 5.5)**2 + 1.0
-        # 60% - 70% = -1.0 parabola
-        for ii in range(int(0.6*self.time_length),int(0.7*self.time_length)):
-            self.setpoint[ii] = 4.0 * (self.time[ii] - 6.5)**2 - 1.0
-        # 70% - 80% =  2.0 parabola
-        for ii in range(int(0.7*self.time_length),int(0.8*self.time_length)):
-            self.setpoint[ii] = -8.0 * (self.time[ii] - 7.5)**2 + 2.0
-        # 80% - 90% = -3.0 parabola
-        for ii in range(int(0.8*self.time_length),int(0.9*self.time_length)):
-            self.setpoint[ii] = 12.0 * (self.time[ii] - 8.5)**2 - 3.0
-        # 90% -100% =  0.0
-        self.setpoint[int(0.9*self.time_length):] *= -0.0
+    def controller_setup(self,controller_count):
+        # parameter table: one bank entry and one enabled flag per controller
+        self.controller_count = controller_count
+        self.controllers = PIDBank(count=controller_count)
+        self.enabled = np.ones(controller_count,dtype=bool)
+        self.dirty = np.ones(controller_count,dtype=bool)  # results out of date
 
-        self.setpoint_noise_update()
+        cycle = colormaps['tab20']
+        self.plot_colors = [PLOT_COLORS[ii] if ii < len(PLOT_COLORS)
+            else colors.to_hex(cycle(ii % cycle.N))
+            for ii in range(controller_count)]
+        self.label_colors = [LABEL_COLORS[ii] if ii < len(LABEL_COLORS)
+            else self.plot_colors[ii] for ii in range(controller_count)]
 
-    def setpoint_noise_update(self):
-        for ii in range(self.time_length):
-            self.setpoint_with_noise[ii] = self.setpoint[ii] \
-                + self.noise_sigma*np.random.randn()
-
-    def controller_setup(self):
-
-        # setup results lists
-        self.controller_1_result = np.zeros((self.time_length,1))
-        self.controller_2_result = np.zeros((self.time_length,1))
-        self.controller_3_result = np.zeros((self.time_length,1))
-        self.controller_4_result = np.zeros((self.time_length,1))
-
-        # setup gains
-        self.kp_low = 0.0
-        self.kp_high = 2.0
-        self.kps = [tk.DoubleVar(self.tab),
-                    tk.DoubleVar(self.tab),
-                    tk.DoubleVar(self.tab),
-                    tk.DoubleVar(self.tab)]
-
-        self.ki_low = 0.0
-        self.ki_high = 20.0
-        self.kis = [tk.DoubleVar(self.tab),
-                    tk.DoubleVar(self.tab),
-                    tk.DoubleVar(self.tab),
-                    tk.DoubleVar(self.tab)]
-
-        self.kd_low = 0.0
-        self.kd_high = 0.25
-        self.kds = [tk.DoubleVar(self.tab),
-                    tk.DoubleVar(self.tab),
-                    tk.DoubleVar(self.tab),
-                    tk.DoubleVar(self.tab)]
-
-        self.feed_forward_low = -5.0
-        self.feed_forward_high = 5.0
-        self.feed_forwards = [tk.DoubleVar(self.tab),
-                              tk.DoubleVar(self.tab),
-                              tk.DoubleVar(self.tab),
-                              tk.DoubleVar(self.tab)]
-
-        self.noise_sigma_low    # defined in setpoint_setup_*()
-        self.noise_sigma_high   # defined in setpoint_setup_*()
-        self.noise_sigmas = [tk.DoubleVar(self.tab),
-                              tk.DoubleVar(self.tab),
-                              tk.DoubleVar(self.tab),
-                              tk.DoubleVar(self.tab)]
-
-        #setup controllers
-        self.controller_1 = PID(self.kps[0].get(),self.kis[0].get(),self.kds[0].get())
-        self.controller_2 = PID(self.kps[1].get(),self.kis[1].get(),self.kds[1].get())
-        self.controller_3 = PID(self.kps[2].get(),self.kis[2].get(),self.kds[2].get())
-        self.controller_4 = PID(self.kps[3].get(),self.kis[3].get(),self.kds[3].get())
-
-        # update results with initialized gains
-        self.controller_update(self.controller_1,self.controller_1_result)
-        self.controller_update(self.controller_2,self.controller_2_result)
-        self.controller_update(self.controller_3,self.controller_3_result)
-        self.controller_update(self.controller_4,self.controller_4_result)
+        self.simulation.resize(controller_count)
 
     def random_number(self,low,high):
         number = random.random()*(high-low)+low
         return number
 
     def random_initialization(self):
-        for ii in range(4):
-            random_kp = self.random_number(self.kp_low + 0.2*(self.kp_high - self.kp_low)
-                ,self.kp_low + 0.8*(self.kp_high - self.kp_low))
-            self.kps[ii].set(random_kp)
-            self.kp_scrollbars[ii].set(random_kp)
-            random_ki = self.random_number(self.ki_low,self.ki_high)
-            self.kis[ii].set(random_ki)
-            self.ki_scrollbars[ii].set(random_ki)
+        kp_low, kp_high = self.gain_range("kp")
+        ki_low, ki_high = self.gain_range("ki")
+        for ii in range(self.controller_count):
+            random_kp = self.random_number(kp_low + 0.2*(kp_high - kp_low)
+                ,kp_low + 0.8*(kp_high - kp_low))
+            self.scrollbars["kp"][ii].set(random_kp)
+            random_ki = self.random_number(ki_low,ki_high)
+            self.scrollbars["ki"][ii].set(random_ki)
         random_steady_state = self.random_number(self.steady_state_low,self.steady_state_high)
         self.steady_state.set(random_steady_state)
         self.steady_state_scrollbar.set(random_steady_state)
 
-    def controller_update(self,controller,result):
-        controller.reset()
-        for ii in range(1,self.time_length):
-            result[ii] = controller.update(result[ii-1],
-                self.setpoint_with_noise[ii],self.dt) \
-                + self.steady_state_error
+    def load_gains(self,index,gains):
+        '''
+        moves the sliders of controller index to the given gains
+        '''
+        for name, value in gains.items():
+            low, high = self.gain_range(name)
+            self.scrollbars[name][index].set(float(np.clip(value,low,high)))
+
+    def gain_range(self,name):
+        for gain, low, high, text in GAINS:
+            if gain == name:
+                return low, high
+
+    def controller_update(self):
+        '''
+        resimulates the dirty controllers that are enabled and returns their
+        indices
+        '''
+        # one batched run, or a sum of basis responses when only steady state
+        # error, feed forward or noise changed; a copy keeps faults (zeroed
+        # gains of diverging controllers) out of the table
+        if not self.ready:
+            return np.empty(0,dtype=int)
+        index = np.flatnonzero(self.dirty & self.enabled)
+        if len(index):
+            self.simulation.steady_state_error = self.steady_state_error
+            self.simulation.superposition_update(self.controllers.copy(),index)
+            self.dirty[index] = False
+        return index
 
     def draw(self):
+        # the live mode animates its own artists
+        if not self.ready or self.live is not None:
+            return
 
         self.my_plot.clear() # clear the graph
+        self.collection = None
 
         # plot the setpoint
-        self.my_plot.plot(self.time,self.setpoint_with_noise
-            ,color='xkcd:indigo')
-
-        # plot the controllers
-        if self.controller_1_enabled.get():
-            self.my_plot.plot(self.time,self.controller_1_result,
-                color='xkcd:orangered')
-        if self.controller_2_enabled.get():
-            self.my_plot.plot(self.time,self.controller_2_result,
-                color='xkcd:goldenrod')
-        if self.controller_3_enabled.get():
-            self.my_plot.plot(self.time,self.controller_3_result,
-                color='xkcd:azure')
-        if self.controller_4_enabled.get():
-            self.my_plot.plot(self.time,self.controller_4_result,
-                color='xkcd:teal')
+        view = self.simulation.plot_slice()
+        time = self.simulation.time[view]
+        if self.monte_carlo_enabled.get():
+            self.my_plot.plot(time,self.simulation.setpoint[view]
+                ,color='xkcd:indigo')
+            self.monte_carlo_draw(view)
+        else:
+            self.setpoint_line, = self.my_plot.plot(time,
+                self.simulation.setpoint_with_noise[view],color='xkcd:indigo')
+
+            # every controller as one collection, disabled ones transparent
+            # so refresh() can update single lines in place
+            segments = np.empty((self.controller_count,len(time),2))
+            segments[:,:,0] = time
+            segments[:,:,1] = self.simulation.results[view].T
+            self.collection = LineCollection(segments,colors=self.line_colors())
+            self.my_plot.add_collection(self.collection)
+            self.my_plot.set_xlim([time[0],time[-1]])
+
+            if self.terms_enabled.get():
+                self.terms_draw(view)
 
         self.my_plot.set_ylim([-3.2,3.2])
 
+        if self.bode_magnitude_plot is not None:
+            self.bode_draw()
+
+        if self.collection is None:
+            self.background = None
+            self.canvas.draw()
+        else:
+            self.background_capture()
+
+    def background_capture(self):
+        # one full draw without the setpoint and controller lines, whose
+        # axes are kept for refresh(), then the lines on top
+        artists = (self.setpoint_line,self.collection)
+        for artist in artists:
+            artist.set_visible(False)
+        self.canvas.draw()
+        self.background = self.canvas.copy_from_bbox(self.my_plot.bbox)
+        self.background_key = self.blit_key()
+        for artist in artists:
+            artist.set_visible(True)
+        self.blit_lines()
+
+    def blit_key(self):
+        # a resize, zoom or pan makes the background stale
+        return self.canvas.get_width_height(), tuple(self.my_plot.viewLim.bounds)
+
+    def blit_lines(self):
+        self.my_plot.draw_artist(self.setpoint_line)
+        self.my_plot.draw_artist(self.collection)
+        self.canvas.blit(self.my_plot.bbox)
+
+    def line_colors(self):
+        return [colors.to_rgba(color,1.0 if enabled else 0.0)
+            for color, enabled in zip(self.plot_colors,self.enabled)]
+
+    def refresh(self,index,setpoint=False):
+        '''
+        redraws the lines of the controllers at index, and the setpoint line
+        when it changed, without rebuilding the plot
+        '''
+        if not self.ready or self.live is not None:
+            return
+        # Monte Carlo bands and term traces depend on every input
+        if self.collection is None or self.terms_enabled.get():
+            self.draw()
+            return
+        view = self.simulation.plot_slice()
+        if setpoint:
+            self.setpoint_line.set_ydata(self.simulation.setpoint_with_noise[view])
+        paths = self.collection.get_paths()
+        for ii in index:
+            vertices = paths[ii].vertices.copy()
+            vertices[:,1] = self.simulation.results[view,ii]
+            paths[ii].vertices = vertices
+        self.collection.set_color(self.line_colors())
+
+        if self.bode_magnitude_plot is not None:
+            # the bode axes are redrawn as a whole
+            self.bode_draw()
+            self.canvas.draw_idle()
+        elif self.background is None or self.blit_key() != self.background_key:
+            self.background_capture()
+        else:
+            # only the lines are drawn again, over the cached axes
+            self.canvas.restore_region(self.background)
+            self.blit_lines()
+
+    def terms_draw(self,view):
+        # terms of one controller as toggled dashed traces, only captured
+        # while shown so the regular updates stay capture free
+        try:
+            index = int(self.terms_controller_var.get()) - 1
+        except (ValueError, tk.TclError):
+            index = 0
+        index = int(np.clip(index,0,self.controller_count - 1))
+        self.terms_controller_var.set(index + 1)
+        shape = (len(TERMS),self.simulation.time_length,self.controller_count)
+        if self.terms is None or self.terms.shape != shape:
+            self.terms = np.empty(shape)
+        self.simulation.terms_update(self.controllers.copy(),self.terms)
+
+        time = self.simulation.time[view]
+        styles = ['--',':','-.',(0,(5,1)),(0,(1,3))]
+        for term, name, linestyle in zip(self.terms,TERMS,styles):
+            self.my_plot.plot(time,term[view,index],linestyle=linestyle,
+                color=self.plot_colors[index],label='%s #%d' % (name,index + 1))
+        self.my_plot.legend(loc='lower right',fontsize='small')
+
+    def session_save(self):
+        path = filedialog.asksaveasfilename(defaultextension='.npz',
+            filetypes=[('PID session','*.npz')])
+        if not path:
+            return
+        # disabled controllers are brought up to date so they regenerate
+        dirty = np.flatnonzero(self.dirty)
+        if len(dirty):
+            self.simulation.steady_state_error = self.steady_state_error
+            self.simulation.superposition_update(self.controllers.copy(),dirty)
+            self.dirty[:] = False
+        session.save(path,self.simulation,self.controllers,self.enabled,
+            self.plant_var.get(),settings={"bode" : self.bode_enabled.get(),
+            "monte_carlo" : self.monte_carlo_enabled.get(),
+            "realizations" : self.realizations_var.get(),
+            "terms" : self.terms_enabled.get(),
+            "terms_controller" : self.terms_controller_var.get()})
+
+    def session_load(self):
+        path = filedialog.askopenfilename(filetypes=[('PID session','*.npz')])
+        if not path:
+            return
+        # everything is copied out, so the archive is closed right away
+        with session.load(path) as loaded:
+            self.session_apply(loaded)
+
+    def session_apply(self,loaded):
+        p = loaded.parameters
+        if p["profile"] != self.type:
+            messagebox.showerror('Load Session','the session is for the %s '
+                'tab' % p["profile"])
+            return
+        self.live_enabled.set(False)
+        self.live_stop()
+
+        # widgets first with the handlers idle, then the exact values
+        self.ready = False
+        if p["controller_count"] != self.controller_count:
+            self.controller_count_var.set(p["controller_count"])
+            self.controller_frame.destroy()
+            self.controller_setup(p["controller_count"])
+            self.controller_panel_setup()
+        for name, low, high, text in GAINS:
+            for ii, value in enumerate(p[name]):
+                self.scrollbars[name][ii].set(value)
+        for ii in range(self.controller_count):
+            self.kd_types[ii].set(bool(p["kd_error"][ii]))
+            self.enabled_vars[ii].set(bool(p["enabled"][ii]))
+            for widget in self.controller_widgets[ii]:
+                widget.state(["!disabled"] if p["enabled"][ii] else ["disabled"])
+        for name in session.GAINS:
+            getattr(self.controllers,name)[:] = p[name]
+        self.enabled[:] = loaded.enabled
+        self.steady_state_scrollbar.set(p["steady_state_error"])
+        self.noise_sigma_scrollbar.set(p["setpoint_noise_sigma"])
+        self.steady_state_error = p["steady_state_error"]
+        self.noise_sigma = p["setpoint_noise_sigma"]
+        self.time_end_var.set(p["time_end"])
+        self.hz_var.set(p["hz"])
+        self.float32_enabled.set(p["dtype"] == "float32")
+        self.plant_var.set(p["plant"])
+        settings = loaded.settings
+        self.monte_carlo_enabled.set(settings.get("monte_carlo",False))
+        self.realizations_var.set(settings.get("realizations",100))
+        self.terms_enabled.set(settings.get("terms",False))
+        self.terms_controller_var.set(settings.get("terms_controller",1))
+
+        # the session simulation replaces ours, trajectories are read now
+        # because they are drawn right away
+        self.simulation = loaded.configured()
+        self.simulation.results[:] = loaded.results()
+        self.simulation.basis_key = None
+        self.dirty[:] = False
+        self.ready = True
+        if self.bode_enabled.get() != settings.get("bode",False):
+            self.bode_enabled.set(settings.get("bode",False))
+            self.bode_update()
+        else:
+            self.draw()
+
+    def live_update(self):
+        if self.live_enabled.get():
+            self.live_start()
+        else:
+            self.live_stop()
+            self.draw()
+
+    def live_start(self):
+        # the controllers run at the simulation rate on their own thread and
+        # follow the setpoint of the tab over and over, the plot scrolls a
+        # window of one horizon at the render rate
+        try:
+            render_hz = max(0.1,float(self.render_hz_var.get()))
+        except (ValueError, tk.TclError):
+            render_hz = 20.0
+        self.render_hz_var.set(render_hz)
+
+        self.live = LiveLoop(self.controllers.copy(),self.simulation.dt,
+            looped(self.simulation.setpoint),window=self.simulation.time_length,
+            plant=None if self.simulation.plant is None
+            else self.simulation.plant.clone(),offset=self.steady_state_error,
+            setpoint_noise=self.noise_sigma)
+
+        self.my_plot.clear()
+        self.my_plot.set_xlim([-self.simulation.time_length*self.simulation.dt,0.0])
+        self.my_plot.set_ylim([-3.2,3.2])
+        self.my_plot.set_xlabel('time relative to now [s]')
+        self.live_lines = [self.my_plot.plot([],[],color='xkcd:indigo',
+            animated=True)[0]]
+        for ii in range(self.controller_count):
+            self.live_lines += self.my_plot.plot([],[],color=self.plot_colors[ii],
+                animated=True)
         self.canvas.draw()
 
+        self.live.start()
+        self.animation = animation.FuncAnimation(self.fig,self.live_draw,
+            interval=1000.0/render_hz,blit=True,cache_frame_data=False)
+        self.canvas.draw_idle()
+
+    def live_stop(self):
+        if self.animation is not None:
+            self.animation.event_source.stop()
+            self.animation = None
+        if self.live is not None:
+            self.live.stop()
+            self.live = None
+
+    def live_draw(self,frame):
+        time, setpoint, states = self.live.snapshot()
+        self.live_lines[0].set_data(time,setpoint)
+        for ii, line in enumerate(self.live_lines[1:]):
+            if self.enabled[ii]:
+                line.set_data(time,states[:,ii])
+            else:
+                line.set_data([],[])
+        return self.live_lines
+
+    def monte_carlo_draw(self,view):
+        enabled = np.flatnonzero(self.enabled)
+        if not len(enabled):
+            return
+        try:
+            realizations = max(1,int(self.realizations_var.get()))
+        except (ValueError, tk.TclError):
+            realizations = 100
+        self.realizations_var.set(realizations)
+
+        # all realizations of every enabled controller in one batched run
+        c = self.controllers
+        result = monte_carlo(c.kp[enabled],c.ki[enabled],c.kd[enabled],
+            self.simulation.setpoint,self.simulation.dt,
+            kd_error=c.kd_error[enabled],feed_forward=c.feed_forward[enabled],
+            noise_sigma=c.noise_sigma[enabled],setpoint_noise=self.noise_sigma,
+            offset=self.steady_state_error,plant=self.simulation.plant,
+            realizations=realizations,quantiles=(0.05,0.95))
+        time = self.simulation.time[view]
+        for jj, ii in enumerate(enabled):
+            self.my_plot.fill_between(time,result.bands[0][view,jj],
+                result.bands[1][view,jj],color=self.plot_colors[ii],alpha=0.3,
+                linewidth=0.0)
+            self.my_plot.plot(time,result.mean[view,jj],
+                color=self.plot_colors[ii])
+
     def steady_state_scrollbar_update(self,value):
         self.steady_state.set(value)
         self.steady_state_error = float(value)
-        self.controller_update(self.controller_1,self.controller_1_result)
-        self.controller_update(self.controller_2,self.controller_2_result)
-        self.controller_update(self.controller_3,self.controller_3_result)
-        self.controller_update(self.controller_4,self.controller_4_result)
-        self.draw()
+        if self.live is not None:
+            self.live.set_input("offset",self.steady_state_error)
+        self.dirty[:] = True
+        self.refresh(self.controller_update())
 
     def steady_state_entry_update(self,event):
         try:
@@ -381,12 +582,11 @@ class Tab():
     def noise_sigma_scrollbar_update(self,value):
         self.noise_sigma_var.set(value)
         self.noise_sigma = float(value)
+        if self.live is not None:
+            self.live.set_input("setpoint_noise",self.noise_sigma)
         self.setpoint_noise_update()
-        self.controller_update(self.controller_1,self.controller_1_result)
-        self.controller_update(self.controller_2,self.controller_2_result)
-        self.controller_update(self.controller_3,self.controller_3_result)
-        self.controller_update(self.controller_4,self.controller_4_result)
-        self.draw()
+        self.dirty[:] = True
+        self.refresh(self.controller_update(),setpoint=True)
 
     def noise_sigma_entry_update(self,event):
         try:
@@ -396,500 +596,65 @@ class Tab():
         except ValueError:
             self.noise_sigma_var.set(self.noise_sigma)
 
-    def kp_1_scrollbar_update(self,value):
-        self.kps[0].set(value)
-        self.controller_1.kp = float(value)
-        self.controller_1.ki = self.ki_scrollbars[0].get()
-        self.controller_1.kd = self.kd_scrollbars[0].get()
-        self.controller_1.feed_forward = self.feed_forward_scrollbars[0].get()
-        self.controller_1.noise_sigma = self.noise_sigma_scrollbars[0].get()
-        self.controller_update(self.controller_1,self.controller_1_result)
-        self.draw()
-
-    def kp_1_entry_update(self,event):
-        try:
-            entry = float(self.kp_entries[0].get())
-            value = np.clip(entry,self.kp_low,self.kp_high)
-            self.kp_scrollbars[0].set(float(value))
-        except ValueError:
-            self.kps[0].set(self.controller_1.kp)
-
-    def kp_2_scrollbar_update(self,value):
-        self.kps[1].set(value)
-        self.controller_2.kp = float(value)
-        self.controller_2.ki = self.ki_scrollbars[1].get()
-        self.controller_2.kd = self.kd_scrollbars[1].get()
-        self.controller_2.feed_forward = self.feed_forward_scrollbars[1].get()
-        self.controller_2.noise_sigma = self.noise_sigma_scrollbars[1].get()
-        self.controller_update(self.controller_2,self.controller_2_result)
-        self.draw()
-
-    def kp_2_entry_update(self,event):
-        try:
-            entry = float(self.kp_entries[1].get())
-            value = np.clip(entry,self.kp_low,self.kp_high)
-            self.kp_scrollbars[1].set(float(value))
-        except ValueError:
-            self.kps[1].set(self.controller_2.kp)
-
-    def kp_3_scrollbar_update(self,value):
-        self.kps[2].set(value)
-        self.controller_3.kp = float(value)
-        self.controller_3.ki = self.ki_scrollbars[2].get()
-        self.controller_3.kd = self.kd_scrollbars[2].get()
-        self.controller_3.feed_forward = self.feed_forward_scrollbars[2].get()
-        self.controller_3.noise_sigma = self.noise_sigma_scrollbars[2].get()
-        self.controller_update(self.controller_3,self.controller_3_result)
-        self.draw()
-
-    def kp_3_entry_update(self,event):
-        try:
-            entry = float(self.kp_entries[2].get())
-            value = np.clip(entry,self.kp_low,self.kp_high)
-            self.kp_scrollbars[2].set(float(value))
-        except ValueError:
-            self.kps[2].set(self.controller_3.kp)
-
-    def kp_4_scrollbar_update(self,value):
-        self.kps[3].set(value)
-        self.controller_4.kp = float(value)
-        self.controller_4.ki = self.ki_scrollbars[3].get()
-        self.controller_4.kd = self.kd_scrollbars[3].get()
-        self.controller_4.feed_forward = self.feed_forward_scrollbars[3].get()
-        self.controller_4.noise_sigma = self.noise_sigma_scrollbars[3].get()
-        self.controller_update(self.controller_4,self.controller_4_result)
-        self.draw()
-
-    def kp_4_entry_update(self,event):
-        try:
-            entry = float(self.kp_entries[3].get())
-            value = np.clip(entry,self.kp_low,self.kp_high)
-            self.kp_scrollbars[3].set(float(value))
-        except ValueError:
-            self.kps[3].set(self.controller_4.kp)
-
-    def ki_1_scrollbar_update(self,value):
-        self.kis[0].set(value)
-        self.controller_1.kp = self.kp_scrollbars[0].get()
-        self.controller_1.ki = float(value)
-        self.controller_1.kd = self.kd_scrollbars[0].get()
-        self.controller_1.feed_forward = self.feed_forward_scrollbars[0].get()
-        self.controller_1.noise_sigma = self.noise_sigma_scrollbars[0].get()
-        self.controller_update(self.controller_1,self.controller_1_result)
-        self.draw()
-
-    def ki_1_entry_update(self,event):
-        try:
-            entry = float(self.ki_entries[0].get())
-            value = np.clip(entry,self.ki_low,self.ki_high)
-            self.ki_scrollbars[0].set(float(value))
-        except ValueError:
-            self.kis[0].set(self.controller_1.ki)
-
-    def ki_2_scrollbar_update(self,value):
-        self.kis[1].set(value)
-        self.controller_2.kp = self.kp_scrollbars[1].get()
-        self.controller_2.ki = float(value)
-        self.controller_2.kd = self.kd_scrollbars[1].get()
-        self.controller_2.feed_forward = self.feed_forward_scrollbars[1].get()
-        self.controller_2.noise_sigma = self.noise_sigma_scrollbars[1].get()
-        self.controller_update(self.controller_2,self.controller_2_result)
-        self.draw()
-
-    def ki_2_entry_update(self,event):
-        try:
-            entry = float(self.ki_entries[1].get())
-            value = np.clip(entry,self.ki_low,self.ki_high)
-            self.ki_scrollbars[1].set(float(value))
-        except ValueError:
-            self.kis[1].set(self.controller_2.ki)
-
-    def ki_3_scrollbar_update(self,value):
-        self.kis[2].set(value)
-        self.controller_3.kp = self.kp_scrollbars[2].get()
-        self.controller_3.ki = float(value)
-        self.controller_3.kd = self.kd_scrollbars[2].get()
-        self.controller_3.feed_forward = self.feed_forward_scrollbars[2].get()
-        self.controller_3.noise_sigma = self.noise_sigma_scrollbars[2].get()
-        self.controller_update(self.controller_3,self.controller_3_result)
-        self.draw()
-
-    def ki_3_entry_update(self,event):
-        try:
-            entry = float(self.ki_entries[2].get())
-            value = np.clip(entry,self.ki_low,self.ki_high)
-            self.ki_scrollbars[2].set(float(value))
-        except ValueError:
-            self.kis[2].set(self.controller_3.ki)
-
-    def ki_4_scrollbar_update(self,value):
-        self.kis[3].set(value)
-        self.controller_4.kp = self.kp_scrollbars[3].get()
-        self.controller_4.ki = float(value)
-        self.controller_4.kd = self.kd_scrollbars[3].get()
-        self.controller_4.feed_forward = self.feed_forward_scrollbars[3].get()
-        self.controller_4.noise_sigma = self.noise_sigma_scrollbars[3].get()
-        self.controller_update(self.controller_4,self.controller_4_result)
-        self.draw()
-
-    def ki_4_entry_update(self,event):
-        try:
-            entry = float(self.ki_entries[3].get())
-            value = np.clip(entry,self.ki_low,self.ki_high)
-            self.ki_scrollbars[3].set(float(value))
-        except ValueError:
-            self.kis[3].set(self.controller_4.ki)
-
-    def kd_1_scrollbar_update(self,value):
-        self.kds[0].set(value)
-        self.controller_1.kp = self.kp_scrollbars[0].get()
-        self.controller_1.ki = self.ki_scrollbars[0].get()
-        self.controller_1.kd = float(value)
-        self.controller_1.feed_forward = self.feed_forward_scrollbars[0].get()
-        self.controller_1.noise_sigma = self.noise_sigma_scrollbars[0].get()
-        self.controller_update(self.controller_1,self.controller_1_result)
-        self.draw()
-
-    def kd_1_entry_update(self,event):
-        try:
-            entry = float(self.kd_entries[0].get())
-            value = np.clip(entry,self.kd_low,self.kd_high)
-            self.kd_scrollbars[0].set(float(value))
-        except ValueError:
-            self.kds[0].set(self.controller_1.kd)
-
-    def kd_2_scrollbar_update(self,value):
-        self.kds[1].set(value)
-        self.controller_2.kp = self.kp_scrollbars[1].get()
-        self.controller_2.ki = self.ki_scrollbars[1].get()
-        self.controller_2.kd = float(value)
-        self.controller_2.feed_forward = self.feed_forward_scrollbars[1].get()
-        self.controller_2.noise_sigma = self.noise_sigma_scrollbars[1].get()
-        self.controller_update(self.controller_2,self.controller_2_result)
-        self.draw()
+    def gain_scrollbar_update(self,name,index,value):
+        self.gain_vars[name][index].set(value)
+        getattr(self.controllers,name)[index] = float(value)
+        if self.live is not None:
+            self.live.set_gain(name,index,float(value))
+        self.dirty[index] = True
+        self.refresh(self.controller_update())
 
-    def kd_2_entry_update(self,event):
+    def gain_entry_update(self,name,index,event):
+        low, high = self.gain_range(name)
         try:
-            entry = float(self.kd_entries[1].get())
-            value = np.clip(entry,self.kd_low,self.kd_high)
-            self.kd_scrollbars[1].set(float(value))
+            entry = float(self.gain_entries[name][index].get())
+            value = np.clip(entry,low,high)
+            self.scrollbars[name][index].set(float(value))
         except ValueError:
-            self.kds[1].set(self.controller_2.kd)
-
-    def kd_3_scrollbar_update(self,value):
-        self.kds[2].set(value)
-        self.controller_3.kp = self.kp_scrollbars[2].get()
-        self.controller_3.ki = self.ki_scrollbars[2].get()
-        self.controller_3.kd = float(value)
-        self.controller_3.feed_forward = self.feed_forward_scrollbars[2].get()
-        self.controller_3.noise_sigma = self.noise_sigma_scrollbars[2].get()
-        self.controller_update(self.controller_3,self.controller_3_result)
-        self.draw()
-
-    def kd_3_entry_update(self,event):
-        try:
-            entry = float(self.kd_entries[2].get())
-            value = np.clip(entry,self.kd_low,self.kd_high)
-            self.kd_scrollbars[2].set(float(value))
-        except ValueError:
-            self.kds[2].set(self.controller_3.kd)
-
-    def kd_4_scrollbar_update(self,value):
-        self.kds[3].set(value)
-        self.controller_4.kp = self.kp_scrollbars[3].get()
-        self.controller_4.ki = self.ki_scrollbars[3].get()
-        self.controller_4.kd = float(value)
-        self.controller_4.feed_forward = self.feed_forward_scrollbars[3].get()
-        self.controller_4.noise_sigma = self.noise_sigma_scrollbars[3].get()
-        self.controller_update(self.controller_4,self.controller_4_result)
-        self.draw()
-
-    def kd_4_entry_update(self,event):
-        try:
-            entry = float(self.kd_entries[3].get())
-            value = np.clip(entry,self.kd_low,self.kd_high)
-            self.kd_scrollbars[3].set(float(value))
-        except ValueError:
-            self.kds[3].set(self.controller_4.kd)
-
-    def kd_1_type_update(self):
-        self.controller_1.kd_error = self.kd_1_type.get()
-        self.controller_update(self.controller_1,self.controller_1_result)
-        self.draw()
-
-    def kd_2_type_update(self):
-        self.controller_2.kd_error = self.kd_2_type.get()
-        self.controller_update(self.controller_2,self.controller_2_result)
-        self.draw()
-
-    def kd_3_type_update(self):
-        self.controller_3.kd_error = self.kd_3_type.get()
-        self.controller_update(self.controller_3,self.controller_3_result)
-        self.draw()
-
-    def kd_4_type_update(self):
-        self.controller_4.kd_error = self.kd_4_type.get()
-        self.controller_update(self.controller_4,self.controller_4_result)
-        self.draw()
-
-    def feed_forward_1_scrollbar_update(self,value):
-        self.feed_forwards[0].set(value)
-        self.controller_1.kp = self.kp_scrollbars[0].get()
-        self.controller_1.ki = self.ki_scrollbars[0].get()
-        self.controller_1.kd = self.kd_scrollbars[0].get()
-        self.controller_1.feed_forward = float(value)
-        self.controller_1.noise_sigma = self.noise_sigma_scrollbars[0].get()
-        self.controller_update(self.controller_1,self.controller_1_result)
-        self.draw()
-
-    def feed_forward_1_entry_update(self,event):
-        try:
-            entry = float(self.feed_forward_entries[0].get())
-            value = np.clip(entry,self.feed_forward_low,self.feed_forward_high)
-            self.feed_forward_scrollbars[0].set(float(value))
-        except ValueError:
-            self.feed_forwards[0].set(self.controller_1.feed_forward)
-
-    def feed_forward_2_scrollbar_update(self,value):
-        self.feed_forwards[1].set(value)
-        self.controller_2.kp = self.kp_scrollbars[1].get()
-        self.controller_2.ki = self.ki_scrollbars[1].get()
-        self.controller_2.kd = self.kd_scrollbars[1].get()
-        self.controller_2.feed_forward = float(value)
-        self.controller_2.noise_sigma = self.noise_sigma_scrollbars[1].get()
-        self.controller_update(self.controller_2,self.controller_2_result)
-        self.draw()
-
-    def feed_forward_2_entry_update(self,event):
-        try:
-            entry = float(self.feed_forward_entries[1].get())
-            value = np.clip(entry,self.feed_forward_low,self.feed_forward_high)
-            self.feed_forward_scrollbars[1].set(float(value))
-        except ValueError:
-            self.feed_forwards[1].set(self.controller_2.feed_forward)
-
-    def feed_forward_3_scrollbar_update(self,value):
-        self.feed_forwards[2].set(value)
-        self.controller_3.kp = self.kp_scrollbars[2].get()
-        self.controller_3.ki = self.ki_scrollbars[2].get()
-        self.controller_3.kd = self.kd_scrollbars[2].get()
-        self.controller_3.feed_forward = float(value)
-        self.controller_3.noise_sigma = self.noise_sigma_scrollbars[2].get()
-        self.controller_update(self.controller_3,self.controller_3_result)
-        self.draw()
-
-    def feed_forward_3_entry_update(self,event):
-        try:
-            entry = float(self.feed_forward_entries[2].get())
-            value = np.clip(entry,self.feed_forward_low,self.feed_forward_high)
-            self.feed_forward_scrollbars[2].set(float(value))
-        except ValueError:
-            self.feed_forwards[2].set(self.controller_3.feed_forward)
-
-    def feed_forward_4_scrollbar_update(self,value):
-        self.feed_forwards[3].set(value)
-        self.controller_4.kp = self.kp_scrollbars[3].get()
-        self.controller_4.ki = self.ki_scrollbars[3].get()
-        self.controller_4.kd = self.kd_scrollbars[3].get()
-        self.controller_4.feed_forward = float(value)
-        self.controller_4.noise_sigma = self.noise_sigma_scrollbars[3].get()
-        self.controller_update(self.controller_4,self.controller_4_result)
-        self.draw()
-
-    def feed_forward_4_entry_update(self,event):
-        try:
-            entry = float(self.feed_forward_entries[3].get())
-            value = np.clip(entry,self.feed_forward_low,self.feed_forward_high)
-            self.feed_forward_scrollbars[3].set(float(value))
-        except ValueError:
-            self.feed_forwards[3].set(self.controller_4.feed_forward)
-
-    def noise_sigma_1_scrollbar_update(self,value):
-        self.noise_sigmas[0].set(value)
-        self.controller_1.kp = self.kp_scrollbars[0].get()
-        self.controller_1.ki = self.ki_scrollbars[0].get()
-        self.controller_1.kd = self.kd_scrollbars[0].get()
-        self.controller_1.feed_forward = self.feed_forward_scrollbars[0].get()
-        self.controller_1.noise_sigma = float(value)
-        self.controller_update(self.controller_1,self.controller_1_result)
-        self.draw()
-
-    def noise_sigma_1_entry_update(self,event):
-        try:
-            entry = float(self.noise_sigma_entries[0].get())
-            value = np.clip(entry,self.noise_sigma_low,self.noise_sigma_high)
-            self.noise_sigma_scrollbars[0].set(float(value))
-        except ValueError:
-            self.noise_sigmas[0].set(self.controller_1.noise_sigma)
-
-    def noise_sigma_2_scrollbar_update(self,value):
-        self.noise_sigmas[1].set(value)
-        self.controller_2.kp = self.kp_scrollbars[1].get()
-        self.controller_2.ki = self.ki_scrollbars[1].get()
-        self.controller_2.kd = self.kd_scrollbars[1].get()
-        self.controller_2.feed_forward = self.feed_forward_scrollbars[1].get()
-        self.controller_2.noise_sigma = float(value)
-        self.controller_update(self.controller_2,self.controller_2_result)
-        self.draw()
-
-    def noise_sigma_2_entry_update(self,event):
-        try:
-            entry = float(self.noise_sigma_entries[1].get())
-            value = np.clip(entry,self.noise_sigma_low,self.noise_sigma_high)
-            self.noise_sigma_scrollbars[1].set(float(value))
-        except ValueError:
-            self.noise_sigmas[1].set(self.controller_2.noise_sigma)
-
-    def noise_sigma_3_scrollbar_update(self,value):
-        self.noise_sigmas[2].set(value)
-        self.controller_3.kp = self.kp_scrollbars[2].get()
-        self.controller_3.ki = self.ki_scrollbars[2].get()
-        self.controller_3.kd = self.kd_scrollbars[2].get()
-        self.controller_3.feed_forward = self.feed_forward_scrollbars[2].get()
-        self.controller_3.noise_sigma = float(value)
-        self.controller_update(self.controller_3,self.controller_3_result)
-        self.draw()
-
-    def noise_sigma_3_entry_update(self,event):
-        try:
-            entry = float(self.noise_sigma_entries[2].get())
-            value = np.clip(entry,self.noise_sigma_low,self.noise_sigma_high)
-            self.noise_sigma_scrollbars[2].set(float(value))
-        except ValueError:
-            self.noise_sigmas[2].set(self.controller_3.noise_sigma)
-
-    def noise_sigma_4_scrollbar_update(self,value):
-        self.noise_sigmas[3].set(value)
-        self.controller_4.kp = self.kp_scrollbars[3].get()
-        self.controller_4.ki = self.ki_scrollbars[3].get()
-        self.controller_4.kd = self.kd_scrollbars[3].get()
-        self.controller_4.feed_forward = self.feed_forward_scrollbars[3].get()
-        self.controller_4.noise_sigma = float(value)
-        self.controller_update(self.controller_4,self.controller_4_result)
-        self.draw()
-
-    def noise_sigma_4_entry_update(self,event):
-        try:
-            entry = float(self.noise_sigma_entries[3].get())
-            value = np.clip(entry,self.noise_sigma_low,self.noise_sigma_high)
-            self.noise_sigma_scrollbars[3].set(float(value))
-        except ValueError:
-            self.noise_sigmas[3].set(self.controller_4.noise_sigma)
-
-    def enable_controller_1(self):
-        if self.controller_1_enabled.get():
-            self.kp_scrollbars[0].state(["!disabled"])
-            self.kp_entries[0].configure(state=tk.NORMAL)
-            self.ki_scrollbars[0].state(["!disabled"])
-            self.ki_entries[0].configure(state=tk.NORMAL)
-            self.kd_scrollbars[0].state(["!disabled"])
-            self.kd_entries[0].configure(state=tk.NORMAL)
-            self.kd_1_type_state.configure(state=tk.NORMAL)
-            self.kd_1_type_error.configure(state=tk.NORMAL)
-            self.feed_forward_scrollbars[0].state(["!disabled"])
-            self.feed_forward_entries[0].configure(state=tk.NORMAL)
-            self.noise_sigma_scrollbars[0].state(["!disabled"])
-            self.noise_sigma_entries[0].configure(state=tk.NORMAL)
+            self.gain_vars[name][index].set(getattr(self.controllers,name)[index])
+
+    def kd_type_update(self,index):
+        self.controllers.kd_error[index] = self.kd_types[index].get()
+        if self.live is not None:
+            self.live.set_gain("kd_error",index,self.kd_types[index].get())
+        self.dirty[index] = True
+        self.refresh(self.controller_update())
+
+    def enable_controller(self,index):
+        self.enabled[index] = self.enabled_vars[index].get()
+        if self.enabled[index]:
+            for widget in self.controller_widgets[index]:
+                widget.state(["!disabled"])
         else:
-            self.kp_scrollbars[0].state(["disabled"])
-            self.kp_entries[0].configure(state=tk.DISABLED)
-            self.ki_scrollbars[0].state(["disabled"])
-            self.ki_entries[0].configure(state=tk.DISABLED)
-            self.kd_scrollbars[0].state(["disabled"])
-            self.kd_entries[0].configure(state=tk.DISABLED)
-            self.kd_1_type_state.configure(state=tk.DISABLED)
-            self.kd_1_type_error.configure(state=tk.DISABLED)
-            self.feed_forward_scrollbars[0].state(["disabled"])
-            self.feed_forward_entries[0].configure(state=tk.DISABLED)
-            self.noise_sigma_scrollbars[0].state(["disabled"])
-            self.noise_sigma_entries[0].configure(state=tk.DISABLED)
-        self.draw()
+            for widget in self.controller_widgets[index]:
+                widget.state(["disabled"])
+        # catches up on the changes made while it was disabled
+        self.refresh(np.append(self.controller_update(),index))
 
-    def enable_controller_2(self):
-        if self.controller_2_enabled.get():
-            self.kp_scrollbars[1].state(["!disabled"])
-            self.kp_entries[1].configure(state=tk.NORMAL)
-            self.ki_scrollbars[1].state(["!disabled"])
-            self.ki_entries[1].configure(state=tk.NORMAL)
-            self.kd_scrollbars[1].state(["!disabled"])
-            self.kd_entries[1].configure(state=tk.NORMAL)
-            self.kd_2_type_state.configure(state=tk.NORMAL)
-            self.kd_2_type_error.configure(state=tk.NORMAL)
-            self.feed_forward_scrollbars[1].state(["!disabled"])
-            self.feed_forward_entries[1].configure(state=tk.NORMAL)
-            self.noise_sigma_scrollbars[1].state(["!disabled"])
-            self.noise_sigma_entries[1].configure(state=tk.NORMAL)
-        else:
-            self.kp_scrollbars[1].state(["disabled"])
-            self.kp_entries[1].configure(state=tk.DISABLED)
-            self.ki_scrollbars[1].state(["disabled"])
-            self.ki_entries[1].configure(state=tk.DISABLED)
-            self.kd_scrollbars[1].state(["disabled"])
-            self.kd_entries[1].configure(state=tk.DISABLED)
-            self.kd_2_type_state.configure(state=tk.DISABLED)
-            self.kd_2_type_error.configure(state=tk.DISABLED)
-            self.feed_forward_scrollbars[1].state(["disabled"])
-            self.feed_forward_entries[1].configure(state=tk.DISABLED)
-            self.noise_sigma_scrollbars[1].state(["disabled"])
-            self.noise_sigma_entries[1].configure(state=tk.DISABLED)
-        self.draw()
-
-    def enable_controller_3(self):
-        if self.controller_3_enabled.get():
-            self.kp_scrollbars[2].state(["!disabled"])
-            self.kp_entries[2].configure(state=tk.NORMAL)
-            self.ki_scrollbars[2].state(["!disabled"])
-            self.ki_entries[2].configure(state=tk.NORMAL)
-            self.kd_scrollbars[2].state(["!disabled"])
-            self.kd_entries[2].configure(state=tk.NORMAL)
-            self.kd_3_type_state.configure(state=tk.NORMAL)
-            self.kd_3_type_error.configure(state=tk.NORMAL)
-            self.feed_forward_scrollbars[2].state(["!disabled"])
-            self.feed_forward_entries[2].configure(state=tk.NORMAL)
-            self.noise_sigma_scrollbars[2].state(["!disabled"])
-            self.noise_sigma_entries[2].configure(state=tk.NORMAL)
-        else:
-            self.kp_scrollbars[2].state(["disabled"])
-            self.kp_entries[2].configure(state=tk.DISABLED)
-            self.ki_scrollbars[2].state(["disabled"])
-            self.ki_entries[2].configure(state=tk.DISABLED)
-            self.kd_scrollbars[2].state(["disabled"])
-            self.kd_entries[2].configure(state=tk.DISABLED)
-            self.kd_3_type_state.configure(state=tk.DISABLED)
-            self.kd_3_type_error.configure(state=tk.DISABLED)
-            self.feed_forward_scrollbars[2].state(["disabled"])
-            self.feed_forward_entries[2].configure(state=tk.DISABLED)
-            self.noise_sigma_scrollbars[2].state(["disabled"])
-            self.noise_sigma_entries[2].configure(state=tk.DISABLED)
-        self.draw()
-
-    def enable_controller_4(self):
-        if self.controller_4_enabled.get():
-            self.kp_scrollbars[3].state(["!disabled"])
-            self.kp_entries[3].configure(state=tk.NORMAL)
-            self.ki_scrollbars[3].state(["!disabled"])
-            self.ki_entries[3].configure(state=tk.NORMAL)
-            self.kd_scrollbars[3].state(["!disabled"])
-            self.kd_entries[3].configure(state=tk.NORMAL)
-            self.kd_4_type_state.configure(state=tk.NORMAL)
-            self.kd_4_type_error.configure(state=tk.NORMAL)
-            self.feed_forward_scrollbars[3].state(["!disabled"])
-            self.feed_forward_entries[3].configure(state=tk.NORMAL)
-            self.noise_sigma_scrollbars[3].state(["!disabled"])
-            self.noise_sigma_entries[3].configure(state=tk.NORMAL)
-        else:
-            self.kp_scrollbars[3].state(["disabled"])
-            self.kp_entries[3].configure(state=tk.DISABLED)
-            self.ki_scrollbars[3].state(["disabled"])
-            self.ki_entries[3].configure(state=tk.DISABLED)
-            self.kd_scrollbars[3].state(["disabled"])
-            self.kd_entries[3].configure(state=tk.DISABLED)
-            self.kd_4_type_state.configure(state=tk.DISABLED)
-            self.kd_4_type_error.configure(state=tk.DISABLED)
-            self.feed_forward_scrollbars[3].state(["disabled"])
-            self.feed_forward_entries[3].configure(state=tk.DISABLED)
-            self.noise_sigma_scrollbars[3].state(["disabled"])
-            self.noise_sigma_entries[3].configure(state=tk.DISABLED)
+    def controller_count_update(self,event):
+        try:
+            count = max(1,int(self.controller_count_var.get()))
+        except (ValueError, tk.TclError):
+            count = self.controller_count
+        self.controller_count_var.set(count)
+        if count == self.controller_count:
+            return
+        self.live_enabled.set(False)
+        self.live_stop()
+        previous = self.controllers
+        kept = min(count,previous.count)
+
+        self.ready = False
+        self.controller_frame.destroy()
+        self.controller_setup(count)
+        for name in ("kp","ki","kd","kd_error","feed_forward","noise_sigma"):
+            getattr(self.controllers,name)[:kept] = getattr(previous,name)[:kept]
+        self.controller_panel_setup()
+        for ii in range(kept,count):
+            self.scrollbars["kp"][ii].set(self.random_number(0.4,1.6))
+        self.ready = True
+
+        self.controller_update()
         self.draw()
 
     def scrollbar_setup(self):
@@ -926,371 +691,199 @@ class Tab():
         self.noise_sigma_entry.bind("<Return>",self.noise_sigma_entry_update)
         self.noise_sigma_entry.grid(row=17,column=1,columnspan=1,
             sticky=tk.E+tk.W,padx=5,pady=5)
-
-        # PID # 1
-        pid_1_label = ttk.Label(self.tab, anchor=tk.W,
-            text='PID Controller #1',foreground='orange red')
-        pid_1_label.grid(row=12,rowspan=2,column=3,columnspan=1,
-            sticky=tk.N+tk.S+tk.E+tk.W,padx=5,pady=5,ipadx=5,ipady=5)
-        self.controller_1_enabled = tk.BooleanVar()
-        self.controller_1_enabled.set(True)
-        controller_1_checkbox = ttk.Checkbutton(self.tab,
-            var=self.controller_1_enabled, command=self.enable_controller_1)
-        controller_1_checkbox.grid(row=12,rowspan=2,column=2,columnspan=1,
-            stick=tk.E, padx=5,pady=5,ipadx=5,ipady=5)
-        kp_1_label = ttk.Label(self.tab, anchor=tk.CENTER,
-            text='Proportional Gain',foreground='orange red')
-        kp_1_label.grid(row=14,rowspan=1,column=2,columnspan=2,
-            sticky=tk.N+tk.S+tk.E+tk.W,padx=5,pady=5,ipadx=5,ipady=5)
-        kp_1_scrollbar = ttk.Scale(self.tab,from_=self.kp_low, to=self.kp_high,
-            command=self.kp_1_scrollbar_update)
-        kp_1_scrollbar.grid(row=15,column=2,columnspan=1,
-            sticky=tk.E+tk.W,padx=5,pady=5)
-        kp_1_entry = ttk.Entry(self.tab,textvariable=self.kps[0])
-        kp_1_entry.bind("<Return>",self.kp_1_entry_update)
-        kp_1_entry.grid(row=15,column=3,columnspan=1,
-            sticky=tk.E+tk.W,padx=5,pady=5)
-        ki_1_label = ttk.Label(self.tab, anchor=tk.CENTER,
-            text='Integral Gain',foreground='orange red')
-        ki_1_label.grid(row=16,rowspan=1,column=2,columnspan=2,
-            sticky=tk.N+tk.S+tk.E+tk.W,padx=5,pady=5,ipadx=5,ipady=5)
-        ki_1_scrollbar = ttk.Scale(self.tab,from_=self.ki_low, to=self.ki_high,
-            command=self.ki_1_scrollbar_update)
-        ki_1_scrollbar.grid(row=17,column=2,columnspan=1,
-            sticky=tk.E+tk.W,padx=5,pady=5)
-        ki_1_entry = ttk.Entry(self.tab,textvariable=self.kis[0])
-        ki_1_entry.bind("<Return>",self.ki_1_entry_update)
-        ki_1_entry.grid(row=17,column=3,
-            sticky=tk.E+tk.W,padx=5,pady=5)
-        kd_1_label = ttk.Label(self.tab, anchor=tk.CENTER,
-            text='Derivative Gain',foreground='orange red')
-        kd_1_label.grid(row=18,rowspan=1,column=2,columnspan=2,
-            sticky=tk.N+tk.S+tk.E+tk.W,padx=5,pady=5,ipadx=5,ipady=5)
-        self.kd_1_type = tk.BooleanVar()
-        self.kd_1_type.set(True)
-        self.kd_1_type_error = ttk.Radiobutton(self.tab, text="error derivative",
-            value=True, variable=self.kd_1_type,
-            command=self.kd_1_type_update)
-        self.kd_1_type_error.grid(row=19,rowspan=1,column=2,columnspan=1,
-            sticky=tk.N+tk.S+tk.E+tk.W,padx=5,pady=5,ipadx=5,ipady=5)
-        self.kd_1_type_state = ttk.Radiobutton(self.tab, text="state derivative",
-            value = False, variable=self.kd_1_type,
-            command=self.kd_1_type_update)
-        self.kd_1_type_state.grid(row=19,rowspan=1,column=3,columnspan=1,
-            sticky=tk.N+tk.S+tk.E+tk.W,padx=5,pady=5,ipadx=5,ipady=5)
-        kd_1_scrollbar = ttk.Scale(self.tab,from_=self.kd_low, to=self.kd_high,
-            command=self.kd_1_scrollbar_update)
-        kd_1_scrollbar.grid(row=20,column=2,columnspan=1,
-            sticky=tk.E+tk.W,padx=5,pady=5)
-        kd_1_entry = ttk.Entry(self.tab,textvariable=self.kds[0])
-        kd_1_entry.bind("<Return>",self.kd_1_entry_update)
-        kd_1_entry.grid(row=20,column=3,
-            sticky=tk.E+tk.W,padx=5,pady=5)
-        feed_forward_1_label = ttk.Label(self.tab, anchor=tk.CENTER,
-            text='Feed Forward',foreground='orange red')
-        feed_forward_1_label.grid(row=21,rowspan=1,column=2,columnspan=2,
-            sticky=tk.N+tk.S+tk.E+tk.W,padx=5,pady=5,ipadx=5,ipady=5)
-        feed_forward_1_scrollbar = ttk.Scale(self.tab,
-            from_=self.feed_forward_low, to=self.feed_forward_high,
-            command=self.feed_forward_1_scrollbar_update)
-        feed_forward_1_scrollbar.grid(row=23,column=2,columnspan=1,
-            sticky=tk.E+tk.W,padx=5,pady=5)
-        feed_forward_1_entry = ttk.Entry(self.tab,
-            textvariable=self.feed_forwards[0])
-        feed_forward_1_entry.bind("<Return>",self.feed_forward_1_entry_update)
-        feed_forward_1_entry.grid(row=23,column=3,
-            sticky=tk.E+tk.W,padx=5,pady=5)
-        noise_sigma_1_label = ttk.Label(self.tab, anchor=tk.CENTER,
-            text='Noise Sigma',foreground='orange red')
-        noise_sigma_1_label.grid(row=24,rowspan=1,column=2,columnspan=2,
-            sticky=tk.N+tk.S+tk.E+tk.W,padx=5,pady=5,ipadx=5,ipady=5)
-        noise_sigma_1_scrollbar = ttk.Scale(self.tab,
-            from_=self.noise_sigma_low, to=self.noise_sigma_high,
-            command=self.noise_sigma_1_scrollbar_update)
-        noise_sigma_1_scrollbar.grid(row=25,column=2,columnspan=1,
-            sticky=tk.E+tk.W,padx=5,pady=5)
-        noise_sigma_1_entry = ttk.Entry(self.tab,
-            textvariable=self.noise_sigmas[0])
-        noise_sigma_1_entry.bind("<Return>",self.noise_sigma_1_entry_update)
-        noise_sigma_1_entry.grid(row=25,column=3,
-            sticky=tk.E+tk.W,padx=5,pady=5)
-
-        # PID #2
-        pid_2_label = ttk.Label(self.tab, anchor=tk.W,
-            text='PID Controller #2',foreground='goldenrod')
-        pid_2_label.grid(row=12,rowspan=2,column=5,columnspan=1,
-            sticky=tk.N+tk.S+tk.E+tk.W,padx=5,pady=5,ipadx=5,ipady=5)
-        self.controller_2_enabled = tk.BooleanVar()
-        self.controller_2_enabled.set(True)
-        controller_2_checkbox = ttk.Checkbutton(self.tab,
-            var=self.controller_2_enabled, command=self.enable_controller_2)
-        controller_2_checkbox.grid(row=12,rowspan=2,column=4,columnspan=1,
+        horizon_label = ttk.Label(self.tab, anchor=tk.CENTER,
+            text='Horizon [s] / Rate [Hz]',foreground='midnight blue')
+        horizon_label.grid(row=18,rowspan=1,column=0,columnspan=2,
+            sticky=tk.N+tk.S+tk.E+tk.W,padx=5,pady=5,ipadx=5,ipady=5)
+        self.time_end_var = tk.DoubleVar(self.tab)
+        self.time_end_var.set(self.simulation.time_end)
+        self.time_end_entry = ttk.Entry(self.tab,textvariable=self.time_end_var)
+        self.time_end_entry.bind("<Return>",self.horizon_update)
+        self.time_end_entry.grid(row=19,column=0,columnspan=1,
+            sticky=tk.E+tk.W,padx=5,pady=5)
+        self.hz_var = tk.DoubleVar(self.tab)
+        self.hz_var.set(self.simulation.hz)
+        self.hz_entry = ttk.Entry(self.tab,textvariable=self.hz_var)
+        self.hz_entry.bind("<Return>",self.horizon_update)
+        self.hz_entry.grid(row=19,column=1,columnspan=1,
+            sticky=tk.E+tk.W,padx=5,pady=5)
+        self.float32_enabled = tk.BooleanVar()
+        self.float32_enabled.set(False)
+        float32_checkbox = ttk.Checkbutton(self.tab, text='float32 buffers',
+            var=self.float32_enabled, command=lambda: self.horizon_update(None))
+        float32_checkbox.grid(row=20,column=0,columnspan=2,
+            sticky=tk.W,padx=5,pady=5)
+        plant_label = ttk.Label(self.tab, anchor=tk.CENTER,
+            text='Plant',foreground='midnight blue')
+        plant_label.grid(row=21,rowspan=1,column=0,columnspan=2,
+            sticky=tk.N+tk.S+tk.E+tk.W,padx=5,pady=5,ipadx=5,ipady=5)
+        self.plant_var = tk.StringVar(self.tab)
+        self.plant_var.set(list(PLANTS)[0])
+        plant_combobox = ttk.Combobox(self.tab,textvariable=self.plant_var,
+            values=list(PLANTS),state='readonly')
+        plant_combobox.bind("<<ComboboxSelected>>",self.plant_update)
+        plant_combobox.grid(row=23,column=0,columnspan=2,
+            sticky=tk.E+tk.W,padx=5,pady=5)
+        self.bode_enabled = tk.BooleanVar()
+        self.bode_enabled.set(False)
+        bode_checkbox = ttk.Checkbutton(self.tab, text='Bode Plot',
+            var=self.bode_enabled, command=self.bode_update)
+        bode_checkbox.grid(row=24,column=0,columnspan=1,
+            sticky=tk.W,padx=5,pady=5)
+        self.monte_carlo_enabled = tk.BooleanVar()
+        self.monte_carlo_enabled.set(False)
+        monte_carlo_checkbox = ttk.Checkbutton(self.tab,
+            text='Monte Carlo (5-95%)',var=self.monte_carlo_enabled,
+            command=self.draw)
+        monte_carlo_checkbox.grid(row=24,column=1,columnspan=1,
+            sticky=tk.W,padx=5,pady=5)
+        realizations_label = ttk.Label(self.tab, anchor=tk.CENTER,
+            text='Realizations',foreground='midnight blue')
+        realizations_label.grid(row=25,column=0,columnspan=1,
+            sticky=tk.N+tk.S+tk.E+tk.W,padx=5,pady=5)
+        self.realizations_var = tk.IntVar(self.tab)
+        self.realizations_var.set(100)
+        realizations_entry = ttk.Entry(self.tab,
+            textvariable=self.realizations_var)
+        realizations_entry.bind("<Return>",lambda event: self.draw())
+        realizations_entry.grid(row=25,column=1,columnspan=1,
+            sticky=tk.E+tk.W,padx=5,pady=5)
+        controller_count_label = ttk.Label(self.tab, anchor=tk.CENTER,
+            text='Controllers',foreground='midnight blue')
+        controller_count_label.grid(row=26,column=0,columnspan=1,
+            sticky=tk.N+tk.S+tk.E+tk.W,padx=5,pady=5)
+        self.controller_count_var = tk.IntVar(self.tab)
+        self.controller_count_var.set(self.controller_count)
+        controller_count_entry = ttk.Entry(self.tab,
+            textvariable=self.controller_count_var)
+        controller_count_entry.bind("<Return>",self.controller_count_update)
+        controller_count_entry.grid(row=26,column=1,columnspan=1,
+            sticky=tk.E+tk.W,padx=5,pady=5)
+
+        self.live_enabled = tk.BooleanVar()
+        self.live_enabled.set(False)
+        live_checkbox = ttk.Checkbutton(self.tab, text='Live (render Hz)',
+            var=self.live_enabled, command=self.live_update)
+        live_checkbox.grid(row=27,column=0,columnspan=1,
+            sticky=tk.W,padx=5,pady=5)
+        self.render_hz_var = tk.DoubleVar(self.tab)
+        self.render_hz_var.set(20.0)
+        render_hz_entry = ttk.Entry(self.tab,textvariable=self.render_hz_var)
+        render_hz_entry.grid(row=27,column=1,columnspan=1,
+            sticky=tk.E+tk.W,padx=5,pady=5)
+
+        self.terms_enabled = tk.BooleanVar()
+        self.terms_enabled.set(False)
+        terms_checkbox = ttk.Checkbutton(self.tab, text='PID terms of #',
+            var=self.terms_enabled, command=self.draw)
+        terms_checkbox.grid(row=28,column=0,columnspan=1,
+            sticky=tk.W,padx=5,pady=5)
+        self.terms_controller_var = tk.IntVar(self.tab)
+        self.terms_controller_var.set(1)
+        terms_controller_entry = ttk.Entry(self.tab,
+            textvariable=self.terms_controller_var)
+        terms_controller_entry.bind("<Return>",lambda event: self.draw())
+        terms_controller_entry.grid(row=28,column=1,columnspan=1,
+            sticky=tk.E+tk.W,padx=5,pady=5)
+
+        session_save_button = ttk.Button(self.tab,text='Save Session',
+            command=self.session_save)
+        session_save_button.grid(row=29,column=0,columnspan=1,
+            sticky=tk.E+tk.W,padx=5,pady=5)
+        session_load_button = ttk.Button(self.tab,text='Load Session',
+            command=self.session_load)
+        session_load_button.grid(row=29,column=1,columnspan=1,
+            sticky=tk.E+tk.W,padx=5,pady=5)
+
+        # controller panels scroll sideways once they outgrow the tab
+        self.controller_canvas = tk.Canvas(self.tab,highlightthickness=0)
+        self.controller_canvas.grid(row=12,rowspan=14,column=2,columnspan=8,
+            sticky=tk.N+tk.S+tk.E+tk.W)
+        controller_scrollbar = ttk.Scrollbar(self.tab,orient=tk.HORIZONTAL,
+            command=self.controller_canvas.xview)
+        controller_scrollbar.grid(row=26,column=2,columnspan=8,
+            sticky=tk.E+tk.W)
+        self.controller_canvas.configure(xscrollcommand=controller_scrollbar.set)
+
+        self.controller_panel_setup()
+
+    def controller_panel_setup(self):
+        self.controller_frame = ttk.Frame(self.controller_canvas)
+        self.controller_canvas.create_window((0,0),window=self.controller_frame,
+            anchor=tk.NW)
+        self.controller_frame.bind("<Configure>",lambda event:
+            self.controller_canvas.configure(
+            scrollregion=self.controller_canvas.bbox(tk.ALL)))
+
+        self.scrollbars = {name: [] for name, low, high, text in GAINS}
+        self.gain_entries = {name: [] for name, low, high, text in GAINS}
+        self.gain_vars = {name: [] for name, low, high, text in GAINS}
+        self.enabled_vars = []
+        self.kd_types = []
+        self.controller_widgets = []
+
+        for ii in range(self.controller_count):
+            self.controller_panel(ii)
+
+    def controller_panel(self,index):
+        # PID # index+1, two grid columns per controller
+        column = 2*index
+        color = self.label_colors[index]
+        widgets = []
+
+        pid_label = ttk.Label(self.controller_frame, anchor=tk.W,
+            text='PID Controller #%d' % (index + 1),foreground=color)
+        pid_label.grid(row=0,rowspan=2,column=column+1,columnspan=1,
+            sticky=tk.N+tk.S+tk.E+tk.W,padx=5,pady=5,ipadx=5,ipady=5)
+        enabled = tk.BooleanVar()
+        enabled.set(bool(self.enabled[index]))
+        controller_checkbox = ttk.Checkbutton(self.controller_frame,
+            var=enabled, command=partial(self.enable_controller,index))
+        controller_checkbox.grid(row=0,rowspan=2,column=column,columnspan=1,
             stick=tk.E, padx=5,pady=5,ipadx=5,ipady=5)
-        kp_2_label = ttk.Label(self.tab, anchor=tk.CENTER,
-            text='Proportional Gain',foreground='goldenrod')
-        kp_2_label.grid(row=14,rowspan=1,column=4,columnspan=2,
-            sticky=tk.N+tk.S+tk.E+tk.W,padx=5,pady=5,ipadx=5,ipady=5)
-        kp_2_scrollbar = ttk.Scale(self.tab,from_=self.kp_low, to=self.kp_high,
-            command=self.kp_2_scrollbar_update)
-        kp_2_scrollbar.grid(row=15,column=4,columnspan=1,
-            sticky=tk.E+tk.W,padx=5,pady=5)
-        kp_2_entry = ttk.Entry(self.tab,textvariable=self.kps[1])
-        kp_2_entry.bind("<Return>",self.kp_2_entry_update)
-        kp_2_entry.grid(row=15,column=5,
-            sticky=tk.E+tk.W,padx=5,pady=5)
-        ki_2_label = ttk.Label(self.tab, anchor=tk.CENTER,
-            text='Integral Gain',foreground='goldenrod')
-        ki_2_label.grid(row=16,rowspan=1,column=4,columnspan=2,
-            sticky=tk.N+tk.S+tk.E+tk.W,padx=5,pady=5,ipadx=5,ipady=5)
-        ki_2_scrollbar = ttk.Scale(self.tab,from_=self.ki_low, to=self.ki_high,
-            command=self.ki_2_scrollbar_update)
-        ki_2_scrollbar.grid(row=17,column=4,columnspan=1,
-            sticky=tk.E+tk.W,padx=5,pady=5)
-        ki_2_entry = ttk.Entry(self.tab,textvariable=self.kis[1])
-        ki_2_entry.bind("<Return>",self.ki_2_entry_update)
-        ki_2_entry.grid(row=17,column=5,
-            sticky=tk.E+tk.W,padx=5,pady=5)
-        kd_2_label = ttk.Label(self.tab, anchor=tk.CENTER,
-            text='Derivative Gain',foreground='goldenrod')
-        kd_2_label.grid(row=18,rowspan=1,column=4,columnspan=2,
-            sticky=tk.N+tk.S+tk.E+tk.W,padx=5,pady=5,ipadx=5,ipady=5)
-        self.kd_2_type = tk.BooleanVar()
-        self.kd_2_type.set(True)
-        self.kd_2_type_error = ttk.Radiobutton(self.tab, text="error derivative",
-            value=True, variable=self.kd_2_type,
-            command=self.kd_2_type_update)
-        self.kd_2_type_error.grid(row=19,rowspan=1,column=4,columnspan=1,
-            sticky=tk.N+tk.S+tk.E+tk.W,padx=5,pady=5,ipadx=5,ipady=5)
-        self.kd_2_type_state = ttk.Radiobutton(self.tab, text="state derivative",
-            value = False, variable=self.kd_2_type,
-            command=self.kd_2_type_update)
-        self.kd_2_type_state.grid(row=19,rowspan=1,column=5,columnspan=1,
-            sticky=tk.N+tk.S+tk.E+tk.W,padx=5,pady=5,ipadx=5,ipady=5)
-        kd_2_scrollbar = ttk.Scale(self.tab,from_=self.kd_low, to=self.kd_high,
-            command=self.kd_2_scrollbar_update)
-        kd_2_scrollbar.grid(row=20,column=4,columnspan=1,
-            sticky=tk.E+tk.W,padx=5,pady=5)
-        kd_2_entry = ttk.Entry(self.tab,textvariable=self.kds[1])
-        kd_2_entry.bind("<Return>",self.kd_2_entry_update)
-        kd_2_entry.grid(row=20,column=5,
-            sticky=tk.E+tk.W,padx=5,pady=5)
-        feed_forward_2_label = ttk.Label(self.tab, anchor=tk.CENTER,
-            text='Feed Forward',foreground='goldenrod')
-        feed_forward_2_label.grid(row=21,rowspan=1,column=4,columnspan=2,
-            sticky=tk.N+tk.S+tk.E+tk.W,padx=5,pady=5,ipadx=5,ipady=5)
-        feed_forward_2_scrollbar = ttk.Scale(self.tab,
-            from_=self.feed_forward_low, to=self.feed_forward_high,
-            command=self.feed_forward_2_scrollbar_update)
-        feed_forward_2_scrollbar.grid(row=23,column=4,columnspan=1,
-            sticky=tk.E+tk.W,padx=5,pady=5)
-        feed_forward_2_entry = ttk.Entry(self.tab,
-            textvariable=self.feed_forwards[1])
-        feed_forward_2_entry.bind("<Return>",self.feed_forward_2_entry_update)
-        feed_forward_2_entry.grid(row=23,column=5,
-            sticky=tk.E+tk.W,padx=5,pady=5)
-        noise_sigma_2_label = ttk.Label(self.tab, anchor=tk.CENTER,
-            text='Noise Sigma',foreground='goldenrod')
-        noise_sigma_2_label.grid(row=24,rowspan=1,column=4,columnspan=2,
-            sticky=tk.N+tk.S+tk.E+tk.W,padx=5,pady=5,ipadx=5,ipady=5)
-        noise_sigma_2_scrollbar = ttk.Scale(self.tab,
-            from_=self.noise_sigma_low, to=self.noise_sigma_high,
-            command=self.noise_sigma_2_scrollbar_update)
-        noise_sigma_2_scrollbar.grid(row=25,column=4,columnspan=1,
-            sticky=tk.E+tk.W,padx=5,pady=5)
-        noise_sigma_2_entry = ttk.Entry(self.tab,
-            textvariable=self.noise_sigmas[1])
-        noise_sigma_2_entry.bind("<Return>",self.noise_sigma_2_entry_update)
-        noise_sigma_2_entry.grid(row=25,column=5,
-            sticky=tk.E+tk.W,padx=5,pady=5)
-
-
-        # PID #3
-        pid_3_label = ttk.Label(self.tab, anchor=tk.W,
-            text='PID Controller #3',foreground='DodgerBlue2')
-        pid_3_label.grid(row=12,rowspan=2,column=7,columnspan=1,
-            sticky=tk.N+tk.S+tk.E+tk.W,padx=5,pady=5,ipadx=5,ipady=5)
-        self.controller_3_enabled = tk.BooleanVar()
-        self.controller_3_enabled.set(True)
-        controller_3_checkbox = ttk.Checkbutton(self.tab,
-            var=self.controller_3_enabled, command=self.enable_controller_3)
-        controller_3_checkbox.grid(row=12,rowspan=2,column=6,columnspan=1,
-            stick=tk.E, padx=5,pady=5,ipadx=5,ipady=5)
-        kp_3_label = ttk.Label(self.tab, anchor=tk.CENTER,
-            text='Proportional Gain',foreground='DodgerBlue2')
-        kp_3_label.grid(row=14,rowspan=1,column=6,columnspan=2,
-            sticky=tk.N+tk.S+tk.E+tk.W,padx=5,pady=5,ipadx=5,ipady=5)
-        kp_3_scrollbar = ttk.Scale(self.tab,from_=self.kp_low, to=self.kp_high,
-            command=self.kp_3_scrollbar_update)
-        kp_3_scrollbar.grid(row=15,column=6,columnspan=1,
-            sticky=tk.E+tk.W,padx=5,pady=5)
-        kp_3_entry = ttk.Entry(self.tab,textvariable=self.kps[2])
-        kp_3_entry.bind("<Return>",self.kp_3_entry_update)
-        kp_3_entry.grid(row=15,column=7,
-            sticky=tk.E+tk.W,padx=5,pady=5)
-        ki_3_label = ttk.Label(self.tab, anchor=tk.CENTER,
-            text='Integral Gain',foreground='DodgerBlue2')
-        ki_3_label.grid(row=16,rowspan=1,column=6,columnspan=2,
-            sticky=tk.N+tk.S+tk.E+tk.W,padx=5,pady=5,ipadx=5,ipady=5)
-        ki_3_scrollbar = ttk.Scale(self.tab,from_=self.ki_low, to=self.ki_high,
-            command=self.ki_3_scrollbar_update)
-        ki_3_scrollbar.grid(row=17,column=6,columnspan=1,
-            sticky=tk.E+tk.W,padx=5,pady=5)
-        ki_3_entry = ttk.Entry(self.tab,textvariable=self.kis[2])
-        ki_3_entry.bind("<Return>",self.ki_3_entry_update)
-        ki_3_entry.grid(row=17,column=7,
-            sticky=tk.E+tk.W,padx=5,pady=5)
-        kd_3_label = ttk.Label(self.tab, anchor=tk.CENTER,
-            text='Derivative Gain',foreground='DodgerBlue2')
-        kd_3_label.grid(row=18,rowspan=1,column=6,columnspan=2,
-            sticky=tk.N+tk.S+tk.E+tk.W,padx=5,pady=5,ipadx=5,ipady=5)
-        self.kd_3_type = tk.BooleanVar()
-        self.kd_3_type.set(True)
-        self.kd_3_type_error = ttk.Radiobutton(self.tab, text="error derivative",
-            value=True, variable=self.kd_3_type,
-            command=self.kd_3_type_update)
-        self.kd_3_type_error.grid(row=19,rowspan=1,column=6,columnspan=1,
-            sticky=tk.N+tk.S+tk.E+tk.W,padx=5,pady=5,ipadx=5,ipady=5)
-        self.kd_3_type_state = ttk.Radiobutton(self.tab, text="state derivative",
-            value = False, variable=self.kd_3_type,
-            command=self.kd_3_type_update)
-        self.kd_3_type_state.grid(row=19,rowspan=1,column=7,columnspan=1,
-            sticky=tk.N+tk.S+tk.E+tk.W,padx=5,pady=5,ipadx=5,ipady=5)
-        kd_3_scrollbar = ttk.Scale(self.tab,from_=self.kd_low, to=self.kd_high,
-            command=self.kd_3_scrollbar_update)
-        kd_3_scrollbar.grid(row=20,column=6,columnspan=1,
-            sticky=tk.E+tk.W,padx=5,pady=5)
-        kd_3_entry = ttk.Entry(self.tab,textvariable=self.kds[2])
-        kd_3_entry.bind("<Return>",self.kd_3_entry_update)
-        kd_3_entry.grid(row=20,column=7,
-            sticky=tk.E+tk.W,padx=5,pady=5)
-        feed_forward_3_label = ttk.Label(self.tab, anchor=tk.CENTER,
-            text='Feed Forward',foreground='DodgerBlue2')
-        feed_forward_3_label.grid(row=21,rowspan=1,column=6,columnspan=2,
-            sticky=tk.N+tk.S+tk.E+tk.W,padx=5,pady=5,ipadx=5,ipady=5)
-        feed_forward_3_scrollbar = ttk.Scale(self.tab,
-            from_=self.feed_forward_low, to=self.feed_forward_high,
-            command=self.feed_forward_3_scrollbar_update)
-        feed_forward_3_scrollbar.grid(row=23,column=6,columnspan=1,
-            sticky=tk.E+tk.W,padx=5,pady=5)
-        feed_forward_3_entry = ttk.Entry(self.tab,
-            textvariable=self.feed_forwards[2])
-        feed_forward_3_entry.bind("<Return>",self.feed_forward_3_entry_update)
-        feed_forward_3_entry.grid(row=23,column=7,
-            sticky=tk.E+tk.W,padx=5,pady=5)
-        noise_sigma_3_label = ttk.Label(self.tab, anchor=tk.CENTER,
-            text='Noise Sigma',foreground='DodgerBlue2')
-        noise_sigma_3_label.grid(row=24,rowspan=1,column=6,columnspan=2,
-            sticky=tk.N+tk.S+tk.E+tk.W,padx=5,pady=5,ipadx=5,ipady=5)
-        noise_sigma_3_scrollbar = ttk.Scale(self.tab,
-            from_=self.noise_sigma_low, to=self.noise_sigma_high,
-            command=self.noise_sigma_3_scrollbar_update)
-        noise_sigma_3_scrollbar.grid(row=25,column=6,columnspan=1,
-            sticky=tk.E+tk.W,padx=5,pady=5)
-        noise_sigma_3_entry = ttk.Entry(self.tab,
-            textvariable=self.noise_sigmas[2])
-        noise_sigma_3_entry.bind("<Return>",self.noise_sigma_3_entry_update)
-        noise_sigma_3_entry.grid(row=25,column=7,
-            sticky=tk.E+tk.W,padx=5,pady=5)
-
-        # PID #4
-        pid_4_label = ttk.Label(self.tab, anchor=tk.W,
-            text='PID Controller #4',foreground='cyan4')
-        pid_4_label.grid(row=12,rowspan=2,column=9,columnspan=1,
-            sticky=tk.N+tk.S+tk.E+tk.W,padx=5,pady=5,ipadx=5,ipady=5)
-        self.controller_4_enabled = tk.BooleanVar()
-        self.controller_4_enabled.set(True)
-        controller_4_checkbox = ttk.Checkbutton(self.tab,
-            var=self.controller_4_enabled, command=self.enable_controller_4)
-        controller_4_checkbox.grid(row=12,rowspan=2,column=8,columnspan=1,
-            stick=tk.E, padx=5,pady=5,ipadx=5,ipady=5)
-        kp_4_label = ttk.Label(self.tab, anchor=tk.CENTER,
-            text='Proportional Gain',foreground='cyan4')
-        kp_4_label.grid(row=14,rowspan=1,column=8,columnspan=2,
-            sticky=tk.N+tk.S+tk.E+tk.W,padx=5,pady=5,ipadx=5,ipady=5)
-        kp_4_scrollbar = ttk.Scale(self.tab,from_=self.kp_low, to=self.kp_high,
-            command=self.kp_4_scrollbar_update)
-        kp_4_scrollbar.grid(row=15,column=8,columnspan=1,
-            sticky=tk.E+tk.W,padx=5,pady=5)
-        kp_4_entry = ttk.Entry(self.tab,textvariable=self.kps[3])
-        kp_4_entry.bind("<Return>",self.kp_4_entry_update)
-        kp_4_entry.grid(row=15,column=9,
-            sticky=tk.E+tk.W,padx=5,pady=5)
-        ki_4_label = ttk.Label(self.tab, anchor=tk.CENTER,
-            text='Integral Gain',foreground='cyan4')
-        ki_4_label.grid(row=16,rowspan=1,column=8,columnspan=2,
-            sticky=tk.N+tk.S+tk.E+tk.W,padx=5,pady=5,ipadx=5,ipady=5)
-        ki_4_scrollbar = ttk.Scale(self.tab,from_=self.ki_low, to=self.ki_high,
-            command=self.ki_4_scrollbar_update)
-        ki_4_scrollbar.grid(row=17,column=8,columnspan=1,
-            sticky=tk.E+tk.W,padx=5,pady=5)
-        ki_4_entry = ttk.Entry(self.tab,textvariable=self.kis[3])
-        ki_4_entry.bind("<Return>",self.ki_4_entry_update)
-        ki_4_entry.grid(row=17,column=9,
-            sticky=tk.E+tk.W,padx=5,pady=5)
-        kd_4_label = ttk.Label(self.tab, anchor=tk.CENTER,
-            text='Derivative Gain',foreground='cyan4')
-        kd_4_label.grid(row=18,rowspan=1,column=8,columnspan=2,
-            sticky=tk.N+tk.S+tk.E+tk.W,padx=5,pady=5,ipadx=5,ipady=5)
-        self.kd_4_type = tk.BooleanVar()
-        self.kd_4_type.set(True)
-        self.kd_4_type_error = ttk.Radiobutton(self.tab, text="error derivative",
-            value=True, variable=self.kd_4_type,
-            command=self.kd_4_type_update)
-        self.kd_4_type_error.grid(row=19,rowspan=1,column=8,columnspan=1,
-            sticky=tk.N+tk.S+tk.E+tk.W,padx=5,pady=5,ipadx=5,ipady=5)
-        self.kd_4_type_state = ttk.Radiobutton(self.tab, text="state derivative",
-            value = False, variable=self.kd_4_type,
-            command=self.kd_4_type_update)
-        self.kd_4_type_state.grid(row=19,rowspan=1,column=9,columnspan=1,
-            sticky=tk.N+tk.S+tk.E+tk.W,padx=5,pady=5,ipadx=5,ipady=5)
-        kd_4_scrollbar = ttk.Scale(self.tab,from_=self.kd_low, to=self.kd_high,
-            command=self.kd_4_scrollbar_update)
-        kd_4_scrollbar.grid(row=20,column=8,columnspan=1,
-            sticky=tk.E+tk.W,padx=5,pady=5)
-        kd_4_entry = ttk.Entry(self.tab,textvariable=self.kds[3])
-        kd_4_entry.bind("<Return>",self.kd_4_entry_update)
-        kd_4_entry.grid(row=20,column=9,
-            sticky=tk.E+tk.W,padx=5,pady=5)
-        feed_forward_4_label = ttk.Label(self.tab, anchor=tk.CENTER,
-            text='Feed Forward',foreground='cyan4')
-        feed_forward_4_label.grid(row=21,rowspan=1,column=8,columnspan=2,
-            sticky=tk.N+tk.S+tk.E+tk.W,padx=5,pady=5,ipadx=5,ipady=5)
-        feed_forward_4_scrollbar = ttk.Scale(self.tab,
-            from_=self.feed_forward_low, to=self.feed_forward_high,
-            command=self.feed_forward_4_scrollbar_update)
-        feed_forward_4_scrollbar.grid(row=23,column=8,columnspan=1,
-            sticky=tk.E+tk.W,padx=5,pady=5)
-        feed_forward_4_entry = ttk.Entry(self.tab,
-            textvariable=self.feed_forwards[3])
-        feed_forward_4_entry.bind("<Return>",self.feed_forward_4_entry_update)
-        feed_forward_4_entry.grid(row=23,column=9,
-            sticky=tk.E+tk.W,padx=5,pady=5)
-        noise_sigma_4_label = ttk.Label(self.tab, anchor=tk.CENTER,
-            text='Noise Sigma',foreground='cyan4')
-        noise_sigma_4_label.grid(row=24,rowspan=1,column=8,columnspan=2,
-            sticky=tk.N+tk.S+tk.E+tk.W,padx=5,pady=5,ipadx=5,ipady=5)
-        noise_sigma_4_scrollbar = ttk.Scale(self.tab,
-            from_=self.noise_sigma_low, to=self.noise_sigma_high,
-            command=self.noise_sigma_4_scrollbar_update)
-        noise_sigma_4_scrollbar.grid(row=25,column=8,columnspan=1,
-            sticky=tk.E+tk.W,padx=5,pady=5)
-        noise_sigma_4_entry = ttk.Entry(self.tab,
-            textvariable=self.noise_sigmas[3])
-        noise_sigma_4_entry.bind("<Return>",self.noise_sigma_4_entry_update)
-        noise_sigma_4_entry.grid(row=25,column=9,
-            sticky=tk.E+tk.W,padx=5,pady=5)
-
-        self.kp_scrollbars = [kp_1_scrollbar,kp_2_scrollbar,kp_3_scrollbar,kp_4_scrollbar]
-        self.kp_entries = [kp_1_entry,kp_2_entry,kp_3_entry,kp_4_entry]
-
-        self.ki_scrollbars = [ki_1_scrollbar,ki_2_scrollbar,ki_3_scrollbar,ki_4_scrollbar]
-        self.ki_entries = [ki_1_entry,ki_2_entry,ki_3_entry,ki_4_entry]
-
-        self.kd_scrollbars = [kd_1_scrollbar,kd_2_scrollbar,kd_3_scrollbar,kd_4_scrollbar]
-        self.kd_entries = [kd_1_entry,kd_2_entry,kd_3_entry,kd_4_entry]
-
-        self.feed_forward_scrollbars = [feed_forward_1_scrollbar,feed_forward_2_scrollbar,feed_forward_3_scrollbar,feed_forward_4_scrollbar]
-        self.feed_forward_entries = [feed_forward_1_entry,feed_forward_2_entry,feed_forward_3_entry,feed_forward_4_entry]
-
-        self.noise_sigma_scrollbars = [noise_sigma_1_scrollbar,noise_sigma_2_scrollbar,noise_sigma_3_scrollbar,noise_sigma_4_scrollbar]
-        self.noise_sigma_entries = [noise_sigma_1_entry,noise_sigma_2_entry,noise_sigma_3_entry,noise_sigma_4_entry]
+        self.enabled_vars.append(enabled)
+
+        row = 2
+        for name, low, high, text in GAINS:
+            gain_label = ttk.Label(self.controller_frame, anchor=tk.CENTER,
+                text=text,foreground=color)
+            gain_label.grid(row=row,rowspan=1,column=column,columnspan=2,
+                sticky=tk.N+tk.S+tk.E+tk.W,padx=5,pady=5,ipadx=5,ipady=5)
+            row += 1
+            if name == "kd":
+                kd_type = tk.BooleanVar()
+                kd_type.set(bool(self.controllers.kd_error[index]))
+                kd_type_error = ttk.Radiobutton(self.controller_frame,
+                    text="error derivative",value=True, variable=kd_type,
+                    command=partial(self.kd_type_update,index))
+                kd_type_error.grid(row=row,rowspan=1,column=column,columnspan=1,
+                    sticky=tk.N+tk.S+tk.E+tk.W,padx=5,pady=5,ipadx=5,ipady=5)
+                kd_type_state = ttk.Radiobutton(self.controller_frame,
+                    text="state derivative",value = False, variable=kd_type,
+                    command=partial(self.kd_type_update,index))
+                kd_type_state.grid(row=row,rowspan=1,column=column+1,columnspan=1,
+                    sticky=tk.N+tk.S+tk.E+tk.W,padx=5,pady=5,ipadx=5,ipady=5)
+                self.kd_types.append(kd_type)
+                widgets += [kd_type_error,kd_type_state]
+                row += 1
+            value = tk.DoubleVar(self.controller_frame)
+            value.set(getattr(self.controllers,name)[index])
+            gain_scrollbar = ttk.Scale(self.controller_frame,from_=low, to=high,
+                command=partial(self.gain_scrollbar_update,name,index))
+            gain_scrollbar.grid(row=row,column=column,columnspan=1,
+                sticky=tk.E+tk.W,padx=5,pady=5)
+            gain_entry = ttk.Entry(self.controller_frame,textvariable=value)
+            gain_entry.bind("<Return>",partial(self.gain_entry_update,name,index))
+            gain_entry.grid(row=row,column=column+1,
+                sticky=tk.E+tk.W,padx=5,pady=5)
+            row += 1
+            self.scrollbars[name].append(gain_scrollbar)
+            self.gain_entries[name].append(gain_entry)
+            self.gain_vars[name].append(value)
+            widgets += [gain_scrollbar,gain_entry]
+            gain_scrollbar.set(getattr(self.controllers,name)[index])
+
+        self.controller_widgets.append(widgets)
+        if not self.enabled[index]:
+            for widget in widgets:
+                widget.state(["disabled"])
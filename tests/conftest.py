@@ -0,0 +1,11 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: Makes the lib package importable from the tests
+'''
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,ROOT)
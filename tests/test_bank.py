@@ -0,0 +1,57 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: Batched simulation and incremental resimulation against PID
+'''
+
+import numpy as np
+
+from lib.bank import IncrementalSimulator, PIDBank, simulate
+from lib.pid import PID
+from lib.plant import PLANTS
+from lib.simulation import Simulation
+
+GAINS = dict(kp=[0.8,1.5,0.3],ki=[2.0,0.5,0.0],kd=[0.01,0.05,0.2],
+    kd_error=[True,False,True],feed_forward=[0.0,0.2,-0.1])
+
+
+def test_simulate_matches_scalar_pid():
+    simulation = Simulation("QUADRATIC",time_end=3.0)
+    results = simulate(PIDBank(**GAINS),simulation.setpoint,simulation.dt,offset=0.1)
+    for ii in range(3):
+        controller = PID(GAINS["kp"][ii],GAINS["ki"][ii],GAINS["kd"][ii],
+            GAINS["kd_error"][ii])
+        controller.feed_forward = GAINS["feed_forward"][ii]
+        result = np.zeros(simulation.time_length)
+        for jj in range(1,simulation.time_length):
+            result[jj] = controller.update(result[jj-1],simulation.setpoint[jj],
+                simulation.dt) + 0.1
+        np.testing.assert_allclose(results[:,ii],result,rtol=1e-12,atol=1e-12)
+
+def test_incremental_edit_matches_a_full_run():
+    simulation = Simulation("RAMP",time_end=5.0)
+    setpoint = simulation.setpoint.copy()
+    for name in ("Implicit Integrator","Mass-Spring-Damper","Dead Time + Lag"):
+        bank = PIDBank(noise_sigma=0.05,seed=4,**GAINS)
+        simulator = IncrementalSimulator(bank,simulation.dt,plant=PLANTS[name](),
+            setpoint_noise=0.02,interval=64)
+        simulator.run(setpoint)
+        edited = setpoint.copy()
+        edited[300:] += 0.5
+        result = simulator.update(edited).copy()
+        expected = simulate(PIDBank(noise_sigma=0.05,seed=4,**GAINS),edited,
+            simulation.dt,plant=PLANTS[name](),setpoint_noise=0.02)
+        assert np.array_equal(result,expected)
+
+def test_snapshots_hold_only_state():
+    plant = PLANTS["Mass-Spring-Damper"]()
+    plant.reset(2,0.01)
+    plant.step(np.ones(2))
+    snapshot = plant.snapshot()
+    assert set(snapshot) == {"state","measurement"}
+    expected = plant.clone().step(np.ones(2)).copy()
+    plant.step(np.full(2,5.0))
+    # a snapshot can be restored more than once
+    for ii in range(2):
+        plant.restore(snapshot)
+        np.testing.assert_array_equal(plant.step(np.ones(2)),expected)
@@ -0,0 +1,55 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: Cascade step function against nesting two banks by hand
+'''
+
+import numpy as np
+import pytest
+
+from lib.bank import PIDBank
+from lib.cascade import Cascade
+
+
+def banks():
+    return PIDBank(kp=[1.0,2.0,0.5],ki=[0.1,0.0,0.3],kd=0.01), \
+        PIDBank(kp=[4.0,3.0,6.0],ki=1.0,kd_error=False)
+
+def test_cascade_matches_nested_banks():
+    dt = 0.01
+    outer, inner = banks()
+    cascade = Cascade(3)
+    cascade.add("position",outer.copy(),divider=5)
+    cascade.add("velocity",inner.copy(),setpoint="position")
+    step = cascade.compile()
+
+    # a unit mass on a frictionless track, position and velocity measured
+    states = [np.zeros((2,3)),np.zeros((2,3))]
+    velocity_command = np.zeros(3)
+    for tick in range(600):
+        setpoint = 1.0 if tick >= 50 else 0.0
+        commands = step(states[0],[setpoint],dt)
+        if tick % 5 == 0:
+            velocity_command = outer.command(states[1][0],setpoint,5*dt)
+        force = inner.command(states[1][1],velocity_command,dt)
+        np.testing.assert_array_equal(commands[cascade.index("position")],
+            velocity_command)
+        np.testing.assert_array_equal(commands[cascade.index("velocity")],force)
+        for state, command in zip(states,(commands[1],force)):
+            state[1] += command*dt
+            state[0] += state[1]*dt
+    # the cascade moved towards the step
+    assert (np.abs(states[0][0] - 1.0) < 0.5).all()
+
+    cascade.reset()
+    assert cascade.tick == [0] and not cascade.outputs.any()
+
+def test_graph_is_checked():
+    outer, inner = banks()
+    cascade = Cascade(3).add("position",outer)
+    with pytest.raises(ValueError):
+        cascade.add("velocity",inner,setpoint="speed")
+    with pytest.raises(ValueError):
+        cascade.add("position",inner)
+    with pytest.raises(ValueError):
+        cascade.add("velocity",PIDBank(kp=[1.0,2.0]),setpoint="position")
@@ -0,0 +1,32 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: Closed-form loop response against simulate
+'''
+
+import numpy as np
+
+from lib.bank import PIDBank, simulate
+from lib.closedform import ClosedForm
+from lib.setpoint import PROFILES
+from lib.simulation import Simulation
+
+
+def test_closed_form_matches_simulate():
+    bank = PIDBank(kp=[0.8,1.5,0.3],ki=[2.0,0.5,0.0],kd=[0.01,0.05,0.2],
+        kd_error=[True,False,True],feed_forward=[0.0,0.2,-0.1])
+    for profile in PROFILES:
+        simulation = Simulation(profile,time_end=6.0)
+        expected = simulate(bank.copy(),simulation.setpoint,simulation.dt,offset=0.1)
+        closed_form = ClosedForm(bank,profile,time_end=6.0,offset=0.1)
+        samples = np.arange(simulation.time_length)
+        np.testing.assert_allclose(closed_form.response(samples),expected,
+            rtol=1e-9,atol=1e-9)
+
+def test_final_value_of_a_held_step():
+    # integral action removes the error of the constant command
+    bank = PIDBank(kp=[0.8,1.5],ki=[2.0,0.5],kd=0.01,feed_forward=0.2)
+    closed_form = ClosedForm(bank,"STEP",time_end=20.0,offset=0.1)
+    assert (closed_form.spectral_radius() < 1.0).all()
+    np.testing.assert_allclose(closed_form.final_value(),
+        Simulation("STEP",time_end=20.0).setpoint[-1],atol=1e-9)
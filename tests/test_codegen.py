@@ -0,0 +1,58 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: Generated step functions against PID, faults included
+'''
+
+import copy
+import random
+
+import pytest
+
+from lib.codegen import compile_step, generate, verify
+from lib.pid import PID
+
+
+def controller(kp,ki,kd,kd_error=True,feed_forward=0.0,noise_sigma=0.0):
+    c = PID(kp,ki,kd,kd_error)
+    c.feed_forward = feed_forward
+    c.noise_sigma = noise_sigma
+    return c
+
+def test_random_gains_within_slider_ranges_compile():
+    gains = random.Random(0)
+    for ii in range(30):
+        c = controller(gains.uniform(0.0,10.0),gains.uniform(0.0,10.0),
+            gains.uniform(0.0,1.0),gains.random() < 0.5,
+            gains.choice([0.0,gains.uniform(-1.0,1.0)]),gains.choice([0.0,0.1]))
+        for mode in ("update","command"):
+            compile_step(c,gains.choice([0.001,0.01,0.05]),mode)
+
+def test_loop_unstable_and_noisy_controllers_compile():
+    compile_step(controller(5.0,20.0,0.25),0.01)
+    compile_step(controller(1.0,1.0,1.0,False,1.0,0.2),0.01,"command")
+    compile_step([controller(5.0,20.0,0.25),controller(0.8,2.0,0.01)],0.01)
+
+def test_zero_gain_integrator_overflow_faults_like_pid():
+    # 0.0 * inf in the dropped integrator term faults PID
+    c = controller(1.0,0.0,0.0)
+    generic = copy.deepcopy(c)
+    step = compile_step(c,1.0)
+    for setpoint in (1.5e308,1.5e308,0.3,-0.7):
+        assert step(0.0,setpoint) == generic.update(0.0,setpoint,1.0)
+    assert generic.kp == 0.0
+
+def test_faulted_command_keeps_bias_and_noise():
+    c = controller(1.0,1.0,1.0,False,1.0,0.2)
+    namespace = {"random" : random}
+    exec(generate(c,0.01,"update"),namespace)
+    assert verify(c,namespace["make_step"],0.01,"update") == 0.0
+
+def test_verify_reports_a_difference():
+    namespace = {"random" : random}
+    exec(generate(controller(1.0,0.5,0.0),0.01),namespace)
+    assert verify(controller(1.0,0.6,0.0),namespace["make_step"],0.01) > 0.0
+
+def test_non_finite_gains_are_rejected():
+    with pytest.raises(ValueError):
+        generate(controller(float('inf'),0.0,0.0),0.01)
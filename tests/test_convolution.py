@@ -0,0 +1,32 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: FFT convolution of setpoint batches against simulate
+'''
+
+import numpy as np
+import pytest
+
+from lib.bank import PIDBank, simulate
+from lib.convolution import ConvolutionEngine
+from lib.plant import PLANTS
+
+
+def test_convolution_matches_simulate():
+    bank = PIDBank(kp=[0.8,1.5,0.3],ki=[2.0,0.5,0.0],kd=[0.01,0.05,0.02],
+        kd_error=[True,False,True],feed_forward=[0.0,0.2,-0.1])
+    setpoints = np.cumsum(np.random.default_rng(0).normal(0.0,0.05,(3000,4)),axis=0)
+    for plant in ("Implicit Integrator","First-Order Lag","Dead Time + Lag"):
+        # a block shorter than the input exercises overlap-add
+        engine = ConvolutionEngine(bank,0.01,len(setpoints),plant=PLANTS[plant](),
+            offset=0.1,block=512)
+        results = engine.convolve(setpoints)
+        assert results.shape == (3000,4,3)
+        for ii in range(4):
+            expected = simulate(bank.copy(),setpoints[:,ii],0.01,
+                plant=PLANTS[plant](),offset=0.1)
+            np.testing.assert_allclose(results[:,ii],expected,rtol=1e-9,atol=1e-9)
+
+def test_diverging_loop_is_rejected():
+    with pytest.raises(ValueError):
+        ConvolutionEngine(PIDBank(kp=1e3,ki=1e3),0.01,2000)
@@ -0,0 +1,59 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: Margins and stability against analytic results and simulation
+'''
+
+import numpy as np
+
+from lib.bank import PIDBank, simulate
+from lib.frequency import analyze, closed_loop_poles, frequency_grid, is_stable
+from lib.plant import DeadTime, FirstOrderLag, Integrator
+from lib.simulation import Simulation
+
+DT = 0.01
+
+
+def critical_gain(delay):
+    # P on the implicit integrator behind delay + 1 samples, L = kp/((z - 1) z^delay),
+    # reaches -180 degrees at w dt = pi/(2 delay + 1)
+    return 2.0*np.sin(np.pi/(2.0*(2*delay + 1))), np.pi/((2*delay + 1)*DT)
+
+def diverges(kp,ki,plant):
+    simulation = Simulation("STEP",time_end=20.0,hz=1.0/DT)
+    bank = PIDBank(kp=kp,ki=ki)
+    states = simulate(bank,simulation.setpoint,DT,plant=plant)
+    # diverging controllers fault and have their gains zeroed
+    return (bank.kp != kp) | (np.abs(states[-500:]).max(axis=0) > 100.0)
+
+def test_margins_of_a_delayed_integrator():
+    gain, crossover = critical_gain(10)
+    kp = np.array([0.02,0.05,0.1])
+    frequencies, response, gain_margin, phase_margin, phase_crossover, \
+        gain_crossover = analyze(kp,0.0,0.0,DT,plant=DeadTime(Integrator(),10),
+        frequencies=frequency_grid(DT,4096))
+    np.testing.assert_allclose(gain_margin,gain/kp,rtol=1e-4)
+    np.testing.assert_allclose(phase_crossover,crossover,rtol=1e-4)
+    # |L| = kp/(2 sin(w dt/2)) is one at the gain crossover
+    np.testing.assert_allclose(kp/(2.0*np.sin(gain_crossover*DT/2.0)),1.0,
+        rtol=1e-3)
+
+def test_proportional_loop_is_stable_below_the_critical_gain():
+    gain, crossover = critical_gain(0)
+    assert gain == 2.0
+    kp = np.array([0.5,1.0,1.9,2.1])
+    np.testing.assert_array_equal(is_stable(kp,0.0,0.0,DT),[True,True,True,False])
+    # the loop pole of kp/(z - 1) is 1 - kp
+    poles = closed_loop_poles(1.5,0.0,0.0,DT)
+    assert np.isclose(poles,-0.5).any() and (np.abs(poles) < 1.0).all()
+
+def test_is_stable_agrees_with_simulate():
+    plants = (None,FirstOrderLag(time_constant=0.3),DeadTime(FirstOrderLag(),10))
+    ki = 0.5
+    for plant in plants:
+        # bracket the stability boundary in kp, then step to either side
+        kp = np.linspace(0.05,400.0,8000)
+        boundary = kp[np.argmin(is_stable(kp,ki,0.0,DT,plant))]
+        kp = np.array([0.9*boundary,1.1*boundary])
+        np.testing.assert_array_equal(is_stable(kp,ki,0.0,DT,plant),[True,False])
+        np.testing.assert_array_equal(diverges(kp,ki,plant),[False,True])
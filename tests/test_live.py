@@ -0,0 +1,80 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: Live control loop against simulate, its pacing and snapshots
+'''
+
+import threading
+import time
+
+import numpy as np
+
+from lib.bank import PIDBank, simulate
+from lib.live import LiveLoop, looped
+from lib.simulation import Simulation
+
+GAINS = dict(kp=[0.8,1.5],ki=[2.0,0.5],kd=[0.01,0.05],kd_error=[True,False])
+
+
+def test_live_loop_matches_simulate():
+    simulation = Simulation("RAMP",time_end=2.0)
+    source = simulation.setpoint[1:]
+    loop = LiveLoop(PIDBank(**GAINS),simulation.dt,source,
+        window=simulation.time_length,offset=0.2,realtime=False)
+    loop.start()
+    loop.thread.join()
+    time_, setpoint, states = loop.snapshot()
+    expected = simulate(PIDBank(**GAINS),simulation.setpoint,simulation.dt,offset=0.2)
+    np.testing.assert_array_equal(states[1:],expected[1:])
+    np.testing.assert_array_equal(setpoint[1:],source)
+
+def test_inputs_change_from_the_next_sample():
+    dt = 0.01
+    bank = PIDBank(**GAINS)
+    expected = bank.copy()
+    def source():
+        for ii in range(100):
+            if ii == 40:
+                loop.set_input("offset",0.5)
+                loop.set_gain("kp",0,2.0)
+            yield 1.0
+    loop = LiveLoop(bank,dt,source(),window=100,realtime=False)
+    loop.start()
+    loop.thread.join()
+
+    state = np.zeros(2)
+    for ii in range(100):
+        if ii == 40:
+            expected.kp[0] = 2.0
+        state = state + expected.command(state,1.0,dt) + (0.5 if ii >= 40 else 0.0)
+        if ii == 99:
+            np.testing.assert_array_equal(loop.snapshot()[2][-1],state)
+
+def test_pacing_and_snapshots_under_concurrent_updates():
+    dt = 0.002
+    loop = LiveLoop(PIDBank(**GAINS),dt,looped(np.arange(100.0)),window=200)
+    problems = []
+    def display():
+        for ii in range(200):
+            loop.set_gain("kp",ii % 2,0.5 + 0.001*ii)
+            loop.set_input("offset",0.001*ii)
+            time_, setpoint, states = loop.snapshot()
+            written = ~np.isnan(setpoint)
+            # every snapshot is a consistent window: one row per sample and
+            # the setpoint feed in order
+            if written.any():
+                if not np.allclose(np.diff(time_[written]),dt) or time_[-1] != 0.0:
+                    problems.append("time")
+                if not np.isin(np.diff(setpoint[written]),[1.0,-99.0]).all():
+                    problems.append("setpoint")
+            time.sleep(0.001)
+    start = time.perf_counter()
+    loop.start()
+    thread = threading.Thread(target=display)
+    thread.start()
+    thread.join()
+    loop.stop()
+    elapsed = time.perf_counter() - start
+    assert not problems
+    # paced by the clock: never ahead of it, and not far behind
+    assert 0.5*elapsed/dt < loop.samples <= elapsed/dt + 1
@@ -0,0 +1,65 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: Streaming Monte Carlo statistics against exact ones
+'''
+
+import numpy as np
+
+from lib.montecarlo import HISTOGRAM, P2Quantile, Welford, monte_carlo, \
+    pooled_quantiles
+
+QUANTILES = (0.05,0.5,0.95)
+
+
+def summary(samples):
+    estimators = [P2Quantile(p,samples.shape[1:]) for p in QUANTILES]
+    estimators.append(P2Quantile(0.5,samples.shape[1:],HISTOGRAM))
+    for sample in samples:
+        for estimator in estimators:
+            estimator.update(sample)
+    markers = [estimator.markers() for estimator in estimators]
+    return np.concatenate([m[0] for m in markers]), \
+        np.concatenate([m[1] for m in markers])
+
+def test_welford_merge_matches_numpy():
+    samples = np.random.default_rng(0).normal(size=(500,3))
+    first, second = Welford(3), Welford(3)
+    first.update(samples[:120])
+    second.update(samples[120:])
+    first.merge(second)
+    np.testing.assert_allclose(first.mean,samples.mean(axis=0))
+    np.testing.assert_allclose(first.variance(),samples.var(axis=0,ddof=1))
+
+def test_pooled_quantiles_of_unlike_workers():
+    # the average of the worker quantiles misses the pooled 95th percentile
+    # by far, the merged markers do not
+    rng = np.random.default_rng(1)
+    workers = [rng.normal(0.0,scale,size=(4000,2)) for scale in (1.0,5.0)]
+    pooled = pooled_quantiles([summary(w) for w in workers],[4000,4000],QUANTILES)
+    exact = np.quantile(np.concatenate(workers),QUANTILES,axis=0)
+    np.testing.assert_allclose(pooled,exact,atol=0.1)
+    averaged = np.mean([np.quantile(w,QUANTILES,axis=0) for w in workers],axis=0)
+    assert (np.abs(averaged[2] - exact[2]) > 3.0*np.abs(pooled[2] - exact[2])).all()
+
+def test_histogram_traces_the_distribution():
+    samples = np.random.default_rng(2).exponential(size=(5000,3))
+    histogram = P2Quantile(0.5,(3,),HISTOGRAM)
+    for sample in samples:
+        histogram.update(sample)
+    heights, ranks = histogram.markers()
+    np.testing.assert_allclose(ranks[:,0],1.0 + np.array(HISTOGRAM)*4999.0,atol=1.0)
+    np.testing.assert_allclose(heights[1:-1],np.quantile(samples,HISTOGRAM[1:-1],
+        axis=0),rtol=0.1,atol=0.01)
+    np.testing.assert_allclose(histogram.value(),np.median(samples,axis=0),rtol=0.05)
+
+def test_parallel_workers_agree_with_one():
+    setpoint = np.ones(200)
+    args = (1.0,0.5,0.01,setpoint,0.01)
+    options = dict(noise_sigma=0.2,realizations=200,chunk=50,seed=3)
+    one = monte_carlo(*args,**options)
+    two = monte_carlo(*args,workers=2,**options)
+    assert two.count == one.count == 200
+    np.testing.assert_allclose(two.mean,one.mean,atol=0.05)
+    np.testing.assert_allclose(two.bands,one.bands,atol=0.2)
+    assert (np.diff(two.bands,axis=0) >= 0.0).all()
@@ -0,0 +1,51 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: Scalar and batched output stages against each other
+'''
+
+import numpy as np
+
+from lib.bank import BankOutputStage
+from lib.output import OutputStage, quantize
+
+SETTINGS = dict(deadband=[0.0,0.05,0.0,0.02],resolution=[0.0,0.0,0.1,0.05],
+    min_interval=[0.0,0.0,0.0,0.03],low=[-np.inf,-1.0,-0.5,-1.0],
+    high=[np.inf,1.0,0.5,1.0])
+
+
+def test_bank_stage_matches_scalar_stages():
+    rng = np.random.default_rng(3)
+    count = len(SETTINGS["deadband"])
+    stages = [OutputStage(**dict((name,values[ii]) for name, values
+        in SETTINGS.items())) for ii in range(count)]
+    bank = BankOutputStage(count,**SETTINGS)
+    commands = np.cumsum(rng.normal(0.0,0.05,(400,count)),axis=0)
+    # a faulting controller briefly commands inf and nan
+    commands[100,:] = np.inf
+    commands[101,:] = np.nan
+    for ii, row in enumerate(commands):
+        now = 0.01*ii
+        indices, values = bank.submit(row,now)
+        sent = [(jj,stage.submit(command,now)) for jj, (stage, command)
+            in enumerate(zip(stages,row))]
+        sent = [(jj,value) for jj, value in sent if value is not None]
+        assert list(indices) == [jj for jj, value in sent]
+        np.testing.assert_array_equal(values,[value for jj, value in sent])
+        if ii % 50 == 49:
+            indices, values = bank.flush(now)
+            flushed = [(jj,stage.flush(now)) for jj, stage in enumerate(stages)]
+            assert list(indices) == [jj for jj, value in flushed
+                if value is not None]
+
+    statistics = bank.statistics()
+    for jj, stage in enumerate(stages):
+        for name in ("published","deadband_suppressed","interval_suppressed"):
+            assert statistics[name][jj] == stage.statistics()[name]
+    assert (statistics["deadband_suppressed"] > 0).any()
+    assert (statistics["interval_suppressed"] > 0).any()
+
+def test_quantize_passes_non_finite_commands():
+    assert quantize(float('inf'),0.1) == float('inf')
+    assert quantize(float('nan'),0.1) != quantize(float('nan'),0.1)
+    assert abs(quantize(0.26,0.1) - 0.3) < 1e-12
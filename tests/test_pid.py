@@ -0,0 +1,51 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: Scalar PID faults and term capture
+'''
+
+import random
+
+import numpy as np
+
+from lib.bank import PIDBank, simulate
+from lib.pid import PID
+
+
+def test_zero_gain_controller_is_not_faulted():
+    controller = PID()
+    controller.noise_sigma = 0.1
+    row = [0.0]*5
+    controller.capture(row)
+    for setpoint in (1.0,0.0,-1.0):
+        command = controller.command(0.0,setpoint,0.01)
+        assert row[4] == command
+    assert controller.faults == 0
+
+def test_faulted_step_captures_no_noise():
+    controller = PID(1.0,0.5,0.01)
+    controller.noise_sigma = 0.1
+    row = [0.0]*5
+    controller.capture(row)
+    assert controller.update(0.0,float('inf'),0.01) == 0.0
+    assert controller.faults >= 1 and row[4] == 0.0
+    # the next step faults on the infinite previous error, the one after
+    # runs with zero gains and only noise
+    controller.update(1.0,1.0,0.01)
+    command = controller.update(1.0,1.0,0.01)
+    assert row[4] == command - 1.0 and row[4] != 0.0
+
+def test_captured_terms_match_the_bank():
+    setpoint = np.sin(np.linspace(0.0,6.0,400))
+    controller = PID(1.2,0.8,0.05,False)
+    controller.feed_forward = 0.1
+    rows = np.zeros((400,5))
+    result = np.zeros(400)
+    for ii in range(1,400):
+        controller.capture(rows[ii])
+        result[ii] = controller.update(result[ii-1],setpoint[ii],0.01)
+    bank = PIDBank(kp=1.2,ki=0.8,kd=0.05,kd_error=False,feed_forward=0.1,count=1)
+    terms = np.empty((5,400,1))
+    expected = simulate(bank,setpoint,0.01,terms=terms)
+    np.testing.assert_allclose(result,expected[:,0],rtol=1e-12,atol=1e-12)
+    np.testing.assert_allclose(rows,terms[:,:,0].T,rtol=1e-12,atol=1e-12)
@@ -0,0 +1,43 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: Chunked log replay against one pass over the whole log
+'''
+
+import numpy as np
+import pytest
+
+from lib.bank import PIDBank
+from lib.replay import replay
+
+
+def test_chunked_replay_matches_a_single_pass(tmp_path):
+    log = np.column_stack([np.sin(np.linspace(0.0,5.0,50)),np.ones(50),
+        np.cos(np.linspace(0.0,5.0,50))])
+    np.save(str(tmp_path/"log.npy"),log)
+    np.savetxt(str(tmp_path/"log.csv"),log,delimiter=',',
+        header='state,setpoint,command',comments='')
+    bank = PIDBank(kp=[0.5,1.0,2.0],ki=0.2,kd=0.01)
+    expected = np.array([bank.command(x,r,0.01) for x, r, u in log])
+
+    # a csv log has no known length, its commands are written as raw rows
+    for name, commands in (("log.npy","commands.npy"),("log.csv","commands.bin")):
+        result = replay(bank,str(tmp_path/name),0.01,chunk=7,
+            commands=str(tmp_path/commands),columns=(0,1,2))
+        np.testing.assert_allclose(result.effort,(expected**2).sum(axis=0)*0.01)
+        np.testing.assert_allclose(result.deviation,
+            np.abs(expected - log[:,2:]).sum(axis=0)*0.01)
+        np.testing.assert_allclose(result.mean,expected.mean(axis=0))
+        np.testing.assert_allclose(result.peak,np.abs(expected).max(axis=0))
+        np.testing.assert_allclose(result.total_variation,
+            np.abs(np.diff(expected,axis=0)).sum(axis=0))
+    np.testing.assert_array_equal(np.load(str(tmp_path/"commands.npy")),expected)
+    np.testing.assert_array_equal(np.fromfile(str(tmp_path/"commands.bin")).reshape(
+        -1,3),expected)
+
+def test_binary_logs_need_a_width(tmp_path):
+    np.zeros((4,2)).tofile(str(tmp_path/"log.bin"))
+    with pytest.raises(ValueError):
+        replay(PIDBank(kp=1.0),str(tmp_path/"log.bin"),0.01)
+    result = replay(PIDBank(kp=1.0),str(tmp_path/"log.bin"),0.01,width=2)
+    assert result.count == 4 and result.deviation is None
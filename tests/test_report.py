@@ -0,0 +1,43 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: Incremental, headless report rendering
+'''
+
+import os
+import subprocess
+import sys
+
+from lib.report import render_report
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def configs(kd=0.05):
+    return [dict(kp=kp,ki=0.2,kd=kd,profile="STEP",time_end=2.0,hz=50.0)
+        for kp in (0.5,1.0)] + [dict(kp=0.8,ki=1.0,kd=kd,noise_sigma=0.05,
+        plant="First-Order Lag",time_end=2.0,hz=50.0)]
+
+def test_only_changed_configs_are_rendered(tmp_path):
+    directory = str(tmp_path/"report")
+    assert render_report(configs(),directory,workers=2) == 3
+    rendered = sorted(os.listdir(directory))
+    assert "index.html" in rendered and "metrics.csv" in rendered
+    assert len([name for name in rendered if name.endswith('.png')]) == 3
+    assert render_report(configs(),directory,workers=1) == 0
+    changed = configs()
+    changed[1]["kd"] = 0.1
+    assert render_report(changed,directory,workers=1) == 1
+    with open(os.path.join(directory,"metrics.csv")) as table:
+        assert len(table.readlines()) == 4
+    assert render_report(changed,directory,workers=1,force=True) == 3
+
+def test_rendering_never_imports_tk_or_pyplot(tmp_path):
+    script = ("import sys\n"
+        "from lib.report import render_report\n"
+        "render_report([dict(kp=1.0,time_end=1.0,hz=50.0)],sys.argv[1],workers=1)\n"
+        "print(sorted(name for name in ('tkinter','matplotlib.pyplot')\n"
+        "    if name in sys.modules))\n")
+    output = subprocess.check_output([sys.executable,"-c",script,
+        str(tmp_path/"report")],cwd=ROOT)
+    assert output.decode().strip() == "[]"
@@ -0,0 +1,65 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: Gain scheduling, bumpless transfer and bank agreement
+'''
+
+import numpy as np
+
+import lib.schedule
+from lib.bank import ScheduledBank, simulate
+from lib.schedule import GainTable, ScheduledPID
+from lib.simulation import Simulation
+
+TABLE = GainTable([-1.0,0.0,1.0,2.0],kp=[0.4,0.5,2.0,1.0],ki=[1.0,2.0,0.5,1.5],
+    kd=[0.0,0.01,0.05,0.02],feed_forward=[0.0,0.0,0.1,0.1])
+
+
+def test_switch_is_bumpless():
+    controller = ScheduledPID(TABLE)
+    commands = [controller.command(0.0,1.0,0.01,scheduling_variable=0.0)
+        for ii in range(50)]
+    # kp goes from 0.5 to 2.0 with an error of 1, the integrator absorbs it
+    switched = controller.command(0.0,1.0,0.01,scheduling_variable=1.5)
+    assert controller.kp == 1.5
+    assert abs(switched - commands[-1] - 0.1) < 0.02
+
+def test_segment_lookup_is_cached(monkeypatch):
+    assert [TABLE.segment(x) for x in (-5.0,-1.0,-0.5,0.0,1.5,2.0,9.0)] \
+        == [0,0,0,1,2,2,2]
+    searches = []
+    bisect_right = lib.schedule.bisect_right
+    monkeypatch.setattr(lib.schedule,"bisect_right",
+        lambda *args: searches.append(args) or bisect_right(*args))
+    controller = ScheduledPID(TABLE)
+    for x in np.linspace(-0.9,1.9,50):
+        controller.command(x,1.0,0.01)
+    # a slow sweep only ever steps into a neighbouring segment
+    assert controller.segment == 2 and not searches
+    controller.command(-3.0,1.0,0.01)
+    assert controller.segment == 0 and len(searches) == 1
+
+    # every controller of the bank starts in the segment of 0
+    bank = ScheduledBank(TABLE,3)
+    calls = []
+    searchsorted = np.searchsorted
+    monkeypatch.setattr(np,"searchsorted",
+        lambda *args,**kwargs: calls.append(args) or searchsorted(*args,**kwargs))
+    bank.schedule(np.array([-0.5,0.2,0.5]))
+    assert len(calls) == 1 and len(calls[0][1]) == 1   # only the one that left
+    bank.schedule(np.array([-0.4,0.3,0.6]))
+    assert len(calls) == 1
+    np.testing.assert_array_equal(bank.segment,[0,1,1])
+
+def test_bank_matches_scalar_controllers():
+    simulation = Simulation("RAMP",time_end=3.0)
+    kd_error = [True,False]
+    states = simulate(ScheduledBank(TABLE,2,kd_error=kd_error),
+        simulation.setpoint,simulation.dt)
+    for ii in range(2):
+        controller = ScheduledPID(TABLE,kd_error=kd_error[ii])
+        result = np.zeros(simulation.time_length)
+        for jj in range(1,simulation.time_length):
+            result[jj] = controller.update(result[jj-1],simulation.setpoint[jj],
+                simulation.dt)
+        np.testing.assert_allclose(states[:,ii],result,rtol=1e-10,atol=1e-10)
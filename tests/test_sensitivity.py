@@ -0,0 +1,38 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: Forward sensitivities against finite differences of the costs
+'''
+
+import numpy as np
+
+from lib.bank import PIDBank
+from lib.plant import FirstOrderLag, StateSpace
+from lib.sensitivity import PARAMETERS, sensitivity
+from lib.simulation import Simulation
+
+GAINS = dict(kp=[0.6,1.2],ki=[1.5,0.4],kd=[0.02,0.05],feed_forward=[0.1,-0.2])
+
+
+def costs(gains,kd_error,plant,setpoint,dt):
+    return sensitivity(PIDBank(kd_error=kd_error,**gains),setpoint,dt,
+        plant=plant,offset=0.05)
+
+def test_gradients_match_finite_differences():
+    simulation = Simulation("RAMP",time_end=3.0)
+    plants = (None,FirstOrderLag(time_constant=0.3),
+        StateSpace([[0.9,0.05],[-0.1,0.95]],[0.0,0.05],[1.0,0.0]))
+    step = 1e-6
+    for plant in plants:
+        for kd_error in (True,False):
+            result = costs(GAINS,kd_error,plant,simulation.setpoint,simulation.dt)
+            for jj, name in enumerate(PARAMETERS):
+                gains = dict((key,np.array(value)) for key, value in GAINS.items())
+                gains[name] = gains[name] + step
+                up = costs(gains,kd_error,plant,simulation.setpoint,simulation.dt)
+                gains[name] = gains[name] - 2.0*step
+                down = costs(gains,kd_error,plant,simulation.setpoint,simulation.dt)
+                np.testing.assert_allclose(result.iae_gradient[:,jj],
+                    (up.iae - down.iae)/(2.0*step),rtol=1e-5,atol=1e-7)
+                np.testing.assert_allclose(result.ise_gradient[:,jj],
+                    (up.ise - down.ise)/(2.0*step),rtol=1e-5,atol=1e-7)
@@ -0,0 +1,50 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: Control server framing against a local PIDBank
+'''
+
+import socket
+
+import numpy as np
+import pytest
+
+from lib.bank import PIDBank
+from lib.server import COMMAND, ERROR, HEADER, OK, ControlClient, ControlServer
+
+
+@pytest.fixture
+def server(tmp_path):
+    server = ControlServer(str(tmp_path/"pid.sock"),PIDBank(kp=1.0,ki=0.5,kd=0.01,
+        count=4))
+    server.start()
+    yield server
+    server.stop()
+
+def test_updates_match_the_bank(server):
+    reference = PIDBank(kp=1.0,ki=0.5,kd=0.01,count=4)
+    states = np.array([0.1,-0.2,0.3,0.0])
+    with ControlClient(server.path) as client:
+        for setpoint in (1.0,0.5,-0.5):
+            commands = client.update([0,1,2,3],states,np.full(4,setpoint),0.01)
+            expected = reference.command(states,np.full(4,setpoint),0.01)
+            assert np.array_equal(commands,expected)
+
+def test_rejected_batch_keeps_the_connection(server):
+    with ControlClient(server.path) as client:
+        with pytest.raises(ValueError):
+            client.update([0,0],[0.0,0.0],[1.0,1.0],0.01)
+        assert len(client.update([1],[0.0],[1.0],0.01)) == 1
+
+def test_unknown_kind_is_rejected_and_closes(server):
+    connection = socket.socket(socket.AF_UNIX,socket.SOCK_STREAM)
+    connection.connect(server.path)
+    reader = connection.makefile('rb')
+    # a payload the server cannot size, followed by a valid looking header
+    connection.sendall(HEADER.pack(99,OK,7,3,0.0) + b'\x00'*24
+        + HEADER.pack(1,OK,8,0,0.01))
+    kind, status, sequence, count, dt = HEADER.unpack(reader.read(HEADER.size))
+    assert (kind,status,sequence,count) == (99,ERROR,7,0)
+    assert reader.read(COMMAND.itemsize) == b''
+    reader.close()
+    connection.close()
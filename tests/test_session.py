@@ -0,0 +1,49 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: Session snapshots saved and loaded back
+'''
+
+import numpy as np
+
+from lib import session
+from lib.bank import PIDBank
+from lib.plant import PLANTS
+from lib.simulation import Simulation
+
+
+def tuned():
+    simulation = Simulation("STEP",time_end=2.0,controller_count=3)
+    simulation.plant = PLANTS["First-Order Lag"]()
+    simulation.noise_sigma = 0.1
+    simulation.setpoint_noise_draw(5)
+    bank = PIDBank(kp=[1.0,0.5,2.0],ki=[0.5,0.0,1.0],kd=[0.01,0.0,0.02],
+        noise_sigma=[0.0,0.2,0.0])
+    simulation.superposition_update(bank.copy())
+    return simulation, bank
+
+def test_round_trip(tmp_path):
+    simulation, bank = tuned()
+    path = str(tmp_path/"session.npz")
+    session.save(path,simulation,bank,plant="First-Order Lag",
+        settings={"bode" : True})
+    with session.load(path) as loaded:
+        # only the controller with command noise is stored
+        assert loaded.stored == {1}
+        assert np.array_equal(loaded.results(),simulation.results)
+        assert np.array_equal(loaded.setpoint_with_noise(),
+            simulation.setpoint_with_noise)
+        assert np.array_equal(loaded.bank.kp,bank.kp)
+        assert loaded.settings == {"bode" : True}
+    assert loaded.archive.fid is None or loaded.archive.fid.closed
+
+def test_edited_setpoint_is_stored(tmp_path):
+    simulation, bank = tuned()
+    simulation.setpoint[50:] = 0.25
+    simulation.setpoint_noise_update()
+    simulation.superposition_update(bank.copy())
+    path = str(tmp_path/"session.npz")
+    session.save(path,simulation,bank,plant="First-Order Lag")
+    with session.load(path) as loaded:
+        assert np.array_equal(loaded.setpoint(),simulation.setpoint)
+        assert np.array_equal(loaded.result(0),simulation.results[:,0])
@@ -0,0 +1,76 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: Shard claims, takeover of stale claims and merged sweeps
+'''
+
+import os
+import time
+
+import numpy as np
+
+from lib import shard
+from lib.plant import PLANTS
+from lib.simulation import Simulation
+from lib.sweep import evaluate
+
+AXES = {"kp" : np.linspace(0.1,2.0,12),"ki" : np.linspace(0.0,3.0,10)}
+
+
+def sweep(directory):
+    shard.plan(str(directory),AXES,fixed={"kd" : 0.01},plant="First-Order Lag",
+        time_end=2.0,shard_size=25)
+    return str(directory)
+
+def test_claims_are_exclusive(tmp_path):
+    directory = sweep(tmp_path)
+    assert shard.claim(directory,0,"a",30.0)
+    assert not shard.claim(directory,0,"b",30.0)
+    assert shard.holds(shard.shard_path(directory,"claims",0),"a")
+
+def test_stale_claim_is_taken_over(tmp_path):
+    directory = sweep(tmp_path)
+    path = shard.shard_path(directory,"claims",0)
+    assert shard.claim(directory,0,"dead",30.0)
+    os.utime(path,(time.time() - 60.0,time.time() - 60.0))
+    assert shard.claim(directory,0,"b",30.0)
+    assert shard.holds(path,"b")
+
+def test_live_claim_renamed_in_a_race_is_put_back(tmp_path,monkeypatch):
+    directory = sweep(tmp_path)
+    path = shard.shard_path(directory,"claims",0)
+    assert shard.claim(directory,0,"b",30.0)
+    # the first clock reading sees the claim stale, as if it was replaced
+    # by the live one of b between the stat and the rename
+    now = time.time()
+    readings = iter([now + 60.0,now])
+    monkeypatch.setattr(shard.time,"time",lambda: next(readings,now))
+    assert not shard.claim(directory,0,"a",30.0)
+    assert shard.holds(path,"b")
+    assert os.listdir(os.path.dirname(path)) == ["shard_0"]
+
+def test_heartbeat_notices_a_takeover(tmp_path):
+    directory = sweep(tmp_path)
+    path = shard.shard_path(directory,"claims",0)
+    assert shard.claim(directory,0,"a",30.0)
+    with shard.Heartbeat(path,"a",0.01) as beat:
+        with open(path,"w") as f:
+            f.write("b 0.0\n")
+        time.sleep(0.05)
+    assert beat.lost
+
+def test_merged_sweep_matches_one_evaluation(tmp_path):
+    directory = sweep(tmp_path)
+    # a crashed worker left a stale claim behind
+    assert shard.claim(directory,2,"dead",0.5)
+    status = shard.run_local(directory,workers=3,heartbeat=0.1,lease=0.5)
+    assert status == {"finished" : 5,"claimed" : 0,"stale" : 0,"pending" : 0}
+    simulation = Simulation("STEP",time_end=2.0)
+    kp, ki = np.meshgrid(AXES["kp"],AXES["ki"],indexing="ij")
+    expected = evaluate({"kd" : 0.01,"kp" : kp.ravel(),"ki" : ki.ravel()},
+        simulation.setpoint,simulation.time,simulation.dt,"iae",
+        PLANTS["First-Order Lag"]())
+    merged = shard.merge(directory)
+    assert np.array_equal(merged["value"],expected)
+    assert np.array_equal(merged["index"],np.arange(kp.size))
+    assert merged["grid"].shape == (12,10)
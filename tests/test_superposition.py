@@ -0,0 +1,83 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: Superposed basis responses against direct simulation
+'''
+
+import numpy as np
+
+from lib.bank import PIDBank, simulate
+from lib.plant import PLANTS
+from lib.simulation import Simulation
+
+
+def configured(plant):
+    simulation = Simulation("STEP",time_end=4.0,controller_count=4)
+    simulation.plant = PLANTS[plant]()
+    simulation.steady_state_error = 0.3
+    simulation.noise_sigma = 0.05
+    simulation.setpoint_noise_draw(1)
+    return simulation
+
+def direct(simulation,bank):
+    return simulate(bank.copy(),simulation.setpoint_with_noise,simulation.dt,
+        plant=None if simulation.plant is None else simulation.plant.clone(),
+        offset=simulation.steady_state_error)
+
+def test_superposition_matches_simulate():
+    for plant in ("Implicit Integrator","First-Order Lag","Mass-Spring-Damper"):
+        simulation = configured(plant)
+        # the last controller diverges and is simulated directly
+        bank = PIDBank(kp=[0.8,1.5,0.3,1e3],ki=[2.0,0.5,0.0,1e3],
+            kd=[0.01,0.05,0.2,0.0],kd_error=[True,False,True,True],
+            feed_forward=[0.0,0.2,-0.1,0.0])
+        simulation.superposition_update(bank.copy())
+        np.testing.assert_allclose(simulation.results,direct(simulation,bank),
+            rtol=1e-9,atol=1e-9)
+
+        # an edit of one controller only touches its column
+        before = simulation.results.copy()
+        bank.feed_forward[1] = 0.7
+        bank.kp[2] = 0.9
+        simulation.superposition_update(bank.copy(),[1,2])
+        np.testing.assert_array_equal(simulation.results[:,[0,3]],before[:,[0,3]])
+        np.testing.assert_allclose(simulation.results,direct(simulation,bank),
+            rtol=1e-9,atol=1e-9)
+
+def test_float32_basis_and_direct_fallback():
+    simulation = Simulation("RAMP",time_end=4.0,dtype=np.float32,controller_count=3)
+    simulation.steady_state_error = -0.2
+    bank = PIDBank(kp=[0.8,1.5,0.3],ki=[2.0,0.5,0.0],kd=[0.01,0.05,0.02],
+        feed_forward=[0.0,0.2,-0.1])
+    simulation.superposition_update(bank.copy())
+    assert simulation.basis.dtype == np.float32
+    assert simulation.scratch.dtype == np.float32
+    np.testing.assert_allclose(simulation.results,direct(simulation,bank),
+        rtol=1e-4,atol=1e-4)
+
+    # a basis above the memory budget is not built, every column runs directly
+    simulation.basis_memory = 0
+    simulation.superposition_update(bank.copy())
+    assert simulation.basis is None
+    expected = simulate(bank.copy(),simulation.setpoint_with_noise,simulation.dt,
+        offset=simulation.steady_state_error,dtype=np.float32)
+    np.testing.assert_array_equal(simulation.results,expected)
+
+def test_setpoint_edit_resumes_the_basis_from_a_checkpoint():
+    simulation = configured("Dead Time + Lag")
+    bank = PIDBank(kp=[0.8,1.5],ki=[2.0,0.5],kd=[0.01,0.05],kd_error=[True,False],
+        feed_forward=[0.0,0.2])
+    simulation.superposition_update(bank.copy())
+    start = simulation.time_length - 50
+    for shift in (0.5,-0.25):
+        simulation.setpoint_edit(start,simulation.setpoint[start:] + shift)
+        if simulation.basis_simulator is not None:
+            # only the samples after the last checkpoint are simulated again
+            steps = []
+            resumed = simulation.basis_simulator.bank
+            command = resumed.command
+            resumed.command = lambda *args: steps.append(1) or command(*args)
+        simulation.superposition_update(bank.copy())
+        np.testing.assert_allclose(simulation.results,direct(simulation,bank),
+            rtol=1e-9,atol=1e-9)
+    assert 0 < len(steps) <= 50 + simulation.basis_simulator.interval
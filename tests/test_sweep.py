@@ -0,0 +1,37 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: Progressive gain grid refinement
+'''
+
+import numpy as np
+import pytest
+
+from lib.sweep import ProgressiveGrid
+
+
+def refine(grid):
+    while not grid.done():
+        batch = grid.next_batch()
+        x, y = grid.points(batch)
+        grid.apply(batch,x + 10.0*y)
+
+@pytest.mark.parametrize("resolution",[1,7,50,64,100])
+def test_every_cell_gets_its_own_value(resolution):
+    grid = ProgressiveGrid((0.0,1.0),(0.0,2.0),resolution=resolution)
+    refine(grid)
+    x, y = np.meshgrid(grid.x,grid.y)
+    assert np.array_equal(grid.values,x + 10.0*y)
+    assert grid.evaluated == resolution*resolution
+
+def test_focus_with_odd_resolution():
+    grid = ProgressiveGrid((0.0,1.0),(0.0,1.0),resolution=50)
+    batch = grid.next_batch(1000)
+    grid.apply(batch,np.zeros(len(batch)))
+    grid.set_focus((0.9,1.0),(0.9,1.0))
+    refine(grid)
+    assert np.isfinite(grid.values).all()
+
+def test_extent_is_padded_by_half_a_cell():
+    grid = ProgressiveGrid((0.0,1.0),(2.0,4.0),resolution=5)
+    assert grid.extent() == [-0.125,1.125,1.75,4.25]
@@ -0,0 +1,103 @@
+'''
+Author: Derek Knowles
+Date: 7.2019
+Description: Dirty-column resimulation and in-place redraws of a Tab,
+headless on the Agg backend without a Tk mainloop
+'''
+
+import matplotlib
+matplotlib.use('Agg')
+
+import numpy as np
+import pytest
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+tab = pytest.importorskip("lib.tab")
+
+from lib.bank import PIDBank, simulate
+from lib.simulation import Simulation
+
+
+class Flag():
+    # stands in for the tk.BooleanVar of a checkbox
+    def __init__(self,value=False):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+
+def headless(count=4):
+    t = tab.Tab.__new__(tab.Tab)
+    t.ready = True
+    t.live = None
+    t.collection = None
+    t.background = None
+    t.controller_count = count
+    t.simulation = Simulation("STEP",time_end=2.0,controller_count=count)
+    t.controllers = PIDBank(kp=np.linspace(0.5,2.0,count),ki=0.5,kd=0.01)
+    t.enabled = np.ones(count,dtype=bool)
+    t.dirty = np.ones(count,dtype=bool)
+    t.plot_colors = tab.PLOT_COLORS[:count]
+    t.steady_state_error = 0.0
+    t.monte_carlo_enabled = Flag()
+    t.terms_enabled = Flag()
+    t.bode_magnitude_plot = None
+    t.fig = Figure()
+    t.canvas = FigureCanvasAgg(t.fig)
+    t.my_plot = t.fig.add_subplot(111)
+    t.controller_update()
+    t.draw()
+    return t
+
+def lines(t):
+    return [path.vertices[:,1].copy() for path in t.collection.get_paths()]
+
+def test_only_dirty_enabled_columns_are_resimulated_and_redrawn():
+    t = headless()
+    assert not t.dirty.any()
+    before = lines(t)
+    results = t.simulation.results.copy()
+
+    # controller 1 edited, controller 3 edited while disabled
+    t.controllers.kp[1] = 3.0
+    t.controllers.kp[3] = 4.0
+    t.dirty[[1,3]] = True
+    t.enabled[3] = False
+    assert list(t.controller_update()) == [1]
+    assert t.dirty[3] and not t.dirty[1]
+    # the lines are blitted over the cached axes, the figure is not drawn
+    calls = []
+    for name in ("draw","draw_idle","restore_region","blit"):
+        method = getattr(t.canvas,name)
+        setattr(t.canvas,name,lambda *args,name=name,method=method:
+            calls.append(name) or method(*args))
+    t.refresh([1])
+    assert calls == ["restore_region","blit"]
+
+    expected = simulate(t.controllers.select([1]),t.simulation.setpoint_with_noise,
+        t.simulation.dt)[:,0]
+    np.testing.assert_allclose(t.simulation.results[:,1],expected,rtol=1e-12,
+        atol=1e-12)
+    after = lines(t)
+    for ii in (0,2,3):
+        assert np.array_equal(t.simulation.results[:,ii],results[:,ii])
+        assert np.array_equal(after[ii],before[ii])
+    assert np.array_equal(after[1],t.simulation.results[t.simulation.plot_slice(),1])
+    assert t.collection.get_colors()[3][3] == 0.0
+
+    # enabling it again catches up on the pending edit
+    t.enabled[3] = True
+    assert list(t.controller_update()) == [3]
+    t.refresh([3])
+    assert np.array_equal(lines(t)[3],t.simulation.results[t.simulation.plot_slice(),3])
+    assert t.collection.get_colors()[3][3] == 1.0
+
+def test_stale_background_is_captured_again():
+    t = headless()
+    background = t.background
+    t.my_plot.set_xlim([0.0,1.0])
+    t.refresh([0])
+    assert t.background is not background
+    assert t.background_key == t.blit_key()